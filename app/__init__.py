@@ -6,48 +6,33 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager, current_user
 import click
-from datetime import datetime, date
 from flask_bootstrap import Bootstrap4
-import locale
+from flask_bcrypt import Bcrypt
+from flask_wtf.csrf import generate_csrf
+from . import db_routing
 
 # 1. Creación de Instancias
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': db_routing.RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'main.login' # ¡Cambiado a 'login' como punto de entrada!
 login_manager.login_message = "Por favor, inicia sesión para continuar."
 login_manager.login_message_category = "info"
 bootstrap = Bootstrap4()
+bcrypt = Bcrypt()
 
-# 2. Definición del Filtro Personalizado
-def format_date_full_local_es(date_value):
-    if not isinstance(date_value, (date, datetime)):
-        return date_value
-    try:
-        original_locale = locale.getlocale(locale.LC_TIME)
-        try:
-            locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-        except locale.Error:
-            locale.setlocale(locale.LC_TIME, 'es')
-    except (locale.Error, NameError):
-        original_locale = "C"
-    formatted_date = date_value.strftime('%A, %d de %B de %Y').capitalize()
-    if original_locale:
-        try:
-            locale.setlocale(locale.LC_TIME, original_locale)
-        except (locale.Error, NameError):
-            pass
-    return formatted_date
-
-# 3. Application Factory
+# 2. Application Factory
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    db_routing.configure(app)
     db.init_app(app)
+    db_routing.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     bootstrap.init_app(app)
+    bcrypt.init_app(app)
 
     with app.app_context():
         from . import models
@@ -57,12 +42,28 @@ def create_app(config_class=Config):
         app.register_blueprint(admin_bp)
         from .superadmin_routes import superadmin_bp
         app.register_blueprint(superadmin_bp)
+        from .export_routes import export_bp
+        app.register_blueprint(export_bp)
+        from .api_routes import api_bp
+        app.register_blueprint(api_bp)
         from . import commands
         commands.register_commands(app)
 
-        # Registro de Filtros
-        app.jinja_env.filters['date_full_local_es'] = format_date_full_local_es
-        app.jinja_env.filters['datetime_local'] = format_date_full_local_es
+        # Registro de Filtros (fechas en español sin locale; ver app/template_filters.py)
+        from .template_filters import register_filters
+        register_filters(app)
+        # Conteo/tiempos de SQL por request y log de consultas lentas (no-op si está deshabilitado)
+        from . import instrumentation
+        instrumentation.init_app(app)
+        # Cache de fragmentos renderizados del feed (ver app/fragment_cache.py)
+        from . import fragment_cache
+        fragment_cache.init_app(app)
+        # Marca de despliegue para los ETag de páginas y exportaciones (ver app/conditional.py)
+        from . import conditional
+        conditional.init_app(app)
+
+        # Formularios escritos a mano (p. ej. select_context.html) usan csrf_token() en la plantilla
+        app.jinja_env.globals['csrf_token'] = generate_csrf
 
         # Ruta Raíz
         @app.route('/')
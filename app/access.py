@@ -0,0 +1,223 @@
+# app/access.py
+
+"""
+Matriz de accesos precalculada por usuario.
+
+En lugar de recalcular en cada request a qué barrios y puestos puede entrar un
+usuario (JOINs + recorrer `current_user.permisos` con lazy-loads), se arma una
+sola vez un snapshot compacto:
+
+    barrio -> puestos visibles / puestos editables  (+ flags de admin)
+
+El snapshot se guarda en memoria del proceso y se reutiliza entre requests.
+Se invalida con el sello `Usuario.permisos_version`: cualquier cambio en los
+`PermisoPuesto` de un usuario (o en los puestos de un barrio que administra)
+incrementa esa columna, y como `load_user` ya trae la fila del usuario en cada
+request, todos los workers detectan el cambio sin consultas extra.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from app import db
+from app.models import Usuario, Rol, Barrio, Puesto, PermisoPuesto
+from app.identity import evict_identity
+
+
+BarrioRef = namedtuple('BarrioRef', 'id nombre')
+PuestoRef = namedtuple('PuestoRef', 'id nombre barrio_id')
+
+ROL_SUPER_ADMIN = 'Super Admin'
+ROL_ADMINISTRADOR = 'Administrador'
+
+
+class AccessSnapshot:
+    """Vista inmutable de lo que un usuario puede ver/editar, agrupada por barrio."""
+
+    __slots__ = ('usuario_id', 'version', 'is_super_admin', 'admin_barrio_id',
+                 'barrios', '_barrios_por_id', '_visibles', '_editables', 'created_at')
+
+    def __init__(self, usuario_id, version, is_super_admin, admin_barrio_id,
+                 barrios, visibles, editables):
+        self.usuario_id = usuario_id
+        self.version = version
+        self.is_super_admin = is_super_admin
+        self.admin_barrio_id = admin_barrio_id
+        self.barrios = tuple(sorted(barrios, key=lambda b: b.nombre))
+        self._barrios_por_id = {b.id: b for b in self.barrios}
+        self._visibles = {k: tuple(sorted(v, key=lambda p: p.nombre)) for k, v in visibles.items()}
+        self._editables = {k: tuple(sorted(v, key=lambda p: p.nombre)) for k, v in editables.items()}
+        self.created_at = time.monotonic()
+
+    def barrio(self, barrio_id):
+        return self._barrios_por_id.get(barrio_id)
+
+    def has_barrio(self, barrio_id):
+        return self.is_super_admin or barrio_id in self._barrios_por_id
+
+    def is_admin_of(self, barrio_id):
+        return self.is_super_admin or (
+            self.admin_barrio_id is not None and self.admin_barrio_id == barrio_id
+        )
+
+    def puestos_visibles(self, barrio_id):
+        return list(self._visibles.get(barrio_id, ()))
+
+    def puestos_editables(self, barrio_id):
+        return list(self._editables.get(barrio_id, ()))
+
+    def puesto_visible(self, barrio_id, puesto_id):
+        """PuestoRef si el puesto es visible en ese barrio, si no None."""
+        for p in self._visibles.get(barrio_id, ()):
+            if p.id == puesto_id:
+                return p
+        return None
+
+    def puesto_editable(self, barrio_id, puesto_id):
+        """PuestoRef si el usuario puede registrar actas en ese puesto, si no None."""
+        for p in self._editables.get(barrio_id, ()):
+            if p.id == puesto_id:
+                return p
+        return None
+
+    def find_puesto(self, puesto_id):
+        """PuestoRef de un puesto visible en cualquier barrio, si no None."""
+        for puestos in self._visibles.values():
+            for p in puestos:
+                if p.id == puesto_id:
+                    return p
+        return None
+
+    def can_edit(self, barrio_id, puesto_id):
+        return self.puesto_editable(barrio_id, puesto_id) is not None
+
+    def visible_puesto_ids(self):
+        """Ids de todos los puestos visibles, en cualquier barrio."""
+        return {p.id for puestos in self._visibles.values() for p in puestos}
+
+
+# ---------------------------
+# Cache por proceso
+# ---------------------------
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _build_snapshot(user):
+    """Arma el snapshot con un número fijo de consultas (a lo sumo 2)."""
+    is_super = user.rol is not None and user.rol.nombre == ROL_SUPER_ADMIN
+    admin_barrio_id = user.barrio_admin_id if (
+        user.rol is not None and user.rol.nombre == ROL_ADMINISTRADOR
+    ) else None
+
+    barrios = {}
+    visibles = {}
+    editables = {}
+
+    if is_super:
+        for b_id, b_nombre in db.session.execute(db.select(Barrio.id, Barrio.nombre)):
+            barrios[b_id] = BarrioRef(b_id, b_nombre)
+        for p_id, p_nombre, p_barrio_id in db.session.execute(
+            db.select(Puesto.id, Puesto.nombre, Puesto.barrio_id)
+        ):
+            ref = PuestoRef(p_id, p_nombre, p_barrio_id)
+            visibles.setdefault(p_barrio_id, []).append(ref)
+            editables.setdefault(p_barrio_id, []).append(ref)
+        return AccessSnapshot(user.id, user.permisos_version, True, None,
+                              barrios.values(), visibles, editables)
+
+    # Permisos explícitos del usuario, con puesto y barrio en una sola consulta.
+    permisos_query = (
+        db.select(PermisoPuesto.puede_ver, PermisoPuesto.puede_editar,
+                  Puesto.id, Puesto.nombre, Puesto.barrio_id, Barrio.nombre)
+        .join(Puesto, PermisoPuesto.puesto_id == Puesto.id)
+        .join(Barrio, Puesto.barrio_id == Barrio.id)
+        .where(PermisoPuesto.usuario_id == user.id)
+    )
+    for puede_ver, puede_editar, p_id, p_nombre, b_id, b_nombre in db.session.execute(permisos_query):
+        barrios[b_id] = BarrioRef(b_id, b_nombre)
+        ref = PuestoRef(p_id, p_nombre, b_id)
+        if puede_ver:
+            visibles.setdefault(b_id, []).append(ref)
+        if puede_editar:
+            editables.setdefault(b_id, []).append(ref)
+
+    # El admin de barrio ve y registra en todos los puestos de su barrio.
+    if user.barrio_admin_id:
+        admin_query = (
+            db.select(Barrio.id, Barrio.nombre, Puesto.id, Puesto.nombre)
+            .outerjoin(Puesto, Puesto.barrio_id == Barrio.id)
+            .where(Barrio.id == user.barrio_admin_id)
+        )
+        puestos_admin = []
+        for b_id, b_nombre, p_id, p_nombre in db.session.execute(admin_query):
+            barrios[b_id] = BarrioRef(b_id, b_nombre)
+            if p_id is not None:
+                puestos_admin.append(PuestoRef(p_id, p_nombre, b_id))
+        if admin_barrio_id is not None:
+            visibles[admin_barrio_id] = puestos_admin
+            editables[admin_barrio_id] = list(puestos_admin)
+
+    return AccessSnapshot(user.id, user.permisos_version, False, admin_barrio_id,
+                          barrios.values(), visibles, editables)
+
+
+def get_access(user):
+    """Devuelve el snapshot de accesos vigente para `user`, armándolo si hace falta."""
+    ttl = current_app.config.get('ACCESS_CACHE_TTL', 600)
+    max_entries = current_app.config.get('ACCESS_CACHE_MAX_ENTRIES', 10000)
+
+    snapshot = _cache.get(user.id)
+    if (snapshot is not None and snapshot.version == user.permisos_version
+            and time.monotonic() - snapshot.created_at < ttl):
+        return snapshot
+
+    snapshot = _build_snapshot(user)
+    with _cache_lock:
+        _cache[user.id] = snapshot
+        # Expulsamos los más viejos (orden de inserción) si nos pasamos del límite.
+        while len(_cache) > max_entries:
+            _cache.pop(next(iter(_cache)))
+    return snapshot
+
+
+def _forget(usuario_ids):
+    with _cache_lock:
+        for usuario_id in usuario_ids:
+            _cache.pop(usuario_id, None)
+    # La identidad cacheada lleva el sello viejo: también hay que descartarla.
+    evict_identity(*usuario_ids)
+
+
+def invalidate_access(*usuario_ids):
+    """
+    Incrementa el sello de versión de los usuarios indicados.
+    Debe llamarse dentro de la misma transacción que modifica sus permisos.
+    """
+    ids = [i for i in usuario_ids if i is not None]
+    if not ids:
+        return
+    db.session.execute(
+        db.update(Usuario)
+        .where(Usuario.id.in_(ids))
+        .values(permisos_version=Usuario.permisos_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    _forget(ids)
+
+
+def invalidate_barrio_access(barrio_id):
+    """
+    Invalida a quienes ven todos los puestos de un barrio sin permisos explícitos
+    (sus administradores y los Super Admin), p. ej. al crear un puesto nuevo.
+    """
+    super_admin_rol = db.select(Rol.id).where(Rol.nombre == ROL_SUPER_ADMIN).scalar_subquery()
+    ids = db.session.scalars(
+        db.select(Usuario.id).where(
+            db.or_(Usuario.barrio_admin_id == barrio_id, Usuario.rol_id == super_admin_rol)
+        )
+    ).all()
+    invalidate_access(*ids)
@@ -1,9 +1,14 @@
 # app/admin_routes.py
 
-from flask import Blueprint, render_template, flash, redirect, url_for, request, abort
-from app import db
-from app.forms import CreateUserForm, EditUserForm  # Usamos los formularios ya refactorizados
+from flask import Blueprint, render_template, flash, redirect, url_for, request, abort, Response, jsonify, current_app
+from flask_wtf.csrf import validate_csrf
+from wtforms.validators import ValidationError
+from app import bulk_permissions, db, directory, rollups, tabular_export, user_import
+from app.forms import CreateUserForm, EditUserForm, ImportUsersForm, BulkPermissionsForm  # Usamos los formularios ya refactorizados
 from app.models import Usuario, Rol, Puesto, Barrio, PermisoPuesto, Acta
+from app.access import invalidate_access, invalidate_barrio_access
+from app.passwords import BUSY_SAVE_MESSAGE, PasswordBusy, busy_response
+from app.db_routing import read_replica
 from flask_login import current_user, login_required
 from sqlalchemy import func
 from functools import wraps
@@ -25,30 +30,32 @@ def admin_required(f):
 @admin_bp.route('/users')
 @login_required
 @admin_required
+@read_replica
 def list_users():
     """
     Muestra una lista de usuarios DEL BARRIO que el admin gestiona
     y el formulario para crear uno nuevo.
     """
-    admin_barrio_id = current_user.barrio_admin_id
-    
     # Preparamos el formulario de creación para pasarlo a la plantilla.
-    create_form = CreateUserForm(barrio_id=admin_barrio_id)
-
-    # Consulta para obtener los usuarios que tienen al menos un permiso en un puesto de este barrio.
-    puestos_del_barrio_ids = db.session.scalars(db.select(Puesto.id).where(Puesto.barrio_id == admin_barrio_id)).all()
-    
-    # Usamos la relación correcta: 'permisos'
-    user_query = db.select(Usuario).join(Usuario.permisos).where(PermisoPuesto.puesto_id.in_(puestos_del_barrio_ids)).distinct()
-    
-    page = request.args.get('page', 1, type=int)
-    pagination = db.paginate(user_query.order_by(Usuario.nombre_completo), page=page, per_page=15)
-    users = pagination.items
-    
-    return render_template('admin/users.html', 
-                           title=f'Usuarios de {current_user.barrio_admin.nombre}', 
-                           users=users, 
+    create_form = CreateUserForm(barrio_id=current_user.barrio_admin_id)
+    return render_users_page(create_form)
+
+
+def render_users_page(create_form):
+    """Directorio del barrio del admin (búsqueda + cursor) junto al formulario de alta."""
+    term = request.args.get('q', '').strip()
+    pagination = directory.barrio_directory(
+        current_user.barrio_admin_id,
+        term=term,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=15,
+    )
+    return render_template('admin/users.html',
+                           title=f'Usuarios de {current_user.barrio_admin.nombre}',
+                           users=pagination.items,
                            pagination=pagination,
+                           search_term=term,
                            create_form=create_form,
                            current_barrio=current_user.barrio_admin.nombre)
 
@@ -77,7 +84,10 @@ def create_user():
             rol_id=rol_usuario.id,
             organizacion_id=current_user.organizacion_id,
         )
-        new_user.password = form.password.data
+        try:
+            new_user.password = form.password.data
+        except PasswordBusy:
+            return busy_response(lambda: render_users_page(form), BUSY_SAVE_MESSAGE)
         db.session.add(new_user)
         
         # Iteramos sobre los puestos seleccionados en el formulario
@@ -90,28 +100,65 @@ def create_user():
                 puede_editar=form.puede_editar.data
             )
             db.session.add(permiso)
-            
+
+        db.session.flush()
+        invalidate_access(new_user.id)
         db.session.commit()
         flash(f'Usuario "{new_user.nombre_completo}" creado con éxito.', 'success')
         return redirect(url_for('admin.list_users'))
     
     # Si la validación falla, volvemos a renderizar la página de lista de usuarios.
     # El formulario 'form' ahora contendrá los errores de validación, que se mostrarán en la plantilla.
-    puestos_del_barrio_ids = db.session.scalars(db.select(Puesto.id).where(Puesto.barrio_id == admin_barrio_id)).all()
-    user_query = db.select(Usuario).join(Usuario.permisos).where(PermisoPuesto.puesto_id.in_(puestos_del_barrio_ids)).distinct()
-    page = request.args.get('page', 1, type=int)
-    pagination = db.paginate(user_query.order_by(Usuario.nombre_completo), page=page, per_page=15)
-    users = pagination.items
-
     flash('Hubo errores en el formulario. Por favor, corrígelos.', 'danger')
-    return render_template('admin/users.html', 
-                           title=f'Usuarios de {current_user.barrio_admin.nombre}', 
-                           users=users, 
-                           pagination=pagination,
-                           create_form=form, # Pasamos el formulario con errores
+    return render_users_page(form)
+
+
+@admin_bp.route('/users/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_users():
+    """Alta masiva desde CSV/XLSX: valida todo el archivo y muestra el resultado fila por fila."""
+    form = ImportUsersForm()
+    report = None
+    if form.validate_on_submit():
+        archivo = form.archivo.data
+        try:
+            report = user_import.import_users(
+                archivo.stream, archivo.filename,
+                barrio_id=current_user.barrio_admin_id,
+                organizacion_id=current_user.organizacion_id,
+                puede_ver=form.puede_ver.data,
+                puede_editar=form.puede_editar.data,
+                partial=form.parcial.data,
+                dry_run=form.simular.data,
+            )
+        except user_import.ImportFileError as e:
+            flash(str(e), 'danger')
+        else:
+            if report.created:
+                flash(f'{report.created} usuario(s) creado(s) con éxito.', 'success')
+            if report.failed:
+                flash(f'{report.failed} fila(s) con errores'
+                      + ('.' if report.created else ': no se creó ningún usuario.'), 'warning')
+            elif report.dry_run:
+                flash('El archivo es válido. Desmarcá "Solo validar" para crear los usuarios.', 'info')
+    return render_template('admin/import_users.html', title='Importar Usuarios', form=form, report=report,
                            current_barrio=current_user.barrio_admin.nombre)
 
 
+@admin_bp.route('/users/import/plantilla.csv')
+@login_required
+@admin_required
+def import_users_template():
+    """CSV de ejemplo con las columnas que espera la importación y los puestos del barrio."""
+    puestos = db.session.scalars(
+        db.select(Puesto.nombre).where(Puesto.barrio_id == current_user.barrio_admin_id).order_by(Puesto.nombre)
+    ).all()
+    ejemplo = ('12345678', 'Apellido Nombre', 'guardia@ejemplo.com', 'Cambiar123', ', '.join(puestos[:2]), 'Sí', 'No')
+    return Response(''.join(tabular_export.iter_csv(user_import.TEMPLATE_HEADER, [ejemplo])), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename="usuarios_plantilla.csv"'})
+
+
 @admin_bp.route('/user/<int:user_id>/edit', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -133,22 +180,19 @@ def edit_user(user_id):
         user_to_edit.nombre_completo = form.nombre_completo.data
         user_to_edit.email = form.email.data or None
         if form.password.data:
-            user_to_edit.password = form.password.data
-
-        # Actualizamos los permisos: borramos los viejos y creamos los nuevos
-        # ¡Solo borramos los permisos de ESTE barrio!
-        for permiso in user_permisos_en_barrio:
-            db.session.delete(permiso)
-        
-        for puesto_id in form.puestos.data:
-            new_permiso = PermisoPuesto(
-                usuario_id=user_to_edit.id,
-                puesto_id=puesto_id,
-                puede_ver=form.puede_ver.data,
-                puede_editar=form.puede_editar.data
-            )
-            db.session.add(new_permiso)
-        
+            try:
+                user_to_edit.password = form.password.data
+            except PasswordBusy:
+                db.session.rollback()
+                return busy_response(lambda: render_template('admin/edit_user.html', title="Editar Usuario",
+                                                             form=form, user=user_to_edit),
+                                     BUSY_SAVE_MESSAGE)
+
+        # Permisos: en ESTE barrio quedan exactamente los puestos elegidos (upsert + delete de la diferencia)
+        bulk_permissions.apply_bulk(
+            admin_barrio_id, [user_to_edit.id], form.puestos.data, bulk_permissions.ACCION_REEMPLAZAR,
+            puede_ver=form.puede_ver.data, puede_editar=form.puede_editar.data,
+        )
         db.session.commit()
         flash(f'Usuario "{user_to_edit.nombre_completo}" actualizado correctamente.', 'success')
         return redirect(url_for('admin.list_users'))
@@ -167,6 +211,91 @@ def edit_user(user_id):
 
     return render_template('admin/edit_user.html', title=f"Editar Usuario", form=form, user=user_to_edit)
 
+# --- PERMISOS MASIVOS (N usuarios x M puestos) ---
+
+@admin_bp.route('/permisos', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def bulk_permissions_view():
+    """Asigna, quita o reemplaza permisos de varios usuarios en varios puestos del barrio."""
+    form = BulkPermissionsForm(barrio_id=current_user.barrio_admin_id)
+    if form.validate_on_submit():
+        try:
+            usuario_ids = bulk_permissions.resolve_users(
+                current_user.barrio_admin_id, usuario_ids=form.usuarios.data, dnis=form.dni_list())
+            diff = bulk_permissions.apply_bulk(
+                current_user.barrio_admin_id, usuario_ids, form.puestos.data, form.accion.data,
+                puede_ver=form.puede_ver.data, puede_editar=form.puede_editar.data)
+        except bulk_permissions.BulkPermissionError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            db.session.commit()
+            r = diff.as_dict()
+            flash(f"Permisos aplicados a {len(usuario_ids)} usuario(s): {r['creados']} nuevos, "
+                  f"{r['actualizados']} modificados, {r['borrados']} quitados, {r['sin_cambios']} sin cambios.",
+                  'success')
+            return redirect(url_for('admin.bulk_permissions_view'))
+    return render_template('admin/bulk_permissions.html', title='Permisos Masivos', form=form,
+                           current_barrio=current_user.barrio_admin.nombre)
+
+
+@admin_bp.route('/api/permisos', methods=['POST'])
+@login_required
+@admin_required
+def bulk_permissions_api():
+    """
+    Misma operación en JSON, para scripts e integraciones. Cuerpo:
+    {"usuarios": [ids], "dnis": [...], "puestos": [ids], "accion": "asignar",
+     "puede_ver": true, "puede_editar": false}. Requiere el header X-CSRFToken.
+    """
+    if current_app.config.get('WTF_CSRF_ENABLED', True):
+        try:
+            validate_csrf(request.headers.get('X-CSRFToken'))
+        except ValidationError:
+            return jsonify(error='Token CSRF inválido o ausente.'), 400
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify(error='Se espera un objeto JSON.'), 400
+    flags = {'puede_ver': data.get('puede_ver', True), 'puede_editar': data.get('puede_editar', False)}
+    no_bool = [name for name, value in flags.items() if not isinstance(value, bool)]
+    if no_bool:
+        # bool("false") es True: solo se aceptan true/false de JSON
+        return jsonify(error=f"{', '.join(no_bool)}: se espera true o false."), 400
+    try:
+        puesto_ids = [int(p) for p in data.get('puestos') or []]
+        usuario_ids = bulk_permissions.resolve_users(
+            current_user.barrio_admin_id,
+            usuario_ids=data.get('usuarios') or [], dnis=[str(d) for d in data.get('dnis') or []])
+        diff = bulk_permissions.apply_bulk(
+            current_user.barrio_admin_id, usuario_ids, puesto_ids, data.get('accion', bulk_permissions.ACCION_ASIGNAR),
+            **flags)
+    except (bulk_permissions.BulkPermissionError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
+    db.session.commit()
+    return jsonify(diff.as_dict())
+
+
+@admin_bp.route('/resumen')
+@login_required
+@admin_required
+@read_replica
+def activity_summary():
+    """Actividad del barrio por puesto y por día, leída de los resúmenes (ver app/rollups.py)."""
+    barrio_id = current_user.barrio_admin_id
+    dias = request.args.get('dias', 30, type=int)
+    dias = dias if dias in (7, 30, 90) else 30
+    return render_template('admin/activity_summary.html',
+                           title=f'Actividad de {current_user.barrio_admin.nombre}',
+                           current_barrio=current_user.barrio_admin.nombre, dias=dias,
+                           totales=rollups.barrio_totals(barrio_id, dias),
+                           por_puesto=rollups.by_puesto(barrio_id, dias),
+                           por_dia=rollups.daily(14, barrio_id=barrio_id),
+                           por_hora=rollups.hourly(24, barrio_id=barrio_id),
+                           estado=rollups.status())
+
+
 # --- GESTIÓN DE PUESTOS (Ahora con chequeo de plan) ---
 
 @admin_bp.route('/puestos', methods=['GET', 'POST'])
@@ -188,6 +317,8 @@ def manage_puestos():
             # Crea el puesto dentro del barrio del admin
             nuevo_puesto = Puesto(nombre=nombre, barrio_id=admin_barrio_id)
             db.session.add(nuevo_puesto)
+            # Los admins del barrio (y los Super Admin) ven el puesto nuevo sin permiso explícito
+            invalidate_barrio_access(admin_barrio_id)
             db.session.commit()
             flash(f'Puesto "{nombre}" creado con éxito.', 'success')
         return redirect(url_for('admin.manage_puestos'))
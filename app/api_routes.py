@@ -0,0 +1,248 @@
+# app/api_routes.py
+
+"""
+API JSON de solo lectura (`/api/v1`) para clientes que no son el navegador
+(tablets de los puestos). Usa la misma sesión que la web (cookie de
+`/login`) y los mismos accesos que `/index` (ver app/access.py).
+
+La pieza principal es `/api/v1/actas/cambios`: el cliente guarda un cursor
+(marca de agua) y pide solo lo registrado después. Las actas van en forma
+compacta: una lista de nombres de campo (`campos`) y una lista por acta
+con los valores en ese orden. El cuerpo va recortado como en el feed
+(`recortado` = true si hay más); el texto completo está en
+`/api/v1/actas/<id>`.
+
+Un INSERT que todavía no confirmó puede tener un id menor que actas que ya
+se ven. Por eso el cursor lleva, además del último id entregado, una marca
+de agua: el id máximo confirmado que vio la consulta *anterior*. El cursor
+no avanza más allá de esa marca, así que lo que estaba en vuelo en ese
+momento (un alta dura milisegundos, el cliente vuelve a pedir después de
+procesar la respuesta) entra en la próxima consulta. La primera respuesta
+de una sincronización no avanza el cursor. Una misma acta puede llegar dos
+veces; el cliente la reemplaza por id. `/actas/cambios` lee siempre del
+primario: en una réplica atrasada la marca y las actas se verían
+incompletas.
+
+Sin cursor se sincroniza todo desde la primera acta, incluido el archivo
+(ver `feed.changes_since`): es el camino para rehacer la copia local.
+
+Las respuestas de más de `API_GZIP_MIN_BYTES` van comprimidas con gzip si
+el cliente manda `Accept-Encoding: gzip`.
+"""
+
+import gzip
+import json
+from datetime import timezone
+from functools import wraps
+
+from flask import Blueprint, Response, abort, current_app, request, url_for
+from flask_login import current_user
+from app import directory, feed
+from app.access import get_access
+from app.db_routing import read_replica
+from app.pagination import decode_cursor, encode_cursor
+
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+ACTA_FIELDS = ('id', 'puesto_id', 'fecha', 'clasificacion', 'autor', 'texto', 'recortado', 'adjunto')
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+
+def api_response(payload, status=200):
+    """JSON compacto; gzip si el cliente lo acepta y la respuesta lo justifica."""
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    response = Response(body, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    min_bytes = current_app.config.get('API_GZIP_MIN_BYTES', 512)
+    if len(body) >= min_bytes and request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=current_app.config.get('API_GZIP_LEVEL', 6)))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def api_login_required(f):
+    """Como `login_required`, pero responde 401 en JSON en lugar de redirigir a /login."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401, 'Sesión no iniciada (POST /login).')
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@api_bp.errorhandler(400)
+@api_bp.errorhandler(401)
+@api_bp.errorhandler(403)
+@api_bp.errorhandler(404)
+def api_error(error):
+    return api_response({'error': error.name, 'detalle': error.description}, status=error.code)
+
+
+def _naive_utc(value):
+    """Las fechas se guardan en UTC; según el motor vuelven naive o aware."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _iso(value):
+    """Fecha UTC en ISO 8601 con `Z`."""
+    value = _naive_utc(value)
+    return value.isoformat(timespec='seconds') + 'Z' if value is not None else None
+
+
+def _compact(row):
+    adjunto = url_for('main.uploaded_file', acta_id=row.id) if row.documento_url else None
+    return [row.id, row.puesto_id, _iso(row.fecha_creacion), row.classification, row.autor_nombre,
+            row.body_preview, row.body_truncated, adjunto]
+
+
+def _limit(default_key, max_key):
+    config = current_app.config
+    limit = request.args.get('limite', config.get(default_key), type=int)
+    if limit is None or limit < 1:
+        abort(400, 'limite inválido.')
+    return min(limit, config.get(max_key))
+
+
+def _requested_puestos(access):
+    """Puestos pedidos en `?puestos=1,2` (todos los visibles si no se indica); 404 si alguno no es visible."""
+    visibles = access.visible_puesto_ids()
+    raw = request.args.get('puestos')
+    if not raw:
+        return visibles
+    try:
+        ids = {int(p) for p in raw.split(',') if p.strip()}
+    except ValueError:
+        abort(400, 'puestos inválido.')
+    if not ids <= visibles:
+        abort(404)
+    return ids
+
+
+# ---------------------------
+# Endpoints
+# ---------------------------
+
+@api_bp.route('/usuarios/yo')
+@api_login_required
+def me():
+    access = get_access(current_user)
+    return api_response({
+        'id': current_user.id,
+        'dni': current_user.dni,
+        'nombre_completo': current_user.nombre_completo,
+        'email': current_user.email,
+        'super_admin': access.is_super_admin,
+        'barrio_admin_id': access.admin_barrio_id,
+    })
+
+
+@api_bp.route('/puestos')
+@api_login_required
+def puestos():
+    """Puestos visibles agrupados por barrio, con el flag de si se puede registrar en cada uno."""
+    access = get_access(current_user)
+    barrios = []
+    for barrio in access.barrios:
+        editables = {p.id for p in access.puestos_editables(barrio.id)}
+        barrios.append({
+            'id': barrio.id,
+            'nombre': barrio.nombre,
+            'puestos': [{'id': p.id, 'nombre': p.nombre, 'editable': p.id in editables}
+                        for p in access.puestos_visibles(barrio.id)],
+        })
+    return api_response({'barrios': barrios})
+
+
+@api_bp.route('/puestos/<int:puesto_id>/actas')
+@api_login_required
+@read_replica
+def puesto_actas(puesto_id):
+    """Libro de un puesto, más nueva primero, por cursor (`?despues=`); incluye el archivo."""
+    if puesto_id not in get_access(current_user).visible_puesto_ids():
+        abort(404)
+    page = feed.page_for_puesto(puesto_id, after=request.args.get('despues'),
+                                per_page=_limit('API_PAGE_SIZE', 'API_MAX_PAGE_SIZE'))
+    return api_response({
+        'campos': ACTA_FIELDS,
+        'actas': [_compact(row) for row in page.items],
+        'siguiente': page.next_cursor,
+    })
+
+
+@api_bp.route('/actas/cambios')
+@api_login_required
+def changes():
+    """
+    Actas registradas después del cursor `desde` en los puestos visibles (o
+    en `?puestos=`). Sin `desde` empieza por la más vieja, archivo incluido.
+    Con `mas` = true hay que volver a pedir con el cursor nuevo.
+    """
+    access = get_access(current_user)
+    puesto_ids = _requested_puestos(access)
+    token = request.args.get('desde')
+    cursor = decode_cursor(token, int, int)
+    if token and cursor is None:
+        abort(400, 'Cursor inválido.')
+    after_id, watermark = cursor if cursor else (0, None)
+    limit = _limit('API_SYNC_BATCH', 'API_SYNC_MAX_BATCH')
+
+    seen_max = feed.max_id()  # antes de leer: todo lo que se devuelve queda por debajo o igual
+    rows = feed.changes_since(sorted(puesto_ids), after_id, limit + 1)
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    # El cursor avanza hasta lo entregado, pero no más allá de la marca anterior (ver docstring del módulo)
+    cursor_id = after_id
+    if watermark is not None:
+        reached = rows[-1].id if more else seen_max
+        cursor_id = max(after_id, min(reached, watermark))
+
+    return api_response({
+        'cursor': encode_cursor(cursor_id, max(seen_max, watermark or 0)),
+        'mas': more,
+        'campos': ACTA_FIELDS,
+        'actas': [_compact(row) for row in rows],
+    })
+
+
+@api_bp.route('/actas/<int:acta_id>')
+@api_login_required
+@read_replica
+def acta(acta_id):
+    """Texto completo de un acta (también archivada)."""
+    row = feed.fetch_body(acta_id)
+    if row is None or row.puesto_id not in get_access(current_user).visible_puesto_ids():
+        abort(404)
+    return api_response({'id': acta_id, 'puesto_id': row.puesto_id, 'texto': row.body or ''})
+
+
+@api_bp.route('/barrios/<int:barrio_id>/usuarios')
+@api_login_required
+@read_replica
+def barrio_users(barrio_id):
+    """Directorio del barrio (solo su administrador o el Super Admin), por cursor (`?despues=`)."""
+    if not get_access(current_user).is_admin_of(barrio_id):
+        abort(403)
+    page = directory.barrio_directory(barrio_id, term=request.args.get('q', '').strip() or None,
+                                      after=request.args.get('despues'),
+                                      per_page=_limit('API_PAGE_SIZE', 'API_MAX_PAGE_SIZE'))
+    return api_response({
+        'usuarios': [{
+            'id': u.id,
+            'dni': u.dni,
+            'nombre_completo': u.nombre_completo,
+            'email': u.email,
+            'rol': u.rol_nombre,
+            'permisos': [{'puesto_id': p.puesto_id, 'ver': p.puede_ver, 'editar': p.puede_editar}
+                         for p in u.permisos],
+        } for u in page.items],
+        'siguiente': page.next_cursor,
+    })
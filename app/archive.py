@@ -0,0 +1,181 @@
+# app/archive.py
+
+"""
+Archivo de actas viejas: tabla caliente `actas` y tabla fría `actas_archivo`.
+
+El libro crece para siempre, pero casi todas las lecturas (feed, alta, búsqueda
+del día a día) tocan las actas recientes. `flask archivar-actas` (pensado para
+cron, una vez por noche) mueve a `actas_archivo` las actas más viejas que el
+horizonte del plan de la organización de su autor (`Plan.dias_en_caliente`, o
+`ARCHIVE_HOT_DAYS` si el plan no lo define). Así `actas`, sus índices y su
+índice full-text quedan del tamaño de los últimos meses y entran en memoria.
+
+- Se mueve de a lotes chicos (`ARCHIVE_BATCH_SIZE`), cada uno en su propia
+  transacción (INSERT en el archivo + DELETE por clave primaria), con una
+  pausa entre lotes (`ARCHIVE_BATCH_PAUSE`): ningún lock dura más que un lote
+  y las réplicas no se atrasan con una transacción gigante.
+- El cuerpo se guarda comprimido con zlib (`body_z`). Para que el buscador lo
+  siga encontrando se guarda aparte `terminos`, las palabras distintas del
+  texto sin tildes, y sobre eso se arma el índice full-text del archivo.
+- El acta conserva su id: los enlaces, adjuntos y trabajos de exportación que
+  la referencian siguen valiendo. La última acta de `actas` nunca se archiva,
+  para que SQLite (y MySQL < 8 al reiniciar) no vuelvan a usar ids ya movidos.
+
+Feed, texto completo, adjuntos, búsqueda y exportaciones leen de las dos
+tablas (ver app/feed.py y app/search.py); para el usuario no hay diferencia.
+"""
+
+import re
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from app import db
+from app.models import Acta, ActaArchivada, Organizacion, Plan, Usuario
+from app.text_utils import fold_accents
+
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+ArchivedBody = namedtuple('ArchivedBody', 'puesto_id body')
+Horizon = namedtuple('Horizon', 'plan_id plan_nombre dias corte')
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def compress(text):
+    if text is None:
+        return None
+    level = current_app.config.get('ARCHIVE_COMPRESSION_LEVEL', 6)
+    return zlib.compress(text.encode('utf-8'), level)
+
+
+def decompress(data):
+    """Cuerpo original de `body_z` (acepta bytes o memoryview, según el driver)."""
+    return zlib.decompress(data).decode('utf-8') if data is not None else None
+
+
+def search_terms(text):
+    """Palabras distintas del texto, sin tildes y en orden de aparición: lo que indexa el buscador."""
+    return ' '.join(dict.fromkeys(_WORD_RE.findall(fold_accents(text))))
+
+
+def fetch_body(acta_id):
+    """(puesto_id, cuerpo) de un acta archivada, o None."""
+    row = db.session.execute(
+        db.select(ActaArchivada.puesto_id, ActaArchivada.body_z).where(ActaArchivada.id == acta_id)
+    ).first()
+    return ArchivedBody(row.puesto_id, decompress(row.body_z)) if row else None
+
+
+# ---------------------------
+# Movimiento de actas
+# ---------------------------
+
+def horizons(now=None):
+    """
+    Fecha de corte por plan. Un plan sin `dias_en_caliente` usa `ARCHIVE_HOT_DAYS`;
+    con 0 (o sin valor por defecto) sus actas no se archivan. El plan None son
+    las actas sin autor, que usan el valor por defecto.
+    """
+    now = now or _utcnow()
+    default = current_app.config.get('ARCHIVE_HOT_DAYS')
+    planes = [(p.id, p.nombre, p.dias_en_caliente)
+              for p in db.session.scalars(db.select(Plan).order_by(Plan.id))]
+    planes.append((None, '(sin autor)', None))
+    result = []
+    for plan_id, nombre, dias in planes:
+        dias = dias if dias is not None else default
+        if dias and dias > 0:
+            result.append(Horizon(plan_id, nombre, dias, now - timedelta(days=dias)))
+    return result
+
+
+def _candidates(horizon, ceiling):
+    t = Acta.__table__
+    query = db.select(t.c.id).where(t.c.fecha_creacion < horizon.corte, t.c.id < ceiling)
+    if horizon.plan_id is None:
+        return query.where(t.c.usuario_id.is_(None))
+    autores = (db.select(Usuario.id).join(Organizacion, Organizacion.id == Usuario.organizacion_id)
+               .where(Organizacion.plan_id == horizon.plan_id))
+    return query.where(t.c.usuario_id.in_(autores))
+
+
+def pending(now=None):
+    """[(Horizon, actas a archivar)] sin mover nada (para `--simular`)."""
+    ceiling = db.session.scalar(db.select(db.func.max(Acta.id))) or 0
+    return [(h, db.session.scalar(db.select(db.func.count()).select_from(_candidates(h, ceiling).subquery())))
+            for h in horizons(now)]
+
+
+def _move_batch(ids):
+    """Copia las actas al archivo y las borra de `actas` en una transacción. Devuelve (filas, bytes, bytes_z)."""
+    t = Acta.__table__
+    rows = db.session.execute(
+        db.select(t.c.id, t.c.classification, t.c.body, t.c.fecha_creacion, t.c.usuario_id,
+                  t.c.puesto_id, t.c.documento_url, t.c.adjunto_sha256).where(t.c.id.in_(ids))
+    ).all()
+    if not rows:
+        return 0, 0, 0
+    archivada = _utcnow()
+    values = []
+    raw = packed = 0
+    for r in rows:
+        body_z = compress(r.body)
+        raw += len((r.body or '').encode('utf-8'))
+        packed += len(body_z or b'')
+        values.append({
+            'id': r.id, 'classification': r.classification, 'body_z': body_z,
+            'terminos': search_terms(r.body), 'fecha_creacion': r.fecha_creacion,
+            'usuario_id': r.usuario_id, 'puesto_id': r.puesto_id,
+            'documento_url': r.documento_url, 'adjunto_sha256': r.adjunto_sha256,
+            'archivada': archivada,
+        })
+    db.session.execute(db.insert(ActaArchivada.__table__), values)
+    db.session.execute(db.delete(t).where(t.c.id.in_([r.id for r in rows])))
+    db.session.commit()
+    return len(rows), raw, packed
+
+
+def archive_old_actas(batch_size=None, pause=None, max_batches=None, now=None, progress=None):
+    """
+    Mueve al archivo las actas vencidas de cada plan. Devuelve
+    {'actas': n, 'lotes': n, 'bytes': cuerpo original, 'bytes_z': comprimido}.
+
+    Cada plan se recorre por id ascendente desde el último lote (keyset), así
+    cada consulta de candidatos es un rango sobre la clave primaria.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('ARCHIVE_BATCH_SIZE', 500)
+    pause = config.get('ARCHIVE_BATCH_PAUSE', 0.05) if pause is None else pause
+    totals = {'actas': 0, 'lotes': 0, 'bytes': 0, 'bytes_z': 0}
+    ceiling = db.session.scalar(db.select(db.func.max(Acta.id))) or 0
+
+    for horizon in horizons(now):
+        last_id = 0
+        movidas = 0
+        while max_batches is None or totals['lotes'] < max_batches:
+            ids = db.session.scalars(
+                _candidates(horizon, ceiling).where(Acta.id > last_id).order_by(Acta.id).limit(batch_size)
+            ).all()
+            db.session.commit()  # no dejar abierta la transacción de lectura durante la pausa
+            if not ids:
+                break
+            n, raw, packed = _move_batch(ids)
+            last_id = ids[-1]
+            movidas += n
+            totals['actas'] += n
+            totals['lotes'] += 1
+            totals['bytes'] += raw
+            totals['bytes_z'] += packed
+            if len(ids) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        if progress and movidas:
+            progress(f"{horizon.plan_nombre}: {movidas} actas anteriores al {horizon.corte:%Y-%m-%d}")
+    return totals
@@ -0,0 +1,189 @@
+# app/attachments.py
+
+"""
+Almacén de adjuntos direccionado por contenido.
+
+- Al subir, el archivo se copia de a bloques a un temporal dentro de
+  `UPLOAD_FOLDER` mientras se calcula su SHA-256; nunca se lee entero en memoria.
+- El archivo definitivo vive en `UPLOAD_FOLDER/objetos/ab/abcdef...` (el hash
+  es el nombre). Si ya existía —la misma foto adjunta a muchas actas— se
+  descarta el temporal y se reutiliza: cada contenido se guarda una sola vez.
+- `Acta.adjunto_sha256` apunta a la fila `Adjunto`; `Acta.documento_url`
+  queda como nombre original para mostrar y para la descarga.
+
+Al servir, el hash es un ETag fuerte y el contenido nunca cambia, así que el
+navegador puede cachearlo indefinidamente. Con `USE_X_SENDFILE` (Apache/lighttpd)
+o `ATTACHMENT_X_ACCEL_PREFIX` (nginx) el servidor web manda los bytes y el
+worker de Python queda libre.
+"""
+
+import hashlib
+import mimetypes
+import os
+import tempfile
+
+from flask import Response, current_app, request, send_file
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+from app import db, derivatives
+from app.models import Acta, ActaArchivada, Adjunto
+
+
+CHUNK_SIZE = 64 * 1024
+OBJECTS_DIR = 'objetos'
+CACHE_MAX_AGE = 365 * 24 * 3600  # el contenido es inmutable (direccionado por hash)
+
+
+def object_relpath(sha256):
+    """Ruta relativa a UPLOAD_FOLDER del objeto con ese hash."""
+    return os.path.join(OBJECTS_DIR, sha256[:2], sha256)
+
+
+def object_path(sha256):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], object_relpath(sha256))
+
+
+def legacy_path(documento_url):
+    """Adjuntos anteriores al almacén: archivo suelto en UPLOAD_FOLDER (o None)."""
+    if not documento_url:
+        return None
+    path = safe_join(current_app.config['UPLOAD_FOLDER'], documento_url)
+    return path if path and os.path.isfile(path) else None
+
+
+def path_for(adjunto_sha256, documento_url=None):
+    """Ruta local del adjunto de un acta (almacén por hash o archivo legado), o None."""
+    if adjunto_sha256:
+        path = object_path(adjunto_sha256)
+        return path if os.path.isfile(path) else None
+    return legacy_path(documento_url)
+
+
+def fetch_for_acta(acta_id):
+    """(puesto_id, documento_url, adjunto_sha256, mimetype) del adjunto de un acta (o archivada), o None."""
+    for model in (Acta, ActaArchivada):
+        row = db.session.execute(
+            db.select(model.puesto_id, model.documento_url, model.adjunto_sha256, Adjunto.mimetype)
+            .outerjoin(Adjunto, model.adjunto_sha256 == Adjunto.sha256)
+            .where(model.id == acta_id)
+        ).first()
+        if row is not None:
+            return row
+    return None
+
+
+def store_upload(file_storage):
+    """
+    Guarda un `FileStorage` en el almacén y devuelve (Adjunto, nombre_original).
+    La fila `Adjunto` se agrega a la sesión si es nueva; el commit queda a cargo del llamador.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    tmp_dir = os.path.join(upload_folder, OBJECTS_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        final_path = object_path(sha256)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)  # contenido repetido: se reutiliza el objeto existente
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    nombre = secure_filename(file_storage.filename or '') or sha256[:12]
+    adjunto = db.session.get(Adjunto, sha256)
+    if adjunto is None:
+        try:
+            # Savepoint: si otra subida del mismo contenido ganó la carrera, se usa esa fila
+            with db.session.begin_nested():
+                adjunto = Adjunto(
+                    sha256=sha256,
+                    tamano=size,
+                    mimetype=mimetypes.guess_type(nombre)[0] or 'application/octet-stream',
+                )
+                db.session.add(adjunto)
+        except IntegrityError:
+            adjunto = db.session.get(Adjunto, sha256)
+    return adjunto, nombre
+
+
+def _private_immutable(response):
+    # Detrás de login: cache solo del navegador, nunca de proxies compartidos
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def _not_modified(etag):
+    """304 para un contenido direccionado por hash: no hace falta tocar el disco."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return _private_immutable(response)
+
+
+def serve_preview(adjunto_sha256, documento_url, variant='miniatura'):
+    """Miniatura JPEG del adjunto (generada a demanda si falta), o None si no admite vista previa."""
+    etag = f'{adjunto_sha256}-{variant}' if adjunto_sha256 else None
+    if etag and request.if_none_match.contains(etag):
+        # Ya la tiene: ni se busca ni se genera el derivado
+        return _not_modified(etag)
+    path = derivatives.ensure(path_for(adjunto_sha256, documento_url), documento_url, variant)
+    if path is None:
+        return None
+    response = send_file(path, mimetype='image/jpeg', conditional=True,
+                         etag=etag or True,
+                         max_age=CACHE_MAX_AGE if adjunto_sha256 else 0)
+    return _private_immutable(response) if adjunto_sha256 else response
+
+
+def serve(adjunto_sha256, documento_url, mimetype=None):
+    """
+    Respuesta para descargar/ver un adjunto: ETag = hash, `Range` y 304
+    condicionales (vía `send_file(conditional=True)`), cache privada de larga
+    duración y, si está configurado, delegación al servidor web.
+    """
+    if adjunto_sha256 and request.if_none_match.contains(adjunto_sha256):
+        return _not_modified(adjunto_sha256)
+    path = path_for(adjunto_sha256, documento_url)
+    if path is None:
+        return None
+    download_name = os.path.basename(documento_url or '') or (adjunto_sha256 or 'adjunto')
+    mimetype = mimetype or mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+
+    accel_prefix = current_app.config.get('ATTACHMENT_X_ACCEL_PREFIX')
+    if accel_prefix and adjunto_sha256:
+        # nginx sirve el archivo (con Range y sendfile) desde una location `internal`
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + object_relpath(adjunto_sha256).replace(os.sep, '/')
+        response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+        response.set_etag(adjunto_sha256)
+        response.make_conditional(request)
+    else:
+        response = send_file(
+            path,
+            mimetype=mimetype,
+            download_name=download_name,
+            conditional=True,
+            etag=adjunto_sha256 or True,
+            max_age=CACHE_MAX_AGE if adjunto_sha256 else 0,
+        )
+
+    return _private_immutable(response) if adjunto_sha256 else response
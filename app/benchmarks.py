@@ -0,0 +1,286 @@
+# app/benchmarks.py
+
+"""
+Benchmark de endpoints con presupuestos (`flask bench endpoints`).
+
+Maneja la aplicación real con el cliente de pruebas de Flask contra la base
+configurada (sembrada con `flask seed` o `flask seed-scale`) y, para cada
+escenario, mide:
+
+- latencia p50/p95 del request completo (ruta + plantilla);
+- sentencias SQL emitidas por request;
+- filas leídas de la base por request.
+
+Si algún valor supera su presupuesto el comando termina con código 1, así que
+sirve para CI: una regresión N+1 en el feed (una consulta por acta) se ve como
+un salto en `queries` aunque la latencia con pocos datos todavía sea buena.
+
+Los presupuestos por defecto están en `DEFAULT_BUDGETS`; un JSON con la misma
+forma (`{"index_get": {"queries": 8}}`) los pisa escenario por escenario.
+
+La cache de fragmentos (app/fragment_cache.py) se apaga durante la corrida:
+con la cache, después del calentamiento `index_get` saldría siempre de ella y
+nunca correrían la consulta del feed, la de autores ni el render de las
+tarjetas, que es justo lo que los presupuestos tienen que vigilar.
+
+Filas leídas: en SQLite se cuentan con el `row_factory` del cursor (exacto);
+en MySQL/PostgreSQL se usa `cursor.rowcount` de los SELECT, que con cursores
+del lado del cliente es la cantidad de filas del resultado.
+"""
+
+import json
+import statistics
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event
+from app import db
+from app.fragment_cache import FragmentCache
+from app.models import Acta, Barrio, PermisoPuesto, Puesto, Rol, Usuario
+
+
+DEFAULT_BUDGETS = {
+    # El login está dominado por el hash de la contraseña (bcrypt, ~250 ms con 12 rondas)
+    'login':            {'p95_ms': 800, 'queries': 4, 'rows': 10},
+    'select_context':   {'p95_ms': 100, 'queries': 3, 'rows': 50},
+    # Una página del feed sin cache de fragmentos: actas + autores + conteo, sin importar el tamaño del libro
+    'index_get':        {'p95_ms': 150, 'queries': 6, 'rows': 100},
+    'index_post':       {'p95_ms': 150, 'queries': 6, 'rows': 20},
+    'admin_list_users': {'p95_ms': 200, 'queries': 6, 'rows': 120},
+    'admin_edit_user':  {'p95_ms': 150, 'queries': 8, 'rows': 200},
+    'superadmin_index': {'p95_ms': 150, 'queries': 6, 'rows': 500},
+}
+METRICS = ('p95_ms', 'queries', 'rows')
+
+Scenario = namedtuple('Scenario', 'name actor run expect', defaults=(200,))
+Actors = namedtuple('Actors', 'guardia multibarrio admin editado superadmin barrio_id puesto_id')
+
+
+class SQLCounter:
+    """Cuenta sentencias y filas leídas en los engines (primario y réplicas) mientras está activo."""
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.queries = 0
+        self.rows = 0
+
+    def _count_row(self, cursor, row):
+        self.rows += 1
+        return row
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries += 1
+        if conn.dialect.name == 'sqlite':
+            cursor.row_factory = self._count_row
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        if conn.dialect.name == 'sqlite':
+            return
+        if statement.lstrip()[:6].upper().startswith(('SELECT', 'WITH')) and cursor.rowcount > 0:
+            self.rows += cursor.rowcount
+
+    def reset(self):
+        self.queries = 0
+        self.rows = 0
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._before)
+            event.listen(engine, 'after_cursor_execute', self._after)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._before)
+            event.remove(engine, 'after_cursor_execute', self._after)
+
+
+def load_budgets(path=None):
+    budgets = {name: dict(values) for name, values in DEFAULT_BUDGETS.items()}
+    if path:
+        with open(path, encoding='utf-8') as f:
+            for name, values in json.load(f).items():
+                budgets.setdefault(name, {}).update(values)
+    return budgets
+
+
+def find_actors(dni_guardia=None, dni_admin=None, dni_superadmin=None):
+    """
+    Usuarios para cada escenario. Sin DNI explícito se eligen de la base: el
+    guardia con más puestos editables, uno con puestos en varios barrios, el
+    primer admin de barrio (y un usuario de su barrio para editar) y el primer
+    super admin.
+    """
+    def by_dni(dni):
+        return db.session.scalar(db.select(Usuario).where(Usuario.dni == dni)) if dni else None
+
+    guardia = by_dni(dni_guardia) or db.session.scalar(
+        db.select(Usuario)
+        .join(PermisoPuesto, PermisoPuesto.usuario_id == Usuario.id)
+        .where(PermisoPuesto.puede_editar.is_(True))
+        .group_by(Usuario.id)
+        .order_by(db.func.count(PermisoPuesto.id).desc(), Usuario.id)
+        .limit(1))
+    multibarrio = db.session.scalar(
+        db.select(Usuario)
+        .join(PermisoPuesto, PermisoPuesto.usuario_id == Usuario.id)
+        .join(Puesto, Puesto.id == PermisoPuesto.puesto_id)
+        .where(PermisoPuesto.puede_ver.is_(True))
+        .group_by(Usuario.id)
+        .having(db.func.count(db.distinct(Puesto.barrio_id)) > 1)
+        .order_by(Usuario.id)
+        .limit(1))
+    admin = by_dni(dni_admin) or db.session.scalar(
+        db.select(Usuario).join(Rol).where(Rol.nombre == 'Administrador', Usuario.barrio_admin_id.is_not(None))
+        .order_by(Usuario.id).limit(1))
+    superadmin = by_dni(dni_superadmin) or db.session.scalar(
+        db.select(Usuario).join(Rol).where(Rol.nombre == 'Super Admin').order_by(Usuario.id).limit(1))
+
+    editado = None
+    if admin is not None:
+        editado = db.session.scalar(
+            db.select(Usuario)
+            .join(PermisoPuesto, PermisoPuesto.usuario_id == Usuario.id)
+            .join(Puesto, Puesto.id == PermisoPuesto.puesto_id)
+            .where(Puesto.barrio_id == admin.barrio_admin_id)
+            .order_by(Usuario.id).limit(1))
+
+    barrio_id = puesto_id = None
+    if guardia is not None:
+        puesto_id, barrio_id = db.session.execute(
+            db.select(Puesto.id, Puesto.barrio_id)
+            .join(PermisoPuesto, PermisoPuesto.puesto_id == Puesto.id)
+            .where(PermisoPuesto.usuario_id == guardia.id, PermisoPuesto.puede_editar.is_(True))
+            .order_by(Puesto.id).limit(1)).one()
+    return Actors(guardia, multibarrio, admin, editado, superadmin, barrio_id, puesto_id)
+
+
+def _logged_client(app, user, password, barrio_id=None):
+    client = app.test_client()
+    response = client.post('/login', data={'dni': user.dni, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f'No se pudo iniciar sesión con el DNI {user.dni} (HTTP {response.status_code}).')
+    if barrio_id is not None:
+        with client.session_transaction() as sess:
+            sess['current_barrio_id'] = barrio_id
+            sess['current_barrio_nombre'] = db.session.get(Barrio, barrio_id).nombre
+    return client
+
+
+def build_scenarios(app, actors, password):
+    """Lista de escenarios aplicables a los usuarios encontrados (los que faltan se omiten)."""
+    scenarios = []
+    clients = {}
+
+    def client_for(key, user, barrio_id=None):
+        if key not in clients:
+            clients[key] = _logged_client(app, user, password, barrio_id)
+        return clients[key]
+
+    if actors.guardia is not None:
+        guardia, barrio_id, puesto_id = actors.guardia, actors.barrio_id, actors.puesto_id
+        scenarios.append(Scenario('login', guardia, lambda: app.test_client().post(
+            '/login', data={'dni': guardia.dni, 'password': password}), 302))
+        scenarios.append(Scenario('index_get', guardia, lambda: client_for('guardia', guardia, barrio_id).get(
+            f'/index?puesto_id={puesto_id}')))
+        scenarios.append(Scenario('index_post', guardia, lambda: client_for('guardia', guardia, barrio_id).post(
+            f'/index?puesto_id={puesto_id}', data={
+                'puesto': puesto_id,
+                'classification': 'CONSTANCIA',
+                'observation_date': datetime.now().strftime('%Y-%m-%d'),
+                'observation_time': datetime.now().strftime('%H:%M'),
+                'body': 'Acta de benchmark: se borra al terminar.',
+                'submit_obs': 'Registrar Acta',
+            }), 302))
+    if actors.multibarrio is not None:
+        multibarrio = actors.multibarrio
+        scenarios.append(Scenario('select_context', multibarrio,
+                                  lambda: client_for('multibarrio', multibarrio).get('/select_context')))
+    if actors.admin is not None:
+        admin = actors.admin
+        scenarios.append(Scenario('admin_list_users', admin, lambda: client_for('admin', admin).get('/admin/users')))
+        if actors.editado is not None:
+            editado_id = actors.editado.id
+            scenarios.append(Scenario('admin_edit_user', admin, lambda: client_for('admin', admin).get(
+                f'/admin/user/{editado_id}/edit')))
+    if actors.superadmin is not None:
+        superadmin = actors.superadmin
+        scenarios.append(Scenario('superadmin_index', superadmin,
+                                  lambda: client_for('superadmin', superadmin).get('/superadmin/')))
+    return scenarios
+
+
+def _percentile(values, p):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[p - 1]
+
+
+def measure(scenario, counter, iterations, warmup):
+    """Corre un escenario y devuelve sus métricas (los primeros `warmup` requests no cuentan)."""
+    latencies, queries, rows = [], [], []
+    status = None
+    for i in range(warmup + iterations):
+        counter.reset()
+        # Contexto de aplicación propio por request, como en el servidor: si no, el request
+        # reutiliza el del comando y `g` (usuario logueado, zona horaria) pasa de uno a otro
+        with current_app.app_context():
+            t0 = time.perf_counter()
+            response = scenario.run()
+            elapsed = (time.perf_counter() - t0) * 1000
+        status = response.status_code
+        if status != scenario.expect:
+            # Un 200 en lugar del redirect es un formulario rechazado: no mide lo que debe
+            raise RuntimeError(f'{scenario.name}: HTTP {status} (se esperaba {scenario.expect})')
+        if i >= warmup:
+            latencies.append(elapsed)
+            queries.append(counter.queries)
+            rows.append(counter.rows)
+    return {
+        'status': status,
+        'p50_ms': round(_percentile(latencies, 50), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+        'queries': max(queries),
+        'rows': max(rows),
+    }
+
+
+def over_budget(result, budget):
+    """Métricas que superan el presupuesto: [(métrica, valor, límite)]."""
+    return [(metric, result[metric], budget[metric])
+            for metric in METRICS if metric in budget and result[metric] > budget[metric]]
+
+
+def run(iterations=20, warmup=2, password='password', only=None,
+        dni_guardia=None, dni_admin=None, dni_superadmin=None):
+    """
+    Corre todos los escenarios (o los de `only`) y devuelve (resultados, omitidos).
+    Las actas creadas por `index_post` se borran al final.
+    """
+    app = current_app._get_current_object()
+    actors = find_actors(dni_guardia, dni_admin, dni_superadmin)
+    max_acta_id = db.session.scalar(db.select(db.func.max(Acta.id))) or 0
+    csrf = app.config.get('WTF_CSRF_ENABLED', True)
+    app.config['WTF_CSRF_ENABLED'] = False  # el cliente de pruebas no arrastra el token del formulario
+    fragment_cache = app.extensions.get('fragment_cache')
+    app.extensions['fragment_cache'] = FragmentCache(None, 0)  # medir el camino frío (ver docstring del módulo)
+    results = {}
+    try:
+        scenarios = build_scenarios(app, actors, password)
+        if only:
+            scenarios = [s for s in scenarios if s.name in only]
+        with SQLCounter(db.engines.values()) as counter:
+            for scenario in scenarios:
+                results[scenario.name] = measure(scenario, counter, iterations, warmup)
+                results[scenario.name]['usuario'] = scenario.actor.dni
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = csrf
+        app.extensions['fragment_cache'] = fragment_cache
+        db.session.rollback()
+        if actors.guardia is not None:
+            db.session.execute(db.delete(Acta).where(Acta.id > max_acta_id, Acta.usuario_id == actors.guardia.id))
+            db.session.commit()
+    omitted = [name for name in DEFAULT_BUDGETS if name not in results and (not only or name in only)]
+    return results, omitted
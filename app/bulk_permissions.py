@@ -0,0 +1,164 @@
+# app/bulk_permissions.py
+
+"""
+Permisos de N usuarios sobre M puestos de un barrio en una sola operación.
+
+Se lee el estado actual de todos los pares (usuario, puesto del barrio) en una
+consulta, se calcula la diferencia con lo pedido y se aplica con pocas
+sentencias, sin importar cuántos pares haya:
+
+- un upsert (executemany) sobre `_usuario_puesto_uc` para los permisos nuevos
+  o con flags distintos (ver app/db_utils.py);
+- un DELETE por lote de ids para los que sobran;
+- un UPDATE del sello de accesos de los usuarios que cambiaron (app/access.py).
+
+Acciones:
+
+- `asignar`: los puestos elegidos quedan con los flags pedidos; el resto no se toca.
+- `revocar`: se quitan los permisos de los puestos elegidos.
+- `reemplazar`: en el barrio quedan exactamente los puestos elegidos (rotación
+  de un equipo: se mueve a todos de puesto con un solo pedido).
+
+El commit queda a cargo del llamador.
+"""
+
+from collections import namedtuple
+
+from app import db, db_utils
+from app.access import invalidate_access
+from app.directory import barrio_members_condition
+from app.models import PermisoPuesto, Puesto, Usuario
+
+
+ACCION_ASIGNAR = 'asignar'
+ACCION_REVOCAR = 'revocar'
+ACCION_REEMPLAZAR = 'reemplazar'
+ACCIONES = (ACCION_ASIGNAR, ACCION_REVOCAR, ACCION_REEMPLAZAR)
+
+IN_BATCH = 500
+
+CurrentPermiso = namedtuple('CurrentPermiso', 'id puede_ver puede_editar')
+
+
+class BulkPermissionError(Exception):
+    """Pedido inválido: usuarios o puestos fuera del alcance del admin, o acción desconocida."""
+
+
+class PermissionDiff:
+    """Cambios a aplicar y cuántos pares quedaron igual."""
+
+    def __init__(self):
+        self.upserts = []  # dicts para el INSERT ... ON CONFLICT
+        self.deletes = []  # ids de PermisoPuesto
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.usuario_ids = set()  # usuarios cuyos accesos cambian
+
+    def as_dict(self):
+        return {
+            'creados': self.created,
+            'actualizados': self.updated,
+            'borrados': len(self.deletes),
+            'sin_cambios': self.unchanged,
+            'usuarios_afectados': len(self.usuario_ids),
+        }
+
+
+def _chunks(values):
+    values = list(values)
+    for i in range(0, len(values), IN_BATCH):
+        yield values[i:i + IN_BATCH]
+
+
+def resolve_users(barrio_id, usuario_ids=(), dnis=()):
+    """
+    Ids de usuarios que el admin del barrio puede gestionar: los que ya tienen
+    permisos en algún puesto del barrio (los de su directorio). Lanza
+    `BulkPermissionError` con los que no encuentra o no puede tocar.
+    """
+    usuario_ids = {int(i) for i in usuario_ids}
+    dnis = {d.strip() for d in dnis if d and d.strip()}
+    allowed = barrio_members_condition(barrio_id)
+    found = {}
+    for column, values in ((Usuario.id, usuario_ids), (Usuario.dni, dnis)):
+        for chunk in _chunks(values):
+            found.update(db.session.execute(
+                db.select(Usuario.id, Usuario.dni).where(column.in_(chunk), allowed)).all())
+    missing = sorted({str(i) for i in usuario_ids - set(found)} | (dnis - set(found.values())))
+    if missing:
+        raise BulkPermissionError(f"Usuarios inexistentes o de otro barrio: {', '.join(missing)}.")
+    if not found:
+        raise BulkPermissionError('Elegí al menos un usuario.')
+    return sorted(found)
+
+
+def current_permissions(usuario_ids, barrio_id):
+    """{(usuario_id, puesto_id): CurrentPermiso} de los puestos del barrio, en una consulta por lote de usuarios."""
+    current = {}
+    for chunk in _chunks(usuario_ids):
+        rows = db.session.execute(
+            db.select(PermisoPuesto.usuario_id, PermisoPuesto.puesto_id, PermisoPuesto.id,
+                      PermisoPuesto.puede_ver, PermisoPuesto.puede_editar)
+            .join(Puesto, PermisoPuesto.puesto_id == Puesto.id)
+            .where(Puesto.barrio_id == barrio_id, PermisoPuesto.usuario_id.in_(chunk))
+        )
+        for usuario_id, puesto_id, p_id, ver, editar in rows:
+            current[(usuario_id, puesto_id)] = CurrentPermiso(p_id, ver, editar)
+    return current
+
+
+def compute_diff(current, usuario_ids, puesto_ids, barrio_puesto_ids, accion, puede_ver=True, puede_editar=False):
+    """Diferencia entre `current` y lo pedido, sin tocar la base."""
+    if accion not in ACCIONES:
+        raise BulkPermissionError(f'Acción desconocida: {accion}.')
+    wanted = set(puesto_ids)
+    diff = PermissionDiff()
+    for usuario_id in usuario_ids:
+        for puesto_id in barrio_puesto_ids:
+            cur = current.get((usuario_id, puesto_id))
+            if puesto_id not in wanted:
+                if accion == ACCION_REEMPLAZAR and cur is not None:
+                    diff.deletes.append(cur.id)
+                    diff.usuario_ids.add(usuario_id)
+                continue
+            if accion == ACCION_REVOCAR:
+                if cur is not None:
+                    diff.deletes.append(cur.id)
+                    diff.usuario_ids.add(usuario_id)
+                continue
+            if cur is not None and (cur.puede_ver, cur.puede_editar) == (puede_ver, puede_editar):
+                diff.unchanged += 1
+                continue
+            if cur is None:
+                diff.created += 1
+            else:
+                diff.updated += 1
+            diff.upserts.append({'usuario_id': usuario_id, 'puesto_id': puesto_id,
+                                 'puede_ver': puede_ver, 'puede_editar': puede_editar})
+            diff.usuario_ids.add(usuario_id)
+    return diff
+
+
+def apply_bulk(barrio_id, usuario_ids, puesto_ids, accion, puede_ver=True, puede_editar=False):
+    """
+    Calcula y aplica la diferencia para `usuario_ids` x `puesto_ids` (ya autorizados;
+    ver `resolve_users`). Los puestos tienen que ser del barrio. Devuelve el `PermissionDiff`.
+    """
+    barrio_puesto_ids = db.session.scalars(db.select(Puesto.id).where(Puesto.barrio_id == barrio_id)).all()
+    ajenos = set(puesto_ids) - set(barrio_puesto_ids)
+    if ajenos:
+        raise BulkPermissionError(f"Puestos que no son del barrio: {', '.join(map(str, sorted(ajenos)))}.")
+    if not puesto_ids and accion != ACCION_REEMPLAZAR:
+        raise BulkPermissionError('Elegí al menos un puesto.')
+
+    current = current_permissions(usuario_ids, barrio_id)
+    diff = compute_diff(current, usuario_ids, puesto_ids, barrio_puesto_ids, accion, puede_ver, puede_editar)
+
+    db_utils.upsert(PermisoPuesto.__table__, diff.upserts,
+                    conflict_columns=('usuario_id', 'puesto_id'), update_columns=('puede_ver', 'puede_editar'))
+    for chunk in _chunks(diff.deletes):
+        db.session.execute(db.delete(PermisoPuesto.__table__).where(PermisoPuesto.__table__.c.id.in_(chunk)))
+    if diff.usuario_ids:
+        invalidate_access(*diff.usuario_ids)
+    return diff
@@ -1,9 +1,9 @@
 import click
-from app import db
-from app.models import Plan, Rol, Organizacion, Usuario, Barrio, Puesto, PermisoPuesto, Acta
+from app import db, rollups
+from app.models import Plan, Rol, Organizacion, Usuario, Barrio, Puesto, PermisoPuesto, Acta, ActaArchivada
 from sqlalchemy.exc import IntegrityError
 from flask import current_app
-from flask.cli import with_appcontext
+from flask.cli import AppGroup, with_appcontext
 
 
 def register_commands(app):
@@ -17,12 +17,14 @@ def register_commands(app):
             # Borramos en orden inverso para evitar problemas de foreign keys
             db.session.query(PermisoPuesto).delete()
             db.session.query(Puesto).delete()
+            db.session.query(ActaArchivada).delete()
             db.session.query(Acta).delete() # Si tienes actas
             db.session.query(Usuario).delete()
             db.session.query(Organizacion).delete()
             db.session.query(Barrio).delete()
             db.session.query(Plan).delete()
             db.session.query(Rol).delete()
+            rollups.reset()
             db.session.commit()
             click.echo("Datos borrados.")
 
@@ -31,9 +33,9 @@ def register_commands(app):
 
             # --- 1. Crear Catálogos (Planes y Roles) ---
             planes = [
-                Plan(nombre='Básico', precio=30, puede_crear_puestos=False),
-                Plan(nombre='Profesional', precio=50, puede_crear_puestos=False),
-                Plan(nombre='Corporativo', precio=100, puede_crear_puestos=True)
+                Plan(nombre='Básico', precio=30, puede_crear_puestos=False, dias_en_caliente=365),
+                Plan(nombre='Profesional', precio=50, puede_crear_puestos=False, dias_en_caliente=730),
+                Plan(nombre='Corporativo', precio=100, puede_crear_puestos=True, dias_en_caliente=1825)
             ]
             db.session.add_all(planes)
 
@@ -75,7 +77,7 @@ def register_commands(app):
             super_admin.password = 'password' # Contraseña simple para prueba
 
             # Un Admin de Barrio para Cadaqués
-            admin_cadaques = Usuario(dni='11111111', nombre_completo='Admin Cadaqués', email='admin.cadaques@test.com', rol=roles[1], organizacion=org1, organizacion2=org2, barrio_admin=barrio1)
+            admin_cadaques = Usuario(dni='11111111', nombre_completo='Admin Cadaqués', email='admin.cadaques@test.com', rol=roles[1], organizacion=org1, barrio_admin=barrio1)
             admin_cadaques.password = 'password'
             
             # Un guardia para Cadaqués
@@ -116,4 +118,314 @@ def register_commands(app):
             click.echo("Error de integridad. Es posible que los datos ya existan. Prueba a usar la opción --fresh.")
         except Exception as e:
             db.session.rollback()
-            click.echo(f"Un error ocurrió durante la siembra: {e}")
\ No newline at end of file
+            click.echo(f"Un error ocurrió durante la siembra: {e}")
+
+    @app.cli.command('seed-scale')
+    @click.option('--semilla', default=42, show_default=True, help='Semilla del generador (mismo valor = mismos datos).')
+    @click.option('--organizaciones', default=20, show_default=True)
+    @click.option('--barrios', default=1000, show_default=True)
+    @click.option('--puestos-por-barrio', default=3, show_default=True, help='Promedio (distribución exponencial).')
+    @click.option('--usuarios', default=20000, show_default=True, help='Incluye un admin por barrio.')
+    @click.option('--permisos-por-usuario', default=3, show_default=True, help='Máximo de puestos propios por guardia.')
+    @click.option('--actas', default=1_000_000, show_default=True)
+    @click.option('--dias', default=365, show_default=True, help='Días hacia atrás que cubren las actas.')
+    @click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Último día con actas (por defecto hoy). Fijarlo para reconstruir exactamente lo mismo.')
+    @click.option('--lote', default=5000, show_default=True, help='Filas por INSERT.')
+    @click.option('--fresh', is_flag=True,
+                  help='Borra todos los datos (salvo planes y roles) antes de generar; el Super Admin se vuelve a crear.')
+    def seed_scale(semilla, organizaciones, barrios, puestos_por_barrio, usuarios, permisos_por_usuario,
+                   actas, dias, hasta, lote, fresh):
+        """Genera un volumen de datos sintéticos realista para pruebas de capacidad (ver app/synthetic_data.py)."""
+        import time
+        from app import synthetic_data
+
+        if barrios < 1 or dias < 1:
+            raise click.BadParameter('Se necesita al menos un barrio y un día.')
+        if fresh:
+            click.echo("Borrando todos los datos existentes...")
+            synthetic_data.wipe()
+
+        t0 = time.perf_counter()
+        progress = lambda mensaje: click.echo(f"[{time.perf_counter() - t0:7.1f} s] {mensaje}")
+        totales = synthetic_data.generate(
+            semilla=semilla, organizaciones=organizaciones, barrios=barrios,
+            puestos_por_barrio=puestos_por_barrio, usuarios=usuarios,
+            permisos_por_usuario=permisos_por_usuario, actas=actas, dias=dias,
+            hasta=hasta.date() if hasta else None, lote=lote, progress=progress)
+        total = time.perf_counter() - t0
+        click.echo(", ".join(f"{cantidad} {tabla}" for tabla, cantidad in totales.items()))
+        click.echo(f"Listo en {total:.1f} s ({totales['actas'] / total:.0f} actas/s). "
+                   f"Contraseña de todos los usuarios: '{synthetic_data.DEFAULT_PASSWORD}'.")
+        click.echo("Para los paneles: `flask resumir-actas` suma las actas generadas a los resúmenes.")
+
+    @app.cli.command('importar-usuarios')
+    @click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--barrio', 'barrio_id', type=int, required=True, help='Barrio cuyos puestos se asignan.')
+    @click.option('--organizacion', 'organizacion_id', type=int, required=True, help='Organización de los usuarios nuevos.')
+    @click.option('--sin-ver', is_flag=True, help='Por defecto sin permiso de ver (filas sin la columna).')
+    @click.option('--editar', is_flag=True, help='Por defecto con permiso de editar (filas sin la columna).')
+    @click.option('--parcial', is_flag=True, help='Crear las filas válidas aunque otras tengan errores.')
+    @click.option('--simular', is_flag=True, help='Solo validar el archivo.')
+    def importar_usuarios(archivo, barrio_id, organizacion_id, sin_ver, editar, parcial, simular):
+        """Alta masiva de usuarios desde CSV/XLSX (ver app/user_import.py)."""
+        import os
+        from app import user_import
+
+        if db.session.get(Barrio, barrio_id) is None or db.session.get(Organizacion, organizacion_id) is None:
+            raise click.BadParameter('El barrio o la organización no existen.')
+        try:
+            with open(archivo, 'rb') as f:
+                report = user_import.import_users(
+                    f, os.path.basename(archivo), barrio_id, organizacion_id,
+                    puede_ver=not sin_ver, puede_editar=editar, partial=parcial, dry_run=simular)
+        except user_import.ImportFileError as e:
+            raise click.ClickException(str(e))
+        for row in report.rows:
+            detalle = '; '.join(row.errores) or f"{len(row.puestos)} puesto(s)"
+            click.echo(f"línea {row.linea:>5}  {row.dni or '-':<10} {row.estado:<8} {detalle}")
+        click.echo(f"{len(report.rows)} fila(s): {report.created} creada(s), {report.failed} con errores.")
+        if report.aborted:
+            click.echo('Importación cancelada: no se creó ningún usuario (ver --parcial).')
+        if report.failed:
+            raise SystemExit(1)
+
+    @app.cli.command('archivar-actas')
+    @click.option('--lote', type=int, default=None, help='Actas por transacción (por defecto ARCHIVE_BATCH_SIZE).')
+    @click.option('--pausa', type=float, default=None, help='Segundos entre lotes (por defecto ARCHIVE_BATCH_PAUSE).')
+    @click.option('--max-lotes', type=int, default=None, help='Cortar después de N lotes (para repartir en varias noches).')
+    @click.option('--simular', is_flag=True, help='Solo contar cuántas actas se moverían por plan.')
+    def archivar_actas(lote, pausa, max_lotes, simular):
+        """Mueve las actas más viejas que el horizonte de cada plan a la tabla de archivo (ver app/archive.py)."""
+        import time
+        from app import archive
+
+        if simular:
+            for horizonte, cantidad in archive.pending():
+                click.echo(f"{horizonte.plan_nombre}: {cantidad} actas anteriores al {horizonte.corte:%Y-%m-%d} "
+                           f"({horizonte.dias} días en caliente)")
+            return
+
+        t0 = time.perf_counter()
+        totales = archive.archive_old_actas(batch_size=lote, pause=pausa, max_batches=max_lotes, progress=click.echo)
+        total = time.perf_counter() - t0
+        ratio = totales['bytes_z'] / totales['bytes'] if totales['bytes'] else 1
+        click.echo(f"Archivadas {totales['actas']} actas en {totales['lotes']} lote(s), {total:.1f} s. "
+                   f"Cuerpos: {totales['bytes'] / 1024:.0f} KiB -> {totales['bytes_z'] / 1024:.0f} KiB ({ratio:.0%}).")
+
+    @app.cli.command('resumir-actas')
+    @click.option('--lote', type=int, default=None, help='Actas por transacción (por defecto ROLLUP_BATCH_SIZE).')
+    @click.option('--max-lotes', type=int, default=None, help='Cortar después de N lotes.')
+    @click.option('--rehacer', is_flag=True, help='Vacía los resúmenes y los recalcula desde la primera acta.')
+    def resumir_actas(lote, max_lotes, rehacer):
+        """Suma las actas nuevas a los resúmenes de actividad de los paneles (ver app/rollups.py)."""
+        import time
+
+        if rehacer:
+            rollups.reset()
+            db.session.commit()
+            click.echo("Resúmenes vaciados.")
+        t0 = time.perf_counter()
+        totales = rollups.catch_up(batch_size=lote, max_batches=max_lotes, wait=True, progress=click.echo)
+        estado = rollups.status()
+        click.echo(f"Resumidas {totales['actas']} actas en {totales['lotes']} lote(s), "
+                   f"{time.perf_counter() - t0:.1f} s. Cursor en #{estado.ultimo_id}"
+                   + (f", faltan ~{estado.pendientes}." if estado.pendientes else ", al día."))
+
+    @app.cli.command('purgar-exportaciones')
+    @click.option('--horas', type=int, default=None,
+                  help='Antigüedad mínima en horas (por defecto EXPORT_RESULT_MAX_AGE_HOURS).')
+    def purgar_exportaciones(horas):
+        """Borra los archivos de exportación masiva y los trabajos terminados más viejos que N horas."""
+        from app.export_jobs import purge_results
+
+        horas = horas if horas is not None else current_app.config['EXPORT_RESULT_MAX_AGE_HOURS']
+        archivos, trabajos = purge_results(horas)
+        click.echo(f"Exportaciones purgadas: {archivos} archivo(s), {trabajos} trabajo(s).")
+
+    # --- Micro-benchmarks: `flask bench <caso>` ---
+    bench = AppGroup('bench', help='Micro-benchmarks de rendimiento.')
+    app.cli.add_command(bench)
+
+    @bench.command('fechas')
+    @click.option('-n', '--cantidad', default=100000, show_default=True, help='Cantidad de fechas a formatear.')
+    @click.option('--hilos', default=8, show_default=True, help='Hilos para la prueba concurrente.')
+    def bench_fechas(cantidad, hilos):
+        """Mide el filtro date_full_local_es sobre fechas de un libro (una acta cada 20 minutos)."""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from datetime import datetime, timedelta
+        from app.template_filters import date_full_local_es, format_day_es, time_local
+
+        inicio = datetime(2024, 1, 1)
+        fechas = [inicio + timedelta(minutes=20 * i) for i in range(cantidad)]
+        zona = current_app.config['DEFAULT_TIMEZONE']
+
+        def medir(etiqueta, funcion):
+            t0 = time.perf_counter()
+            resultado = [funcion(f, zona) for f in fechas]
+            total = time.perf_counter() - t0
+            click.echo(f"{etiqueta:<28} {total * 1000:8.1f} ms  {total / cantidad * 1e6:6.2f} µs/fecha")
+            return resultado
+
+        format_day_es.cache_clear()
+        esperado = medir('date_full_local_es (frío)', date_full_local_es)
+        medir('date_full_local_es (cache)', date_full_local_es)
+        medir('time_local', time_local)
+        info = format_day_es.cache_info()
+        click.echo(f"Días distintos: {info.currsize}  aciertos de cache: {info.hits}")
+
+        # Mismo resultado desde varios hilos a la vez (con setlocale esto se pisaba)
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            resultados = list(pool.map(lambda _: [date_full_local_es(f, zona) for f in fechas], range(hilos)))
+        ok = all(r == esperado for r in resultados)
+        click.echo(f"Concurrencia ({hilos} hilos): {'OK' if ok else 'RESULTADOS DISTINTOS'}")
+
+    @bench.command('login')
+    @click.option('-n', '--cantidad', default=60, show_default=True, help='Logins simultáneos a simular.')
+    @click.option('--hilos', default=16, show_default=True, help='Hilos de request (como los de waitress/gunicorn).')
+    @click.option('--timeout', type=float, default=None, help='Espera máxima en cola (por defecto PASSWORD_QUEUE_TIMEOUT).')
+    @click.option('--rondas', 'rondas_bcrypt', multiple=True, type=int, default=(10, 11, 12, 13), show_default=True,
+                  help='Valores de BCRYPT_LOG_ROUNDS a medir (repetible).')
+    @click.option('--metodo', 'metodos', multiple=True, default=('scrypt', 'pbkdf2:sha256'), show_default=True,
+                  help='Valores de PASSWORD_WERKZEUG_METHOD a medir (repetible).')
+    def bench_login(cantidad, hilos, timeout, rondas_bcrypt, metodos):
+        """
+        Costo de cada parámetro de hash (BCRYPT_LOG_ROUNDS, PASSWORD_WERKZEUG_METHOD),
+        tormenta de logins contra el pool de app/passwords.py y latencia de una
+        página común mientras tanto.
+        """
+        import os
+        import statistics
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from werkzeug.security import generate_password_hash
+        from app import passwords
+
+        app = current_app._get_current_object()
+        clave = 'clave-de-prueba'
+        vigente = passwords.hash_password(clave)
+        viejo = generate_password_hash(clave)  # werkzeug por defecto: obliga a rehash
+
+        def costo(etiqueta, funcion, veces=3):
+            t0 = time.perf_counter()
+            for _ in range(veces):
+                funcion()
+            ms = (time.perf_counter() - t0) / veces * 1000
+            click.echo(f"{etiqueta:<40} {ms:8.1f} ms")
+            return ms
+
+        # Cuánto cuesta cada parámetro en esta máquina, y cuántos logins/s aguanta el pool con él
+        workers = app.config.get('PASSWORD_HASH_WORKERS') or max(1, (os.cpu_count() or 2) - 1)
+        esquema, rondas_vigentes, metodo_vigente = passwords._policy()
+        click.echo(f"Costo por parámetro (pool de {workers} hilos; * = vigente):")
+        for rondas in rondas_bcrypt:
+            politica = (passwords.SCHEME_BCRYPT, rondas, metodo_vigente)
+            muestra = passwords._hash(clave, politica)
+            vigente_flag = '*' if (esquema, rondas_vigentes) == politica[:2] else ' '
+            ms = costo(f"{vigente_flag} bcrypt {rondas} rondas (verificación)", lambda: passwords._check(muestra, clave))
+            click.echo(f"{'':<42}≈ {workers * 1000 / ms:6.1f} logins/s")
+        for metodo in metodos:
+            politica = (passwords.SCHEME_WERKZEUG, rondas_vigentes, metodo)
+            muestra = passwords._hash(clave, politica)
+            vigente_flag = '*' if (esquema, metodo_vigente) == (politica[0], metodo) else ' '
+            ms = costo(f"{vigente_flag} werkzeug {metodo} (verificación)", lambda: passwords._check(muestra, clave))
+            click.echo(f"{'':<42}≈ {workers * 1000 / ms:6.1f} logins/s")
+
+        costo('verificación (hash vigente)', lambda: passwords._check(vigente, clave))
+        costo('verificación + rehash (hash viejo)',
+              lambda: passwords._verify_task(viejo, clave, passwords._policy()))
+
+        def pagina():
+            # Trabajo típico de un request que no es login: algo de Python puro
+            t0 = time.perf_counter()
+            sum(i * i for i in range(20000))
+            return time.perf_counter() - t0
+
+        def muestrear(hasta):
+            tiempos = []
+            while not hasta.is_set():
+                tiempos.append(pagina())
+                time.sleep(0.01)
+            return tiempos
+
+        def login(_):
+            with app.app_context():
+                t0 = time.perf_counter()
+                try:
+                    ok, _nuevo = passwords.verify(vigente, clave, timeout=timeout)
+                    estado = 'ok' if ok else 'error'
+                except passwords.PasswordBusy:
+                    estado = 'rechazado'
+                return estado, time.perf_counter() - t0
+
+        def percentil(valores, p):
+            return statistics.quantiles(valores, n=100)[p - 1] * 1000 if len(valores) > 1 else 0.0
+
+        parar = threading.Event()
+        base_tiempos = []
+        base = threading.Thread(target=lambda: base_tiempos.extend(muestrear(parar)))
+        base.start()
+        time.sleep(1)
+        parar.set()
+        base.join()
+
+        parar = threading.Event()
+        tormenta_tiempos = []
+        sonda = threading.Thread(target=lambda: tormenta_tiempos.extend(muestrear(parar)))
+        sonda.start()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            resultados = list(pool.map(login, range(cantidad)))
+        total = time.perf_counter() - t0
+        parar.set()
+        sonda.join()
+
+        ok = [t for estado, t in resultados if estado == 'ok']
+        rechazados = sum(1 for estado, _ in resultados if estado == 'rechazado')
+        click.echo(f"Logins: {len(ok)} ok, {rechazados} rechazados en {total:.2f} s "
+                   f"({len(ok) / total:.1f} logins/s)")
+        if ok:
+            click.echo(f"Latencia de login       p50 {percentil(ok, 50):8.1f} ms  p95 {percentil(ok, 95):8.1f} ms")
+        click.echo(f"Página sin tormenta     p50 {percentil(base_tiempos, 50):8.1f} ms  p95 {percentil(base_tiempos, 95):8.1f} ms")
+        click.echo(f"Página durante tormenta p50 {percentil(tormenta_tiempos, 50):8.1f} ms  p95 {percentil(tormenta_tiempos, 95):8.1f} ms")
+
+    @bench.command('endpoints')
+    @click.option('-n', '--iteraciones', default=20, show_default=True, help='Requests medidos por escenario.')
+    @click.option('--calentamiento', default=2, show_default=True, help='Requests previos que no se miden.')
+    @click.option('--presupuestos', type=click.Path(exists=True, dir_okay=False), default=None,
+                  help='JSON con presupuestos que pisan a los de app/benchmarks.py.')
+    @click.option('--escenario', 'escenarios', multiple=True, help='Correr solo estos escenarios (repetible).')
+    @click.option('--password', default='password', show_default=True, help='Contraseña de los usuarios de prueba.')
+    @click.option('--dni-guardia', default=None)
+    @click.option('--dni-admin', default=None)
+    @click.option('--dni-superadmin', default=None)
+    @click.option('--salida', type=click.Path(dir_okay=False, writable=True), default=None,
+                  help='Guardar los resultados en JSON (para comparar entre corridas).')
+    def bench_endpoints(iteraciones, calentamiento, presupuestos, escenarios, password,
+                        dni_guardia, dni_admin, dni_superadmin, salida):
+        """Latencia, consultas SQL y filas por request de los endpoints principales, contra presupuestos."""
+        import json
+        from app import benchmarks
+
+        budgets = benchmarks.load_budgets(presupuestos)
+        resultados, omitidos = benchmarks.run(
+            iterations=iteraciones, warmup=calentamiento, password=password, only=escenarios or None,
+            dni_guardia=dni_guardia, dni_admin=dni_admin, dni_superadmin=dni_superadmin)
+
+        click.echo(f"{'escenario':<18} {'p50 ms':>8} {'p95 ms':>8} {'consultas':>10} {'filas':>7}  resultado")
+        fallas = 0
+        for nombre, r in resultados.items():
+            excedidos = benchmarks.over_budget(r, budgets.get(nombre, {}))
+            fallas += bool(excedidos)
+            detalle = ', '.join(f"{m} {v} > {limite}" for m, v, limite in excedidos) or 'OK'
+            click.echo(f"{nombre:<18} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['queries']:>10} {r['rows']:>7}  {detalle}")
+        for nombre in omitidos:
+            click.echo(f"{nombre:<18} omitido: no hay un usuario adecuado en la base")
+        if salida:
+            with open(salida, 'w', encoding='utf-8') as f:
+                json.dump({'resultados': resultados, 'presupuestos': budgets}, f, indent=2, ensure_ascii=False)
+        if fallas:
+            click.echo(f"{fallas} escenario(s) fuera de presupuesto.", err=True)
+            raise SystemExit(1)
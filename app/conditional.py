@@ -0,0 +1,111 @@
+# app/conditional.py
+
+"""
+GET condicionales (ETag / 304) para páginas y exportaciones caras de generar.
+
+Los puestos de guardia refrescan el libro todo el tiempo por conexiones
+móviles lentas, y casi nunca cambió nada. El validador se arma con datos que
+la vista ya tiene o consigue con una lectura de índice, *antes* de la consulta
+pesada y del render:
+
+- usuario y sello de accesos (`permisos_version`): otro usuario u otros
+  permisos son otra página;
+- lo del usuario que muestra el layout (nombre y DNI en la barra, rol) y el
+  barrio elegido en la sesión (`layout_mark`): editarlos cambia la página
+  aunque no haya actas nuevas;
+- puesto(s) y el id del acta más nueva de cada uno (`feed.latest_id`);
+- zona horaria de la organización (cambia cómo se muestran las horas);
+- una marca del despliegue (plantillas y estáticos) para que una versión
+  nueva no se sirva con el HTML viejo.
+
+Si el navegador manda `If-None-Match` con el mismo valor se responde `304`
+sin cuerpo. Las respuestas llevan `Cache-Control: private, no-cache`: el
+navegador guarda la copia pero revalida siempre, y ningún proxy compartido
+la guarda.
+
+Las páginas HTML llevan formularios con token CSRF, que vence a los
+`WTF_CSRF_TIME_LIMIT` segundos; el ETag de HTML rota cada media vigencia
+para que un 304 nunca devuelva una página con el token vencido. Tampoco se
+pone ETag a una página que mostró mensajes flash (al refrescar ya no están).
+
+Los adjuntos y los archivos de exportación masiva tienen sus propios
+validadores (hash del contenido, fecha del archivo; ver app/attachments.py y
+`send_file`).
+"""
+
+import hashlib
+import os
+import time
+
+from flask import Response, current_app, request, session
+
+
+DEFAULT_CSRF_TIME_LIMIT = 3600
+
+
+def _deploy_mark(app):
+    """Última modificación de plantillas y estáticos: igual en todos los workers de un mismo despliegue."""
+    latest = 0
+    for folder in (app.template_folder, app.static_folder):
+        if not folder:
+            continue
+        root = os.path.join(app.root_path, folder)
+        for dirpath, _dirs, files in os.walk(root):
+            for name in files:
+                try:
+                    latest = max(latest, os.stat(os.path.join(dirpath, name)).st_mtime_ns)
+                except OSError:
+                    pass
+    return str(latest)
+
+
+def init_app(app):
+    app.extensions['conditional_deploy_mark'] = app.config.get('ETAG_SALT') or _deploy_mark(app)
+
+
+def _csrf_bucket():
+    limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', DEFAULT_CSRF_TIME_LIMIT)
+    if not limit or not current_app.config.get('WTF_CSRF_ENABLED', True):
+        return ''
+    return str(int(time.time() // max(limit // 2, 1)))
+
+
+def make_etag(*parts, html=False):
+    """ETag (sin comillas) de las partes dadas. Con `html=True` rota junto con el token CSRF."""
+    mark = current_app.extensions.get('conditional_deploy_mark', '')
+    raw = '|'.join(['' if p is None else str(p) for p in parts] + [mark, _csrf_bucket() if html else ''])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def layout_mark(user):
+    """Datos del usuario y de la sesión que se muestran en base.html (ya cargados: sin consultas)."""
+    return hashlib.sha1('|'.join(str(p) for p in (
+        user.nombre_completo, user.dni, user.rol_id, user.barrio_admin_id,
+        session.get('current_barrio_nombre'), session.get('current_barrio'),
+    )).encode('utf-8')).hexdigest()[:16]
+
+
+def has_pending_flashes():
+    """True si la próxima página va a mostrar mensajes flash (no se cachea)."""
+    return bool(session.get('_flashes'))
+
+
+def _revalidate(response, etag):
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag):
+    """304 si el navegador ya tiene esta versión (`If-None-Match`), o None."""
+    if request.method not in ('GET', 'HEAD') or not request.if_none_match.contains_weak(etag):
+        return None
+    return _revalidate(Response(status=304), etag)
+
+
+def with_etag(response, etag):
+    """Agrega el validador (y `private, no-cache`) a una respuesta 200."""
+    if response.status_code != 200:
+        return response
+    return _revalidate(response, etag)
@@ -0,0 +1,145 @@
+# app/db_routing.py
+
+"""
+Pool de conexiones configurable y lecturas en réplicas.
+
+Las réplicas se configuran con `DB_REPLICA_URLS` (URIs separadas por coma) y
+quedan como binds `replica_0`, `replica_1`, ... de Flask-SQLAlchemy, con las
+mismas opciones de pool que el primario. `RoutingSession` decide el engine
+de cada sentencia:
+
+- Por defecto todo va al primario.
+- Dentro de una vista marcada con `@read_replica` (feed, búsqueda,
+  exportaciones, paneles) o de un bloque `with replica_reads():` (trabajos en
+  segundo plano), los SELECT van a una réplica elegida al azar, siempre la
+  misma durante la sesión.
+- Lo que escribe (flush, INSERT/UPDATE/DELETE, SQL textual que no sea un
+  SELECT, SELECT ... FOR UPDATE) va al primario, y desde ese momento también las lecturas de esa
+  sesión: se lee lo que se acaba de escribir.
+- Read-after-write entre requests: si un request escribió, durante
+  `DB_READ_AFTER_WRITE_SECONDS` ese usuario lee del primario (marca en la
+  cookie de sesión). Así el guardia que registra un acta la ve al volver al
+  feed aunque la réplica venga con unos segundos de atraso.
+
+Para probarlo en local alcanza con dos archivos SQLite (el segundo, copia del
+primero) o dos bases PostgreSQL: `DB_REPLICA_URLS=sqlite:////tmp/replica.db`.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
+
+
+REPLICA_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+SESSION_PRIMARY_UNTIL = '_db_primario_hasta'
+
+# Opciones de pool que no aplican a SQLite (usa StaticPool en memoria / un solo escritor)
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+_replica_scope = ContextVar('replica_scope', default=False)
+
+
+def _is_read(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == 'SELECT'
+    return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+
+def _replica_allowed():
+    if _replica_scope.get():
+        return True
+    return has_request_context() and g.get('_db_replica', False)
+
+
+class RoutingSession(Session):
+    """Sesión de Flask-SQLAlchemy que manda las lecturas permitidas a una réplica."""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self._replica_key = None
+        self._primary_only = False
+
+    def stick_to_primary(self):
+        """El resto de la sesión lee y escribe en el primario."""
+        self._primary_only = True
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if self._flushing or not _is_read(clause):
+            if not self._primary_only:
+                self._primary_only = True
+                if has_request_context():
+                    g._db_wrote = True
+        elif not self._primary_only and _replica_allowed():
+            engines = self._db.engines
+            if self._replica_key is None:
+                replicas = [key for key in engines if isinstance(key, str) and key.startswith(REPLICA_PREFIX)]
+                self._replica_key = random.choice(replicas) if replicas else False
+            if self._replica_key:
+                return engines[self._replica_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """Marca una vista de solo lectura: sus SELECT pueden ir a una réplica (solo GET/HEAD)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in READ_METHODS and session.get(SESSION_PRIMARY_UNTIL, 0) < time.time():
+            g._db_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def replica_reads():
+    """Lecturas en réplica fuera de un request (hilos y procesos de exportación)."""
+    token = _replica_scope.set(True)
+    try:
+        yield
+    finally:
+        _replica_scope.reset(token)
+
+
+def _engine_options(url, options):
+    options = dict(options)
+    if make_url(url).get_backend_name() == 'sqlite':
+        for key in QUEUE_POOL_OPTIONS:
+            options.pop(key, None)
+    return options
+
+
+def configure(app):
+    """Ajusta opciones de engine y agrega los binds de réplica. Llamar antes de `db.init_app`."""
+    config = app.config
+    base_options = config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(config['SQLALCHEMY_DATABASE_URI'], base_options)
+
+    binds = {key: value for key, value in (config.get('SQLALCHEMY_BINDS') or {}).items()
+             if not key.startswith(REPLICA_PREFIX)}
+    for i, url in enumerate(config.get('DB_REPLICA_URLS') or ()):
+        binds[f'{REPLICA_PREFIX}{i}'] = {'url': url, **_engine_options(url, base_options)}
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_app(app):
+    """Recuerda en la cookie que el usuario escribió, para leer del primario un rato."""
+    window = app.config.get('DB_READ_AFTER_WRITE_SECONDS', 5)
+    if not app.config.get('DB_REPLICA_URLS') or window <= 0:
+        return
+
+    @app.after_request
+    def remember_write(response):
+        if g.get('_db_wrote'):
+            session[SESSION_PRIMARY_UNTIL] = time.time() + window
+        return response
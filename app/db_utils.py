@@ -0,0 +1,56 @@
+# app/db_utils.py
+
+"""
+Sentencias que cada motor escribe distinto.
+
+`upsert` arma un INSERT que, si la fila ya existe según una restricción única,
+actualiza las columnas indicadas en lugar de fallar:
+
+- SQLite / PostgreSQL: `INSERT ... ON CONFLICT (cols) DO UPDATE SET ...`
+- MySQL / MariaDB:     `INSERT ... ON DUPLICATE KEY UPDATE ...`
+
+Con una lista de diccionarios se ejecuta como executemany: N filas en una sola
+llamada, sin SELECT previo por fila. Con `increment_columns` la fila existente
+suma en lugar de pisar (`col = col + excluded.col`): así se mantienen
+contadores sin leerlos antes (ver app/rollups.py).
+"""
+
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app import db
+
+
+_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+    'mysql': mysql.insert,
+    'mariadb': mysql.insert,
+}
+
+
+def upsert_statement(table, conflict_columns, update_columns=(), dialect=None, increment_columns=()):
+    """
+    INSERT con actualización ante conflicto sobre `conflict_columns` (que tienen
+    que formar una restricción única; MySQL usa la que choque, sin nombrarla).
+    `update_columns` se pisan con el valor nuevo; `increment_columns` suman el
+    valor nuevo al existente (contadores).
+    """
+    dialect = dialect or db.session.get_bind().dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f'Upsert no soportado para {dialect}.')
+    stmt = _INSERTS[dialect](table)
+    new = stmt.inserted if dialect in ('mysql', 'mariadb') else stmt.excluded
+    set_ = {c: new[c] for c in update_columns}
+    set_.update({c: table.c[c] + new[c] for c in increment_columns})
+    if dialect in ('mysql', 'mariadb'):
+        return stmt.on_duplicate_key_update(set_)
+    return stmt.on_conflict_do_update(index_elements=list(conflict_columns), set_=set_)
+
+
+def upsert(table, rows, conflict_columns, update_columns=(), increment_columns=()):
+    """Inserta o actualiza `rows` (lista de dicts) en una sola sentencia executemany. Devuelve cuántas filas envió."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    db.session.execute(upsert_statement(table, conflict_columns, update_columns,
+                                        increment_columns=increment_columns), rows)
+    return len(rows)
@@ -0,0 +1,127 @@
+# app/derivatives.py
+
+"""
+Derivados precalculados de los adjuntos: miniaturas de imágenes y vista previa
+de la primera página de los PDF.
+
+Se generan una sola vez y quedan al lado del original
+(`objetos/ab/<sha256>.miniatura.jpg`, `.../<sha256>.impresion.jpg`):
+
+- `miniatura`: la que muestra el feed de `/index`.
+- `impresion`: la que se embebe en el Libro de Actas PDF (en lugar de la foto
+  original de varios MB, que había que decodificar y embeber entera).
+
+Al guardar un adjunto se encola la generación en un pool de hilos
+(`schedule`), fuera del request. Para adjuntos viejos, o si el pool todavía
+no llegó, `ensure` los genera a demanda la primera vez que se piden.
+
+La vista previa de PDF necesita PyMuPDF (opcional); sin él los PDF se siguen
+mostrando como enlace.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+try:
+    import pymupdf
+except ImportError:  # dependencia opcional
+    pymupdf = None
+
+
+# variante -> (ancho, alto) máximo
+VARIANTS = {
+    'miniatura': (320, 320),
+    'impresion': (400, 300),  # 2x del recuadro de imagen del PDF (200x150 pt)
+}
+JPEG_QUALITY = 80
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+PDF_EXTENSIONS = ('.pdf',)
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def previewable(filename):
+    """True si para ese nombre de archivo se puede generar un derivado."""
+    name = (filename or '').lower()
+    return name.endswith(IMAGE_EXTENSIONS) or (pymupdf is not None and name.endswith(PDF_EXTENSIONS))
+
+
+def derivative_path(original_path, variant):
+    return f'{original_path}.{variant}.jpg'
+
+
+def _open_source(original_path, filename, size):
+    """Imagen PIL del original (o de la primera página si es PDF), ya reducida lo más posible al decodificar."""
+    if (filename or '').lower().endswith(PDF_EXTENSIONS):
+        with pymupdf.open(original_path) as doc:
+            page = doc[0]
+            zoom = min(size[0] / page.rect.width, size[1] / page.rect.height, 2)
+            pix = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+    image = Image.open(original_path)
+    # JPEG: decodifica directamente a 1/2, 1/4 u 1/8 (mucho más rápido que reducir después)
+    image.draft('RGB', size)
+    return ImageOps.exif_transpose(image)
+
+
+def generate(original_path, filename, variants=tuple(VARIANTS)):
+    """Genera (si faltan) los derivados de un original. No necesita contexto de aplicación."""
+    pending = [v for v in variants if not os.path.exists(derivative_path(original_path, v))]
+    if not pending:
+        return
+    size = max((VARIANTS[v] for v in pending), key=lambda s: s[0] * s[1])
+    source = _open_source(original_path, filename, size)
+    if source.mode not in ('RGB', 'L'):
+        source = source.convert('RGBA')
+        background = Image.new('RGB', source.size, 'white')
+        background.paste(source, mask=source.split()[-1])
+        source = background
+    for variant in pending:
+        image = source.copy()
+        image.thumbnail(VARIANTS[variant], Image.LANCZOS)
+        target = derivative_path(original_path, variant)
+        tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+        image.save(tmp, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        os.replace(tmp, target)  # atómico: otro hilo nunca lee uno a medio escribir
+
+
+def _generate_quietly(original_path, filename, logger):
+    try:
+        generate(original_path, filename)
+    except Exception:
+        logger.exception('No se pudieron generar los derivados de %s', original_path)
+
+
+def schedule(app, original_path, filename):
+    """Encola la generación de derivados fuera del request."""
+    global _pool
+    if not original_path or not previewable(filename):
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=app.config.get('DERIVATIVES_WORKERS', 2),
+                                       thread_name_prefix='derivados')
+    _pool.submit(_generate_quietly, original_path, filename, app.logger)
+
+
+def ensure(original_path, filename, variant):
+    """
+    Ruta del derivado pedido, generándolo en el momento si falta (adjuntos
+    anteriores a este pipeline). None si el adjunto no admite derivados o falla.
+    """
+    if not original_path or not previewable(filename):
+        return None
+    path = derivative_path(original_path, variant)
+    if not os.path.exists(path):
+        try:
+            generate(original_path, filename)
+        except Exception:
+            current_app.logger.warning('No se pudo generar %s de %s', variant, original_path, exc_info=True)
+            return None
+    return path
@@ -0,0 +1,120 @@
+# app/directory.py
+
+"""
+Directorio de usuarios de un barrio (pantalla `admin.list_users`).
+
+- Membresía en una sola consulta: EXISTS sobre permisos+puestos del barrio
+  (índices `ix_permisos_puesto_usuario` e `ix_puestos_barrio_id`), sin traer
+  antes los ids de puestos a Python.
+- Búsqueda: solo dígitos -> prefijo de DNI; con '@' -> prefijo de email;
+  si no, prefijo del nombre normalizado (sin tildes) o de cualquiera de sus palabras.
+- Paginación por cursor sobre (nombre_busqueda, id), el mismo índice que sirve
+  a la búsqueda por prefijo de nombre.
+"""
+
+from collections import namedtuple
+
+from app import db
+from app.models import Usuario, Rol, Puesto, PermisoPuesto
+from app.pagination import KeysetPage, decode_cursor, encode_cursor, keyset_condition
+from app.text_utils import fold_accents
+
+
+DirectoryEntry = namedtuple('DirectoryEntry', 'id dni nombre_completo email rol_nombre permisos')
+PermisoRef = namedtuple('PermisoRef', 'puesto_id puesto_nombre puede_ver puede_editar')
+
+
+def _like_prefix(value):
+    """Escapa comodines de LIKE y agrega el '%' final."""
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+
+def barrio_members_condition(barrio_id):
+    """EXISTS: el usuario tiene al menos un permiso en algún puesto del barrio."""
+    return (
+        db.select(PermisoPuesto.id)
+        .join(Puesto, PermisoPuesto.puesto_id == Puesto.id)
+        .where(PermisoPuesto.usuario_id == Usuario.id, Puesto.barrio_id == barrio_id)
+        .exists()
+    )
+
+
+def search_condition(term):
+    """Condición de búsqueda según la forma del término (None si no hay término)."""
+    term = (term or '').strip()
+    if not term:
+        return None
+    if term.isdigit():
+        return Usuario.dni.like(_like_prefix(term), escape='\\')
+    if '@' in term:
+        return Usuario.email.like(_like_prefix(term.lower()), escape='\\')
+    folded = fold_accents(term)
+    return db.or_(
+        Usuario.nombre_busqueda.like(_like_prefix(folded), escape='\\'),
+        Usuario.nombre_busqueda.like('% ' + _like_prefix(folded), escape='\\'),
+    )
+
+
+def permisos_by_user(usuario_ids, barrio_id):
+    """{usuario_id: [PermisoRef, ...]} de los puestos del barrio, en una sola consulta."""
+    ids = list(usuario_ids)
+    result = {i: [] for i in ids}
+    if not ids:
+        return result
+    rows = db.session.execute(
+        db.select(PermisoPuesto.usuario_id, Puesto.id, Puesto.nombre,
+                  PermisoPuesto.puede_ver, PermisoPuesto.puede_editar)
+        .join(Puesto, PermisoPuesto.puesto_id == Puesto.id)
+        .where(PermisoPuesto.usuario_id.in_(ids), Puesto.barrio_id == barrio_id)
+        .order_by(Puesto.nombre)
+    )
+    for usuario_id, puesto_id, puesto_nombre, puede_ver, puede_editar in rows:
+        result[usuario_id].append(PermisoRef(puesto_id, puesto_nombre, puede_ver, puede_editar))
+    return result
+
+
+def barrio_directory(barrio_id, term=None, after=None, before=None, per_page=15):
+    """Página del directorio del barrio como `KeysetPage` de `DirectoryEntry`."""
+    key = (Usuario.nombre_busqueda, Usuario.id)
+    after_key = decode_cursor(after, str, int)
+    before_key = decode_cursor(before, str, int) if after_key is None else None
+
+    query = (
+        db.select(Usuario.id, Usuario.dni, Usuario.nombre_completo, Usuario.email,
+                  Usuario.nombre_busqueda, Rol.nombre)
+        .join(Rol, Usuario.rol_id == Rol.id)
+        .where(barrio_members_condition(barrio_id))
+    )
+    condition = search_condition(term)
+    if condition is not None:
+        query = query.where(condition)
+
+    if before_key is not None:
+        # Página anterior: se recorre hacia atrás desde el cursor y después se invierte.
+        query = query.where(keyset_condition(key, before_key, descending=True))
+        query = query.order_by(Usuario.nombre_busqueda.desc(), Usuario.id.desc())
+    else:
+        if after_key is not None:
+            query = query.where(keyset_condition(key, after_key, descending=False))
+        query = query.order_by(Usuario.nombre_busqueda.asc(), Usuario.id.asc())
+
+    rows = db.session.execute(query.limit(per_page + 1)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before_key is not None:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after_key is not None
+
+    permisos = permisos_by_user((r[0] for r in rows), barrio_id)
+    entries = [
+        DirectoryEntry(u_id, dni, nombre, email, rol_nombre, permisos[u_id])
+        for u_id, dni, nombre, email, _busqueda, rol_nombre in rows
+    ]
+    return KeysetPage(
+        entries,
+        next_cursor=encode_cursor(rows[-1][4], rows[-1][0]) if rows and has_next else None,
+        prev_cursor=encode_cursor(rows[0][4], rows[0][0]) if rows and has_prev else None,
+    )
@@ -0,0 +1,373 @@
+# app/export_jobs.py
+
+"""
+Exportación masiva del Libro de Actas en segundo plano.
+
+Un pedido de exportación (varios puestos + filtros) se registra como fila en
+`export_jobs` y se responde enseguida; el render nunca ocupa el worker web.
+
+- Un hilo coordinador por trabajo (pool chico, `EXPORT_MAX_JOBS`) reparte un
+  puesto por tarea a un pool de procesos (`EXPORT_WORKERS`), así varios puestos
+  se dibujan en paralelo sin pelear por el GIL. Con más de un puesto el
+  resultado es un ZIP con un PDF por puesto.
+- Resultado cacheado en disco (`EXPORT_FOLDER`) con clave
+  (puestos, filtros, id de la última acta incluida): si nadie registró actas
+  nuevas desde la última exportación igual, se sirve el archivo existente.
+
+Solo usa disco local y la base de datos; no hace falta broker. Si el proceso
+web se reinicia con trabajos en curso, esos trabajos vencen a los
+`EXPORT_JOB_TIMEOUT` segundos y se marcan con error.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from flask import current_app
+from app import db, db_routing
+from app.models import Acta, ActaArchivada, Barrio, ExportJob, Puesto
+from app.template_filters import current_zone_name
+
+
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_PROCESANDO = 'procesando'
+ESTADO_LISTO = 'listo'
+ESTADO_ERROR = 'error'
+ESTADOS_EN_CURSO = (ESTADO_PENDIENTE, ESTADO_PROCESANDO)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ---------------------------
+# Filtros y clave de cache
+# ---------------------------
+
+def normalize_filters(query_text=None, start_date=None, end_date=None):
+    """Filtros como dict serializable (fechas en ISO); es lo que se guarda en el trabajo."""
+    return {
+        'query': (query_text or '').strip() or None,
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+    }
+
+
+def parse_filters(filtros):
+    """(query_text, start_date, end_date) a partir del dict de `normalize_filters`."""
+    filtros = filtros or {}
+    start = filtros.get('start_date')
+    end = filtros.get('end_date')
+    return (
+        filtros.get('query'),
+        date.fromisoformat(start) if start else None,
+        date.fromisoformat(end) if end else None,
+    )
+
+
+def max_acta_id(puesto_ids, filtros):
+    """Id de la acta más reciente que entraría en la exportación (None si no hay ninguna)."""
+    from app.search import apply_text_filter, date_filters
+
+    query_text, start_date, end_date = parse_filters(filtros)
+    ids = []
+    for t in (Acta.__table__, ActaArchivada.__table__):  # el archivo cuenta: puede ser todo lo que hay
+        query = db.select(db.func.max(t.c.id)).where(t.c.puesto_id.in_(list(puesto_ids)))
+        for f in date_filters(t.c.fecha_creacion, start_date, end_date, filtros.get('zona_horaria')):
+            query = query.where(f)
+        query = apply_text_filter(query, query_text, t)
+        ids.append(db.session.scalar(query))
+    return max((i for i in ids if i is not None), default=None)
+
+
+def cache_key(puesto_ids, filtros, max_id):
+    """Clave estable del resultado: mismo conjunto de puestos, filtros y última acta -> mismo archivo."""
+    payload = json.dumps([sorted(puesto_ids), filtros, max_id], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def export_folder():
+    folder = current_app.config['EXPORT_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def result_filename(key, puesto_count):
+    return f'{key}.pdf' if puesto_count == 1 else f'{key}.zip'
+
+
+def result_path(archivo):
+    return os.path.join(export_folder(), archivo)
+
+
+def cached_result(key, puesto_count):
+    """Nombre del archivo ya generado para `key`, o None."""
+    archivo = result_filename(key, puesto_count)
+    return archivo if os.path.isfile(result_path(archivo)) else None
+
+
+# ---------------------------
+# Pools (por proceso web)
+# ---------------------------
+
+_pools_lock = threading.Lock()
+_job_pool = None
+_render_pool = None
+KEY_LOCK_STRIPES = 64
+_key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+
+
+def _pools():
+    """(pool de hilos coordinadores, pool de procesos de render), creados a demanda."""
+    global _job_pool, _render_pool
+    with _pools_lock:
+        if _job_pool is None:
+            config = current_app.config
+            _job_pool = ThreadPoolExecutor(max_workers=config.get('EXPORT_MAX_JOBS', 2),
+                                           thread_name_prefix='export-job')
+            # 'spawn': el hijo arranca limpio (sin heredar conexiones de la base ni hilos del padre)
+            _render_pool = ProcessPoolExecutor(
+                max_workers=config.get('EXPORT_WORKERS') or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _job_pool, _render_pool
+
+
+def _key_lock(key):
+    """
+    Lock de la clave: dos pedidos iguales en simultáneo generan el archivo una
+    sola vez. Conjunto fijo de locks repartidos por la clave (hash sha256 en
+    hex); dos claves distintas que caen en el mismo se esperan, nada más.
+    """
+    return _key_locks[int(key[:8], 16) % KEY_LOCK_STRIPES]
+
+
+def worker_config(app):
+    """Configuración que viaja a los procesos de render (solo claves serializables)."""
+    config = {}
+    for key, value in app.config.items():
+        if not key.isupper():
+            continue
+        try:
+            pickle.dumps(value)
+        except Exception:
+            continue
+        config[key] = value
+    return config
+
+
+# ---------------------------
+# Lado del proceso de render
+# ---------------------------
+
+_worker_app = None
+
+
+def _get_worker_app(config):
+    global _worker_app
+    if _worker_app is None:
+        from app import create_app
+        _worker_app = create_app(SimpleNamespace(**config))
+    return _worker_app
+
+
+def render_puesto_pdf(config, puesto_id, puesto_nombre, barrio_nombre, filtros, max_id, path):
+    """Tarea del pool de procesos: dibuja el libro de un puesto en `path`. Devuelve la cantidad de actas."""
+    from app import feed, pdf_export
+
+    app = _get_worker_app(config)
+    with app.app_context(), db_routing.replica_reads():
+        try:
+            # El libro se corta en max_id (parte de la clave de cache): si la réplica todavía
+            # no llegó hasta ahí, se lee del primario para no cachear un libro incompleto
+            if max_id and (db.session.scalar(db.select(db.func.max(Acta.id))) or 0) < max_id:
+                db.session().stick_to_primary()
+            query_text, start_date, end_date = parse_filters(filtros)
+            rows = feed.stream_actas([puesto_id], start_date, end_date, query_text, max_id=max_id,
+                                     zone=filtros.get('zona_horaria'))
+            with open(path, 'wb') as fileobj:
+                return pdf_export.render_libro(
+                    fileobj, rows, barrio_nombre, puesto_nombre,
+                    filtros=pdf_export.describe_filters(query_text, start_date, end_date),
+                    zone=filtros.get('zona_horaria'),
+                )
+        finally:
+            db.session.remove()
+
+
+# ---------------------------
+# Coordinador (hilo del proceso web)
+# ---------------------------
+
+def _safe_name(text):
+    return ''.join(c if c.isalnum() else '_' for c in text).strip('_') or 'puesto'
+
+
+def _render_job(job, render_pool, config):
+    """Reparte los puestos del trabajo entre procesos y arma el archivo final. Devuelve su nombre."""
+    puesto_ids = [int(i) for i in job.puesto_ids.split(',')]
+    filtros = json.loads(job.filtros) if job.filtros else {}
+    puestos = db.session.execute(
+        db.select(Puesto.id, Puesto.nombre, Barrio.nombre)
+        .join(Barrio, Puesto.barrio_id == Barrio.id)
+        .where(Puesto.id.in_(puesto_ids))
+        .order_by(Puesto.nombre)
+    ).all()
+
+    folder = export_folder()
+    archivo = result_filename(job.cache_key, len(puesto_ids))
+    parts = []
+    futures = []
+    try:
+        for puesto_id, puesto_nombre, barrio_nombre in puestos:
+            part = os.path.join(folder, f'{job.id}.{puesto_id}.part')
+            parts.append((part, f'libro_actas_{_safe_name(barrio_nombre)}_{_safe_name(puesto_nombre)}.pdf'))
+            futures.append(render_pool.submit(render_puesto_pdf, config, puesto_id, puesto_nombre,
+                                              barrio_nombre, filtros, job.max_acta_id, part))
+        for future in futures:
+            future.result()
+
+        tmp = os.path.join(folder, f'{job.id}.tmp')
+        if len(puesto_ids) == 1:
+            os.replace(parts[0][0], tmp)
+        else:
+            # Los PDF ya van comprimidos: ZIP_STORED evita recomprimir.
+            with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as zf:
+                for part, arcname in parts:
+                    zf.write(part, arcname)
+        os.replace(tmp, os.path.join(folder, archivo))  # atómico: nunca se sirve un archivo a medio escribir
+        return archivo
+    finally:
+        # Si una parte falló, las demás pueden seguir escribiendo su .part: se cancelan
+        # las que no arrancaron y se espera a las que están en curso antes de borrar
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        for part, _arcname in parts:
+            if os.path.exists(part):
+                os.remove(part)
+
+
+def _run_job(app, job_id, config):
+    with app.app_context():
+        try:
+            job = db.session.get(ExportJob, job_id)
+            if job is None:
+                return
+            job.estado = ESTADO_PROCESANDO
+            db.session.commit()
+            _job_pool, render_pool = _pools()
+            puesto_count = len(job.puesto_ids.split(','))
+            try:
+                with _key_lock(job.cache_key):
+                    archivo = cached_result(job.cache_key, puesto_count) or _render_job(job, render_pool, config)
+                job.archivo = archivo
+                job.estado = ESTADO_LISTO
+            except Exception as exc:
+                current_app.logger.exception('Falló la exportación %s', job_id)
+                db.session.rollback()
+                job = db.session.get(ExportJob, job_id)
+                job.estado = ESTADO_ERROR
+                job.error = str(exc)[:500] or exc.__class__.__name__
+            job.terminado = _utcnow()
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+# ---------------------------
+# API para las vistas
+# ---------------------------
+
+def submit_export(usuario_id, barrio_id, puesto_ids, query_text=None, start_date=None, end_date=None):
+    """
+    Registra un trabajo y lo encola. Si el resultado ya está en cache el trabajo
+    nace terminado; si el mismo usuario ya pidió lo mismo y sigue en curso, se
+    devuelve ese trabajo.
+    """
+    puesto_ids = sorted(set(puesto_ids))
+    filtros = normalize_filters(query_text, start_date, end_date)
+    # La zona horaria cambia el contenido del libro (agrupación por día, horas): entra en la clave
+    filtros['zona_horaria'] = current_zone_name()
+    max_id = max_acta_id(puesto_ids, filtros)
+    key = cache_key(puesto_ids, filtros, max_id)
+
+    en_curso = db.session.scalar(
+        db.select(ExportJob)
+        .where(ExportJob.usuario_id == usuario_id, ExportJob.cache_key == key,
+               ExportJob.estado.in_(ESTADOS_EN_CURSO))
+        .limit(1)
+    )
+    if en_curso is not None and not expire_if_stale(en_curso):
+        return en_curso
+
+    job = ExportJob(
+        id=uuid.uuid4().hex, usuario_id=usuario_id, barrio_id=barrio_id,
+        puesto_ids=','.join(str(i) for i in puesto_ids), filtros=json.dumps(filtros),
+        max_acta_id=max_id, cache_key=key, estado=ESTADO_PENDIENTE, creado=_utcnow(),
+    )
+    archivo = cached_result(key, len(puesto_ids))
+    if archivo:
+        job.archivo = archivo
+        job.estado = ESTADO_LISTO
+        job.terminado = job.creado
+    db.session.add(job)
+    db.session.commit()
+
+    if not archivo:
+        app = current_app._get_current_object()
+        job_pool, _render_pool = _pools()
+        job_pool.submit(_run_job, app, job.id, worker_config(app))
+    return job
+
+
+def expire_if_stale(job):
+    """Marca con error un trabajo en curso que superó EXPORT_JOB_TIMEOUT (p. ej. tras un reinicio)."""
+    if job.estado not in ESTADOS_EN_CURSO or job.creado is None:
+        return False
+    timeout = current_app.config.get('EXPORT_JOB_TIMEOUT', 3600)
+    if _utcnow() - job.creado < timedelta(seconds=timeout):
+        return False
+    job.estado = ESTADO_ERROR
+    job.error = 'La exportación no terminó a tiempo.'
+    job.terminado = _utcnow()
+    db.session.commit()
+    return True
+
+
+def get_job_for_user(job_id, usuario_id):
+    """El trabajo si pertenece al usuario, si no None."""
+    job = db.session.get(ExportJob, job_id)
+    if job is None or job.usuario_id != usuario_id:
+        return None
+    expire_if_stale(job)
+    return job
+
+
+def purge_results(max_age_hours):
+    """Borra archivos generados y trabajos terminados más viejos que `max_age_hours`. Devuelve (archivos, trabajos)."""
+    folder = export_folder()
+    cutoff = time.time() - max_age_hours * 3600
+    removed_files = 0
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed_files += 1
+    result = db.session.execute(
+        db.delete(ExportJob).where(
+            ExportJob.estado.in_((ESTADO_LISTO, ESTADO_ERROR)),
+            ExportJob.creado < _utcnow() - timedelta(hours=max_age_hours),
+        )
+    )
+    db.session.commit()
+    return removed_files, result.rowcount
@@ -0,0 +1,185 @@
+# app/export_routes.py
+
+import os
+
+from flask import (
+    Blueprint, Response, abort, flash, jsonify, redirect, render_template, request,
+    send_file, session, stream_with_context, url_for
+)
+from flask_login import current_user, login_required
+from app import conditional, export_jobs, feed, pdf_export, tabular_export
+from app.access import get_access
+from app.db_routing import read_replica
+from app.forms import ExportJobForm, SearchForm
+from app.template_filters import current_zone_name
+
+
+export_bp = Blueprint('export', __name__, url_prefix='/export')
+
+
+def export_filters():
+    """(query, start_date, end_date) desde el querystring, con la misma validación que el buscador."""
+    form = SearchForm(request.args)
+    if not form.validate():
+        abort(400)
+    return form.query.data, form.start_date.data, form.end_date.data
+
+
+def export_etag(kind, access, puesto_ids):
+    """Validador de una exportación: mismos accesos, filtros y acta más nueva de cada puesto = mismo archivo."""
+    latest = [feed.latest_id(p_id) for p_id in sorted(puesto_ids)]
+    return conditional.make_etag(kind, current_user.id, access.version, sorted(puesto_ids), latest,
+                                 request.query_string.decode('utf-8', 'replace'), current_zone_name(),
+                                 session.get('current_barrio_id'))
+
+
+@export_bp.route('/libro/<int:puesto_id>.pdf')
+@login_required
+@read_replica
+def libro_pdf(puesto_id):
+    """Libro de Actas de un puesto en PDF (respeta los filtros del buscador)."""
+    access = get_access(current_user)
+    puesto = access.find_puesto(puesto_id)
+    if puesto is None:
+        abort(404)
+    barrio = access.barrio(puesto.barrio_id)
+    query_text, start_date, end_date = export_filters()
+    etag = export_etag('libro', access, [puesto.id])
+    cached = conditional.not_modified(etag)
+    if cached is not None:
+        return cached
+
+    pdf = pdf_export.stream_libro_pdf(
+        puesto, barrio.nombre if barrio else session.get('current_barrio_nombre', ''),
+        start_date=start_date, end_date=end_date, query_text=query_text,
+    )
+    filename = f'libro_actas_{puesto.id}.pdf'
+    return conditional.with_etag(Response(
+        stream_with_context(pdf),
+        mimetype='application/pdf',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    ), etag)
+
+
+# ---------------------------
+# Exportaciones tabulares (CSV / XLSX)
+# ---------------------------
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def tabular_response(formato, filename, title, header, rows):
+    """Respuesta en streaming: CSV generado fila a fila o XLSX write-only."""
+    disposition = {'Content-Disposition': f'attachment; filename="{filename}.{formato}"'}
+    if formato == 'csv':
+        return Response(stream_with_context(tabular_export.iter_csv(header, rows)),
+                        mimetype='text/csv', headers=disposition)
+    xlsx = tabular_export.build_xlsx(title, header, rows)
+    return Response(pdf_export.iter_file(xlsx), mimetype=XLSX_MIMETYPE, headers=disposition)
+
+
+@export_bp.route('/actas.<any(csv, xlsx):formato>')
+@login_required
+@read_replica
+def actas_tabular(formato):
+    """
+    Actas de los puestos pedidos (`puesto_id` repetible; por defecto todos los
+    visibles del barrio actual) con los filtros del buscador.
+    """
+    access = get_access(current_user)
+    barrio_id = session.get('current_barrio_id')
+    pedidos = request.args.getlist('puesto_id', type=int)
+    if pedidos:
+        puestos = [access.find_puesto(p_id) for p_id in pedidos]
+        if any(p is None for p in puestos):
+            abort(404)
+    else:
+        puestos = access.puestos_visibles(barrio_id) if barrio_id else []
+    if not puestos:
+        abort(404)
+    query_text, start_date, end_date = export_filters()
+    etag = export_etag(f'actas.{formato}', access, [p.id for p in puestos])
+    cached = conditional.not_modified(etag)
+    if cached is not None:
+        return cached
+
+    rows = tabular_export.acta_rows({p.id: p.nombre for p in puestos}, start_date, end_date, query_text)
+    return conditional.with_etag(
+        tabular_response(formato, 'actas', 'Actas', tabular_export.ACTAS_HEADER, rows), etag)
+
+
+@export_bp.route('/usuarios.<any(csv, xlsx):formato>')
+@login_required
+@read_replica
+def usuarios_tabular(formato):
+    """Usuarios del barrio actual con sus permisos por puesto (solo administradores del barrio)."""
+    barrio_id = session.get('current_barrio_id')
+    if not barrio_id or not get_access(current_user).is_admin_of(barrio_id):
+        abort(403)
+    rows = tabular_export.usuario_rows(barrio_id)
+    return tabular_response(formato, 'usuarios', 'Usuarios', tabular_export.USUARIOS_HEADER, rows)
+
+
+# ---------------------------
+# Exportación masiva (en segundo plano)
+# ---------------------------
+
+def job_payload(job):
+    return {
+        'id': job.id,
+        'estado': job.estado,
+        'error': job.error,
+        'descarga': url_for('export.job_download', job_id=job.id) if job.estado == export_jobs.ESTADO_LISTO else None,
+    }
+
+
+@export_bp.route('/jobs', methods=['POST'])
+@login_required
+def submit_job():
+    """Encola la exportación de los puestos elegidos del barrio actual y redirige al estado del trabajo."""
+    barrio_id = session.get('current_barrio_id')
+    access = get_access(current_user)
+    if not barrio_id or not access.has_barrio(barrio_id):
+        abort(403)
+
+    form = ExportJobForm()
+    form.puesto_ids.choices = [(p.id, p.nombre) for p in access.puestos_visibles(barrio_id)]
+    if not form.validate_on_submit():
+        for errores in form.errors.values():
+            for err in errores:
+                flash(f'Exportación: {err}', 'danger')
+        return redirect(url_for('main.index'))
+
+    job = export_jobs.submit_export(
+        current_user.id, barrio_id, form.puesto_ids.data,
+        query_text=form.query.data, start_date=form.start_date.data, end_date=form.end_date.data,
+    )
+    return redirect(url_for('export.job_status', job_id=job.id))
+
+
+@export_bp.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    """Estado del trabajo: JSON para consultas programáticas, HTML (con auto-refresco) para el navegador."""
+    job = export_jobs.get_job_for_user(job_id, current_user.id)
+    if job is None:
+        abort(404)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job_payload(job))
+    return render_template('export/job.html', title='Exportación', job=job,
+                           en_curso=job.estado in export_jobs.ESTADOS_EN_CURSO)
+
+
+@export_bp.route('/jobs/<job_id>/descargar')
+@login_required
+def job_download(job_id):
+    job = export_jobs.get_job_for_user(job_id, current_user.id)
+    if job is None or job.estado != export_jobs.ESTADO_LISTO or not job.archivo:
+        abort(404)
+    path = export_jobs.result_path(job.archivo)
+    if not os.path.isfile(path):
+        flash('El archivo de esta exportación ya no está disponible. Volvé a pedirla.', 'warning')
+        return redirect(url_for('main.index'))
+    extension = os.path.splitext(job.archivo)[1]
+    fecha = job.creado.strftime('%Y%m%d_%H%M') if job.creado else 'export'
+    return send_file(path, as_attachment=True, download_name=f'libro_actas_{fecha}{extension}')
@@ -0,0 +1,305 @@
+# app/feed.py
+
+"""
+Capa de consulta del listado de actas (feed de `/index`).
+
+Trae solo las columnas que muestra el listado, con el cuerpo recortado a una
+vista previa, y resuelve los autores de toda la página en una única consulta.
+Devuelve filas livianas (`ActaRow`) en vez de instancias ORM trackeadas por la
+sesión, así el costo por página no depende del tamaño del libro.
+
+Las actas viejas viven en `actas_archivo` con el cuerpo comprimido (ver
+app/archive.py). Cada página y cada exportación leen de las dos tablas; las
+consultas sobre el archivo traen `body_z` en lugar del texto y se descomprime acá.
+"""
+
+from datetime import datetime
+
+from flask import current_app
+from app import archive, db, derivatives
+from app.models import Acta, ActaArchivada, Usuario
+from app.pagination import KeysetPage, capped_count, decode_cursor, encode_cursor, keyset_condition
+
+
+class ActaRow:
+    """Fila de solo lectura del feed de actas."""
+
+    __slots__ = ('id', 'classification', 'fecha_creacion', 'puesto_id', 'usuario_id',
+                 'documento_url', 'adjunto_sha256', 'body_preview', 'body_truncated', 'autor_nombre')
+
+    def __init__(self, id, classification, fecha_creacion, puesto_id, usuario_id,
+                 documento_url, adjunto_sha256, body_preview, body_truncated, autor_nombre=None):
+        self.id = id
+        self.classification = classification
+        self.fecha_creacion = fecha_creacion
+        self.puesto_id = puesto_id
+        self.usuario_id = usuario_id
+        self.documento_url = documento_url
+        self.adjunto_sha256 = adjunto_sha256
+        self.body_preview = body_preview
+        self.body_truncated = body_truncated
+        self.autor_nombre = autor_nombre
+
+    @property
+    def has_preview(self):
+        return derivatives.previewable(self.documento_url)
+
+
+def preview_chars():
+    return current_app.config.get('FEED_BODY_PREVIEW_CHARS', 500)
+
+
+def feed_select(table=None):
+    """SELECT con las columnas del listado; el cuerpo viene recortado a N+1 caracteres."""
+    t = table if table is not None else Acta.__table__
+    n = preview_chars()
+    return db.select(
+        t.c.id, t.c.classification, t.c.fecha_creacion, t.c.puesto_id,
+        t.c.usuario_id, t.c.documento_url, t.c.adjunto_sha256,
+        db.func.substr(t.c.body, 1, n + 1).label('body_preview'),
+        db.cast(db.null(), db.LargeBinary).label('body_z'),
+    )
+
+
+def archive_feed_select():
+    """Como `feed_select()` pero sobre `actas_archivo`: el cuerpo viene comprimido entero."""
+    t = ActaArchivada.__table__
+    return db.select(
+        t.c.id, t.c.classification, t.c.fecha_creacion, t.c.puesto_id,
+        t.c.usuario_id, t.c.documento_url, t.c.adjunto_sha256,
+        db.cast(db.null(), db.Text).label('body_preview'),
+        t.c.body_z,
+    )
+
+
+def load_authors(usuario_ids):
+    """{usuario_id: nombre para mostrar} en una sola consulta."""
+    ids = {i for i in usuario_ids if i is not None}
+    if not ids:
+        return {}
+    result = db.session.execute(
+        db.select(Usuario.id, Usuario.nombre_completo, Usuario.dni).where(Usuario.id.in_(ids))
+    )
+    return {u_id: (nombre or dni) for u_id, nombre, dni in result}
+
+
+def rows_from_result(result):
+    """Convierte filas de `feed_select()`/`archive_feed_select()` en `ActaRow` con los autores ya resueltos."""
+    n = preview_chars()
+    rows = []
+    for r in result:
+        if r.body_z is not None:
+            preview = archive.decompress(r.body_z)[:n + 1]
+        else:
+            preview = r.body_preview or ''
+        truncated = len(preview) > n
+        rows.append(ActaRow(r.id, r.classification, r.fecha_creacion, r.puesto_id,
+                            r.usuario_id, r.documento_url, r.adjunto_sha256,
+                            preview[:n] if truncated else preview, truncated))
+    autores = load_authors(row.usuario_id for row in rows)
+    for row in rows:
+        row.autor_nombre = autores.get(row.usuario_id)
+    return rows
+
+
+def page_for_puesto(puesto_id, after=None, before=None, per_page=15):
+    """
+    Página del libro de un puesto ordenada por (fecha_creacion DESC, id DESC).
+
+    `after` pide la página siguiente (más antigua) y `before` la anterior (más
+    reciente); ambos son cursores de `KeysetPage`. Cada página es un rango sobre
+    el índice `ix_actas_puesto_fecha_id`, sin OFFSET ni COUNT(*).
+
+    El mismo rango se pide al archivo (índice `ix_actas_archivo_puesto_fecha_id`)
+    y las dos tandas se intercalan por (fecha, id), sin ids repetidos: como mucho
+    2 * (per_page + 1) filas.
+    """
+    after_key = decode_cursor(after, datetime, int)
+    before_key = decode_cursor(before, datetime, int) if after_key is None else None
+
+    def page_query(query, t):
+        key = (t.c.fecha_creacion, t.c.id)
+        query = query.where(t.c.puesto_id == puesto_id)
+        if before_key is not None:
+            # Hacia atrás: orden ascendente desde el cursor y después se invierte.
+            query = query.where(keyset_condition(key, before_key, descending=False))
+            query = query.order_by(t.c.fecha_creacion.asc(), t.c.id.asc())
+        else:
+            if after_key is not None:
+                query = query.where(keyset_condition(key, after_key))
+            query = query.order_by(t.c.fecha_creacion.desc(), t.c.id.desc())
+        return query.limit(per_page + 1)
+
+    # Un acta archivada entre las dos lecturas viene en ambas: se deja una sola
+    unique = {}
+    for row in (*db.session.execute(page_query(feed_select(), Acta.__table__)),
+                *db.session.execute(page_query(archive_feed_select(), ActaArchivada.__table__))):
+        unique.setdefault(row.id, row)
+    merged = list(unique.values())
+    merged.sort(key=lambda r: (r.fecha_creacion, r.id), reverse=before_key is None)
+    rows = rows_from_result(merged[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before_key is not None:
+        rows.reverse()
+        has_older, has_newer = True, has_more
+    else:
+        has_older, has_newer = has_more, after_key is not None
+
+    total, total_exact = count_for_puesto(puesto_id, current_app.config.get('FEED_COUNT_CAP', 0))
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1].fecha_creacion, rows[-1].id) if rows and has_older else None,
+        prev_cursor=encode_cursor(rows[0].fecha_creacion, rows[0].id) if rows and has_newer else None,
+        total=total,
+        total_exact=total_exact,
+    )
+
+
+def latest_id(puesto_id):
+    """Id del acta más nueva del puesto en orden del feed (primera fila de `ix_actas_puesto_fecha_id`), o None."""
+    return db.session.scalar(
+        db.select(Acta.id).where(Acta.puesto_id == puesto_id)
+        .order_by(Acta.fecha_creacion.desc(), Acta.id.desc()).limit(1)
+    )
+
+
+def rows_after(puesto_id, after_id, limit):
+    """
+    Actas del puesto con id mayor que `after_id`, más nueva primero, hasta
+    `limit` (feed en vivo: actas recién registradas y reenvío al reconectar).
+    Solo la tabla caliente: lo nuevo nunca está archivado.
+    """
+    result = db.session.execute(
+        feed_select().where(Acta.puesto_id == puesto_id, Acta.id > after_id)
+        .order_by(Acta.id.desc()).limit(limit)
+    )
+    return rows_from_result(result)
+
+
+def rows_by_ids(puesto_id, ids):
+    """Actas del puesto con esos ids, más nueva primero (las que avisa el feed en vivo)."""
+    result = db.session.execute(
+        feed_select().where(Acta.puesto_id == puesto_id, Acta.id.in_(ids)).order_by(Acta.id.desc())
+    )
+    return rows_from_result(result)
+
+
+def changes_since(puesto_ids, after_id, limit):
+    """
+    Actas de esos puestos con id mayor que `after_id`, en orden de id, hasta
+    `limit` (sincronización incremental de la API; rango sobre la clave
+    primaria). Lee la tabla caliente y el archivo: una sincronización desde
+    cero, o un cliente que estuvo apagado más que `ARCHIVE_HOT_DAYS`, recibe
+    también lo archivado. La tabla caliente va primero: un acta que se archiva
+    entre las dos lecturas aparece en ambas y se devuelve una vez; nunca en
+    ninguna.
+    """
+    if not puesto_ids:
+        return []
+    merged = {}
+    for query, t in ((feed_select(), Acta.__table__), (archive_feed_select(), ActaArchivada.__table__)):
+        for row in db.session.execute(
+            query.where(t.c.puesto_id.in_(puesto_ids), t.c.id > after_id).order_by(t.c.id.asc()).limit(limit)
+        ):
+            merged.setdefault(row.id, row)
+    return rows_from_result([merged[i] for i in sorted(merged)[:limit]])
+
+
+def max_id():
+    """Id más alto registrado (caliente o archivado; las dos lecturas van por la clave primaria)."""
+    return max(db.session.scalar(db.select(db.func.max(Acta.id))) or 0,
+               db.session.scalar(db.select(db.func.max(ActaArchivada.id))) or 0)
+
+
+def count_for_puesto(puesto_id, cap):
+    """Total del libro (caliente + archivo) contado hasta `cap`: (n, es_exacto)."""
+    hot, hot_exact = capped_count(db.select(Acta.id).where(Acta.puesto_id == puesto_id), cap)
+    if hot is None:
+        return None, False
+    cold, cold_exact = capped_count(
+        db.select(ActaArchivada.id).where(ActaArchivada.puesto_id == puesto_id), cap)
+    return min(hot + cold, cap), hot_exact and cold_exact and hot + cold <= cap
+
+
+class ExportRow:
+    """Fila completa (con cuerpo entero) para exportaciones."""
+
+    __slots__ = ('id', 'classification', 'body', 'fecha_creacion', 'puesto_id',
+                 'usuario_id', 'documento_url', 'adjunto_sha256', 'autor_nombre')
+
+    def __init__(self, id, classification, body, fecha_creacion, puesto_id,
+                 usuario_id, documento_url, adjunto_sha256=None, autor_nombre=None):
+        self.id = id
+        self.classification = classification
+        self.body = body
+        self.fecha_creacion = fecha_creacion
+        self.puesto_id = puesto_id
+        self.usuario_id = usuario_id
+        self.documento_url = documento_url
+        self.adjunto_sha256 = adjunto_sha256
+        self.autor_nombre = autor_nombre
+
+
+def export_select(table=None):
+    t = table if table is not None else Acta.__table__
+    return db.select(
+        t.c.id, t.c.classification, t.c.body, t.c.fecha_creacion,
+        t.c.puesto_id, t.c.usuario_id, t.c.documento_url, t.c.adjunto_sha256,
+        db.cast(db.null(), db.LargeBinary).label('body_z'),
+    )
+
+
+def archive_export_select():
+    t = ActaArchivada.__table__
+    return db.select(
+        t.c.id, t.c.classification, db.cast(db.null(), db.Text).label('body'), t.c.fecha_creacion,
+        t.c.puesto_id, t.c.usuario_id, t.c.documento_url, t.c.adjunto_sha256, t.c.body_z,
+    )
+
+
+def stream_actas(puesto_ids, start_date=None, end_date=None, query_text=None, chunk_size=None,
+                 max_id=None, zone=None):
+    """
+    Recorre las actas de `puesto_ids` en orden cronológico, de a lotes.
+
+    Usa `yield_per` (cursor del lado del servidor en MySQL/PostgreSQL), así que en
+    memoria hay a lo sumo un lote de filas; los autores se resuelven una vez por lote.
+    `max_id` acota el recorrido a un "snapshot" (actas con id <= max_id). Las
+    fechas son días locales de `zone` (por defecto, la de la organización).
+
+    Caliente y archivo van en un solo `UNION ALL` ordenado por la base: un único
+    cursor abierto (MySQL no admite dos cursores sin buffer en una conexión).
+    """
+    from app.search import apply_text_filter, date_filters
+
+    chunk_size = chunk_size or current_app.config.get('EXPORT_CHUNK_SIZE', 500)
+
+    def tier_query(query, t):
+        query = query.where(t.c.puesto_id.in_(list(puesto_ids)))
+        for f in date_filters(t.c.fecha_creacion, start_date, end_date, zone):
+            query = query.where(f)
+        if max_id is not None:
+            query = query.where(t.c.id <= max_id)
+        return apply_text_filter(query, query_text, t)
+
+    both = db.union_all(tier_query(export_select(), Acta.__table__),
+                        tier_query(archive_export_select(), ActaArchivada.__table__)).subquery()
+    query = db.select(both).order_by(both.c.fecha_creacion.asc(), both.c.id.asc())
+
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        autores = load_authors(r.usuario_id for r in partition)
+        for r in partition:
+            body = archive.decompress(r.body_z) if r.body_z is not None else r.body
+            yield ExportRow(r.id, r.classification, body, r.fecha_creacion, r.puesto_id,
+                            r.usuario_id, r.documento_url, r.adjunto_sha256, autores.get(r.usuario_id))
+
+
+def fetch_body(acta_id):
+    """(puesto_id, cuerpo completo) de un acta, o None si no existe (busca también en el archivo)."""
+    row = db.session.execute(
+        db.select(Acta.puesto_id, Acta.body).where(Acta.id == acta_id)
+    ).first()
+    return row if row is not None else archive.fetch_body(acta_id)
@@ -1,11 +1,12 @@
 # app/forms.py
+import re
 from flask_wtf import FlaskForm
 from wtforms import (StringField, PasswordField, SubmitField, SelectField,
                    TextAreaField, TimeField, DateField, FileField, EmailField,
                    SelectMultipleField, BooleanField, widgets)
 from wtforms.validators import (DataRequired, Length, Email, EqualTo,
                                 ValidationError, Optional, Regexp, )
-from flask_wtf.file import FileAllowed
+from flask_wtf.file import FileAllowed, FileRequired
 from app.models import Usuario, Rol, Puesto, Barrio, Organizacion, Plan  # AHORA: Importamos los modelos correctos
 from app import db
 from datetime import date, timedelta
@@ -29,6 +30,15 @@ class MultiCheckboxField(SelectMultipleField):
 class CrearOrganizacionForm(FlaskForm):
     nombre_org = StringField('Nombre de la Organización (Ej: Consorcio Funes Hills)', validators=[DataRequired()])
     plan = SelectField('Plan de Suscripción', coerce=int, validators=[DataRequired()])
+    zona_horaria = SelectField('Zona Horaria', choices=[
+        ('America/Argentina/Buenos_Aires', 'Argentina (Buenos Aires)'),
+        ('America/Montevideo', 'Uruguay (Montevideo)'),
+        ('America/Santiago', 'Chile (Santiago)'),
+        ('America/Asuncion', 'Paraguay (Asunción)'),
+        ('America/Sao_Paulo', 'Brasil (São Paulo)'),
+        ('America/Mexico_City', 'México (Ciudad de México)'),
+        ('Europe/Madrid', 'España (Madrid)'),
+    ], default='America/Argentina/Buenos_Aires')
     barrio_a_gestionar = SelectField('Barrio Principal a Gestionar', coerce=int, validators=[DataRequired()])
     
     # Datos para el primer Admin de este barrio
@@ -96,11 +106,23 @@ class ObservationForm(FlaskForm):
 
 # --- Formulario de Búsqueda (sin cambios, ya estaba correcto) ---
 class SearchForm(FlaskForm):
-    query = StringField('Buscar en Actas', validators=[Optional()])
+    # Se envía por GET (querystring), no lleva token CSRF.
+    class Meta:
+        csrf = False
+
+    query = StringField('Buscar en Actas', validators=[Optional(), Length(max=200)])
     start_date = DateField('Desde Fecha', format='%Y-%m-%d', validators=[Optional()])
     end_date = DateField('Hasta Fecha', format='%Y-%m-%d', validators=[Optional()])
     submit = SubmitField('Buscar')
 
+class ExportJobForm(FlaskForm):
+    # Exportación masiva: las opciones de puestos se cargan en la vista con los puestos visibles.
+    puesto_ids = MultiCheckboxField('Puestos', coerce=int, validators=[DataRequired(message="Elegí al menos un puesto.")])
+    query = StringField('Buscar en Actas', validators=[Optional(), Length(max=200)])
+    start_date = DateField('Desde Fecha', format='%Y-%m-%d', validators=[Optional()])
+    end_date = DateField('Hasta Fecha', format='%Y-%m-%d', validators=[Optional()])
+    submit = SubmitField('Exportar')
+
 # --- Formulario para Crear Usuario (CORREGIDO) ---
 # Renombrado de AdminCreateUserForm a un nombre más genérico.
 class CreateUserForm(FlaskForm):
@@ -146,6 +168,48 @@ class CreateUserForm(FlaskForm):
             if user:
                 raise ValidationError('Este email ya está en uso. Por favor, use uno diferente.')
 
+# --- Alta masiva de usuarios desde CSV/XLSX (ver app/user_import.py) ---
+class ImportUsersForm(FlaskForm):
+    archivo = FileField('Archivo CSV o XLSX', validators=[FileRequired(message='Elegí un archivo.'),
+        FileAllowed(['csv', 'xlsx'], 'El archivo tiene que ser CSV o XLSX.')])
+    # Valores para las filas que dejan vacías las columnas "Puede ver" / "Puede editar"
+    puede_ver = BooleanField('Permiso para VER (si la fila no lo indica)', default=True)
+    puede_editar = BooleanField('Permiso para EDITAR (si la fila no lo indica)', default=False)
+    parcial = BooleanField('Crear las filas válidas aunque otras tengan errores', default=False)
+    simular = BooleanField('Solo validar, sin crear usuarios', default=False)
+    submit = SubmitField('Importar Usuarios')
+
+# --- Permisos masivos: N usuarios x M puestos (ver app/bulk_permissions.py) ---
+class BulkPermissionsForm(FlaskForm):
+    usuarios = MultiCheckboxField('Usuarios del barrio', coerce=int)
+    dnis = TextAreaField('Otros DNI (uno por línea o separados por coma)', validators=[Optional()], render_kw={"rows": 3})
+    puestos = MultiCheckboxField('Puestos', coerce=int)
+    accion = SelectField('Acción', choices=[
+        ('asignar', 'Asignar o cambiar permisos en los puestos elegidos'),
+        ('revocar', 'Quitar permisos en los puestos elegidos'),
+        ('reemplazar', 'Dejar SOLO los puestos elegidos (quita los demás del barrio)'),
+    ], default='asignar')
+    puede_ver = BooleanField('Permiso para VER', default=True)
+    puede_editar = BooleanField('Permiso para EDITAR (Registrar Actas)', default=False)
+    submit = SubmitField('Aplicar')
+
+    def __init__(self, barrio_id, *args, **kwargs):
+        super(BulkPermissionsForm, self).__init__(*args, **kwargs)
+        from app.directory import barrio_members_condition
+        self.usuarios.choices = [
+            (u_id, f'{nombre} ({dni})') for u_id, nombre, dni in db.session.execute(
+                db.select(Usuario.id, Usuario.nombre_completo, Usuario.dni)
+                .where(barrio_members_condition(barrio_id))
+                .order_by(Usuario.nombre_busqueda, Usuario.id))
+        ]
+        self.puestos.choices = [
+            (p.id, p.nombre) for p in
+            db.session.scalars(db.select(Puesto).where(Puesto.barrio_id == barrio_id).order_by(Puesto.nombre)).all()
+        ]
+
+    def dni_list(self):
+        return [d for d in re.split(r'[\s,;]+', self.dnis.data or '') if d]
+
 # --- Formulario para Editar Usuario (CORREGIDO) ---
 class EditUserForm(FlaskForm):
     """
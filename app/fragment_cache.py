@@ -0,0 +1,316 @@
+# app/fragment_cache.py
+
+"""
+Cache de fragmentos HTML ya renderizados (feed de `/index`).
+
+Un acta no cambia una vez escrita, y los guardias refrescan una y otra vez
+la primera página de su puesto: casi todos los renders del listado son
+trabajo repetido. Se cachean dos cosas:
+
+- la tarjeta de cada acta (`acta`), por id y zona horaria: sirve para el
+  feed y para los resultados del buscador;
+- la página del feed (`feed`), por puesto, cursor, tamaño de página, zona y
+  **el id del acta más nueva del puesto**. Un acta nueva cambia ese id, así
+  que la página vieja deja de encontrarse aunque la cache sea de otro
+  proceso; además `invalidate_puesto` la borra en el momento.
+
+Backends (`FRAGMENT_CACHE`):
+
+- `memoria`: LRU por proceso, acotada en bytes (`FRAGMENT_CACHE_MAX_BYTES`).
+- `disco`: un archivo JSON por entrada en `FRAGMENT_CACHE_DIR`, compartido
+  entre los workers de la máquina; se poda por fecha de uso al pasar
+  `FRAGMENT_CACHE_DISK_MAX_BYTES`.
+- vacío: deshabilitada (`get` siempre falla, `set` no guarda).
+
+Todas las entradas vencen a los `FRAGMENT_CACHE_TTL` segundos: red de
+seguridad para lo que puede cambiar sin un acta nueva (el nombre del autor,
+la miniatura de un adjunto recién subido). Los contadores de aciertos y
+fallos son por proceso (ver /superadmin/sql).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app
+
+
+BACKEND_MEMORY = 'memoria'
+BACKEND_DISK = 'disco'
+PRUNE_EVERY = 200  # escrituras en disco entre podas
+PRUNE_TARGET = 0.8  # al podar se baja al 80 % del máximo
+
+
+def _key_string(key):
+    return '|'.join('' if part is None else str(part) for part in key)
+
+
+def _size(value):
+    return len(json.dumps(value, ensure_ascii=False))
+
+
+class MemoryBackend:
+    """LRU en memoria, acotada por la suma del tamaño de los valores."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clave -> (vence, valor, bytes, grupo)
+        self._groups = {}  # grupo -> {claves}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, group=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl, group=None):
+        """Guarda y devuelve cuántas entradas se expulsaron para hacerle lugar."""
+        size = _size(value)
+        if size > self.max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.time() + ttl, value, size, group)
+            self._bytes += size
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                evicted += 1
+        return evicted
+
+    def invalidate_group(self, group):
+        with self._lock:
+            for key in self._groups.pop(group, ()):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[2]
+        keys = self._groups.get(entry[3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[entry[3]]
+
+
+class DiskBackend:
+    """
+    Un archivo por entrada: `<dir>/<grupo>/<sha1 de la clave>.json`. Se escribe
+    a un temporal y se renombra, así otro worker nunca lee un archivo a medias.
+    Invalidar un grupo es renombrar su carpeta y borrarla.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _group_dir(self, group):
+        return os.path.join(self.directory, '_' if group is None else str(group))
+
+    def _path(self, key, group):
+        return os.path.join(self._group_dir(group), hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key, group=None):
+        path = self._path(key, group)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('clave') != key:
+            return None
+        if entry['vence'] < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)  # la poda borra primero lo usado hace más tiempo
+        except OSError:
+            pass
+        return entry['valor']
+
+    def set(self, key, value, ttl, group=None):
+        folder = self._group_dir(group)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'clave': key, 'vence': time.time() + ttl, 'valor': value}, f, ensure_ascii=False)
+            os.replace(tmp, self._path(key, group))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return 0
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        return self.prune() if prune else 0
+
+    def invalidate_group(self, group):
+        folder = self._group_dir(group)
+        trash = f'{folder}.borrar-{uuid.uuid4().hex}'
+        try:
+            os.rename(folder, trash)
+        except OSError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def prune(self):
+        """Borra las entradas usadas hace más tiempo hasta bajar del máximo. Devuelve cuántas borró."""
+        files = []
+        total = 0
+        for root, _dirs, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _mtime, size, path in sorted(files):
+            if total <= self.max_bytes * PRUNE_TARGET:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+class FragmentCache:
+    """Fachada con TTL y contadores por tipo de fragmento (primer elemento de la clave)."""
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self.since = datetime.now(timezone.utc)
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _count(self, kind, counter, n=1):
+        with self._stats_lock:
+            stats = self._stats.setdefault(kind, {'aciertos': 0, 'fallos': 0, 'guardados': 0,
+                                                  'expulsados': 0, 'invalidaciones': 0})
+            stats[counter] += n
+
+    def get(self, key, group=None):
+        if self.backend is None:
+            return None
+        value = self.backend.get(_key_string(key), group)
+        self._count(key[0], 'fallos' if value is None else 'aciertos')
+        return value
+
+    def set(self, key, value, group=None):
+        if self.backend is None:
+            return
+        evicted = self.backend.set(_key_string(key), value, self.ttl, group)
+        self._count(key[0], 'guardados')
+        if evicted:
+            self._count(key[0], 'expulsados', evicted)
+
+    def invalidate_group(self, kind, group):
+        if self.backend is None:
+            return
+        self.backend.invalidate_group(group)
+        self._count(kind, 'invalidaciones')
+
+    def stats(self):
+        """{tipo: contadores + 'ratio'} desde el arranque o el último `reset_stats`."""
+        with self._stats_lock:
+            result = {kind: dict(values) for kind, values in self._stats.items()}
+        for values in result.values():
+            lookups = values['aciertos'] + values['fallos']
+            values['ratio'] = values['aciertos'] / lookups if lookups else None
+        return result
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+            self.since = datetime.now(timezone.utc)
+
+
+def _build(config):
+    kind = (config.get('FRAGMENT_CACHE') or '').strip().lower()
+    if kind == BACKEND_MEMORY:
+        backend = MemoryBackend(config.get('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    elif kind == BACKEND_DISK:
+        backend = DiskBackend(config['FRAGMENT_CACHE_DIR'], config.get('FRAGMENT_CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024))
+    elif kind:
+        raise ValueError(f'FRAGMENT_CACHE desconocido: {kind!r} (usar "{BACKEND_MEMORY}", "{BACKEND_DISK}" o vacío).')
+    else:
+        backend = None
+    return FragmentCache(backend, config.get('FRAGMENT_CACHE_TTL', 600))
+
+
+def init_app(app):
+    app.extensions['fragment_cache'] = _build(app.config)
+
+
+def get_cache():
+    return current_app.extensions['fragment_cache']
+
+
+# ---------------------------
+# Feed de actas
+# ---------------------------
+
+def puesto_group(puesto_id):
+    return f'puesto-{puesto_id}'
+
+
+def feed_key(puesto_id, latest_id, after, before, per_page, zone):
+    return ('feed', puesto_id, latest_id, after, before, per_page, zone)
+
+
+def card_key(acta_id, zone):
+    return ('acta', acta_id, zone)
+
+
+def invalidate_puesto(puesto_id):
+    """Descarta las páginas cacheadas del feed de un puesto (acta nueva). Las tarjetas no cambian."""
+    get_cache().invalidate_group('feed', puesto_group(puesto_id))
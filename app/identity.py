@@ -0,0 +1,80 @@
+# app/identity.py
+
+"""
+Carga de identidad del usuario logueado.
+
+`load_user` trae en un solo viaje a la base el usuario junto con su rol,
+organización (+ plan) y barrio administrado, que son los datos que casi toda
+vista consulta (`rol.nombre`, `is_admin`, `organizacion.plan`, `barrio_admin`).
+
+Opcionalmente se mantiene una cache por proceso con TTL corto
+(`IDENTITY_CACHE_TTL`, 0 = deshabilitada). Lo cacheado es una copia *detached*
+del grafo; en cada request se incorpora a la sesión con `merge(load=False)`,
+que copia el estado sin emitir SQL.
+"""
+
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy.orm import Session, joinedload
+from app import db
+from app.models import Usuario, Organizacion
+
+
+IDENTITY_LOAD_OPTIONS = (
+    joinedload(Usuario.rol),
+    joinedload(Usuario.organizacion).joinedload(Organizacion.plan),
+    joinedload(Usuario.barrio_admin),
+)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def fetch_identity(user_id):
+    """Usuario + rol + organización + plan + barrio_admin en una sola consulta."""
+    return db.session.get(Usuario, user_id, options=IDENTITY_LOAD_OPTIONS)
+
+
+def _detached_copy(user):
+    """Copia del grafo cargado, desligada de cualquier sesión (nunca toca la base)."""
+    scratch = Session()
+    try:
+        copy = scratch.merge(user, load=False)
+        scratch.expunge_all()
+    finally:
+        scratch.close()
+    return copy
+
+
+def load_identity(user_id):
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 0)
+    if ttl <= 0:
+        return fetch_identity(user_id)
+
+    entry = _cache.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return db.session.merge(entry[1], load=False)
+
+    user = fetch_identity(user_id)
+    if user is not None:
+        max_entries = current_app.config.get('IDENTITY_CACHE_MAX_ENTRIES', 10000)
+        with _cache_lock:
+            _cache[user_id] = (time.monotonic() + ttl, _detached_copy(user))
+            while len(_cache) > max_entries:
+                _cache.pop(next(iter(_cache)))
+    return user
+
+
+def evict_identity(*user_ids):
+    """Descarta la identidad cacheada (edición de datos, cambio de contraseña, permisos)."""
+    with _cache_lock:
+        for user_id in user_ids:
+            _cache.pop(user_id, None)
+
+
+@db.event.listens_for(Usuario, 'after_update')
+def _evict_on_update(mapper, connection, target):
+    # Cualquier UPDATE vía ORM del usuario (datos, password_hash) invalida su copia.
+    evict_identity(target.id)
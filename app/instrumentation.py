@@ -0,0 +1,224 @@
+# app/instrumentation.py
+
+"""
+Instrumentación de SQL por request.
+
+Con `SQL_INSTRUMENTATION=1` se enganchan eventos del engine de SQLAlchemy y
+del request:
+
+- cada sentencia se cuenta y se cronometra, por request y en un acumulado
+  global por sentencia normalizada (los valores y las listas `IN (...)`
+  se reemplazan por `?`, así `WHERE id = 3` y `WHERE id = 7` son la misma);
+- la respuesta lleva un header `Server-Timing` con el tiempo de base,
+  la cantidad de consultas, el render de la plantilla y el total (se ve
+  en la pestaña Red de las herramientas del navegador);
+- las sentencias que tardan más de `SLOW_QUERY_MS` van a un log estructurado
+  (una línea JSON por sentencia) con el endpoint que la originó;
+- si la misma sentencia normalizada se repite `SQL_N_PLUS_ONE_THRESHOLD`
+  veces o más en un request, se registra como probable N+1.
+
+El panel `/superadmin/sql` muestra las sentencias que más tiempo acumulan.
+
+Deshabilitada (el valor por defecto) no se registra ningún listener: el costo
+es cero, no un `if` por consulta.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+
+slow_logger = logging.getLogger('app.sql_lento')
+
+_stats_lock = threading.Lock()
+_stats = {}  # sentencia normalizada -> StatementStats
+_stats_since = datetime.now(timezone.utc)
+
+OTHER_STATEMENTS = '(otras sentencias)'
+
+
+class StatementStats:
+    """Acumulado global de una sentencia normalizada."""
+
+    __slots__ = ('sql', 'count', 'total_ms', 'max_ms', 'n_plus_one', 'last_endpoint')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.n_plus_one = 0  # requests en los que se repitió como N+1
+        self.last_endpoint = None
+
+    @property
+    def avg_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+
+class RequestStats:
+    """Lo que lleva gastado el request actual (vive en `g._sql_stats`)."""
+
+    __slots__ = ('started', 'queries', 'db_ms', 'render_ms', 'render_started', 'repeats')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.render_started = None
+        self.repeats = {}
+
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+')
+_IN_LISTS = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+_VALUE_GROUPS = re.compile(r'(\((?:\?, )*\?\))(?:, \1)+')
+_SPACES = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def normalize(statement):
+    """SQL con los valores reemplazados por `?` (las sentencias se repiten: se memoiza)."""
+    sql = _SPACES.sub(' ', statement).strip()
+    sql = _STRINGS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _VALUE_GROUPS.sub(r'\1, ...', sql)
+
+
+def _record(sql, elapsed_ms, endpoint, max_statements):
+    with _stats_lock:
+        stats = _stats.get(sql)
+        if stats is None:
+            if len(_stats) >= max_statements:
+                sql = OTHER_STATEMENTS  # tope de memoria: lo que no entra se suma acá
+                stats = _stats.get(sql)
+            if stats is None:
+                stats = _stats[sql] = StatementStats(sql)
+        stats.count += 1
+        stats.total_ms += elapsed_ms
+        if elapsed_ms > stats.max_ms:
+            stats.max_ms = elapsed_ms
+        stats.last_endpoint = endpoint
+
+
+def top_statements(order='total_ms', limit=50):
+    """Sentencias ordenadas por `total_ms`, `max_ms`, `avg_ms`, `count` o `n_plus_one` (descendente)."""
+    with _stats_lock:
+        stats = list(_stats.values())
+    return sorted(stats, key=lambda s: getattr(s, order), reverse=True)[:limit]
+
+
+def stats_since():
+    return _stats_since
+
+
+def reset_stats():
+    global _stats_since
+    with _stats_lock:
+        _stats.clear()
+        _stats_since = datetime.now(timezone.utc)
+
+
+def _server_timing(stats):
+    total_ms = (time.perf_counter() - stats.started) * 1000
+    return (f'db;dur={stats.db_ms:.1f};desc="{stats.queries} consultas", '
+            f'render;dur={stats.render_ms:.1f}, '
+            f'total;dur={total_ms:.1f}')
+
+
+def init_app(app):
+    """Engancha la instrumentación si está habilitada. Llamar dentro de un contexto de aplicación."""
+    if not app.config.get('SQL_INSTRUMENTATION'):
+        return
+
+    from app import db
+
+    slow_ms = app.config.get('SLOW_QUERY_MS', 200)
+    n_plus_one = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+    max_statements = app.config.get('SQL_STATS_MAX_STATEMENTS', 1000)
+    log_file = app.config.get('SLOW_QUERY_LOG_FILE')
+    if log_file and not any(getattr(h, 'baseFilename', None) == log_file for h in slow_logger.handlers):
+        handler = logging.FileHandler(log_file, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_logger.addHandler(handler)
+        slow_logger.setLevel(logging.INFO)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_sql_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['_sql_started'].pop()) * 1000
+        sql = normalize(statement)
+        in_request = has_request_context()
+        endpoint = request.endpoint if in_request else None
+        _record(sql, elapsed_ms, endpoint, max_statements)
+
+        stats = g.get('_sql_stats') if in_request else None
+        if stats is not None:
+            stats.queries += 1
+            stats.db_ms += elapsed_ms
+            stats.repeats[sql] = stats.repeats.get(sql, 0) + 1
+
+        if elapsed_ms >= slow_ms:
+            entry = {
+                'evento': 'sql_lento',
+                'ms': round(elapsed_ms, 1),
+                'endpoint': endpoint,
+                'metodo': request.method if in_request else None,
+                'sql': sql,
+            }
+            if cursor.rowcount >= 0:  # filas afectadas (o leídas, según el driver)
+                entry['filas'] = cursor.rowcount
+            slow_logger.warning(json.dumps(entry, ensure_ascii=False))
+
+    def start_request():
+        g._sql_stats = RequestStats()
+
+    def finish_request(response):
+        stats = g.pop('_sql_stats', None)
+        if stats is None:
+            return response
+        response.headers.add('Server-Timing', _server_timing(stats))
+        for sql, times in stats.repeats.items():
+            if times >= n_plus_one:
+                with _stats_lock:
+                    if sql in _stats:
+                        _stats[sql].n_plus_one += 1
+                slow_logger.warning(json.dumps({
+                    'evento': 'n_mas_uno',
+                    'repeticiones': times,
+                    'endpoint': request.endpoint,
+                    'metodo': request.method,
+                    'sql': sql,
+                }, ensure_ascii=False))
+        return response
+
+    def render_started(sender, template, context, **extra):
+        stats = g.get('_sql_stats')
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+    def render_finished(sender, template, context, **extra):
+        stats = g.get('_sql_stats')
+        if stats is not None and stats.render_started is not None:
+            stats.render_ms += (time.perf_counter() - stats.render_started) * 1000
+            stats.render_started = None
+
+    # Todos los engines: el primario y las réplicas (binds `replica_*`, ver app/db_routing.py)
+    for engine in db.engines.values():
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
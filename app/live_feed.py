@@ -0,0 +1,235 @@
+# app/live_feed.py
+
+"""
+Feed en vivo: las actas nuevas de un puesto llegan a las pantallas abiertas
+por Server-Sent Events, sin recargar `/index`.
+
+Piezas:
+
+- `Hub` (uno por proceso): suscriptores por puesto, cada uno con su cola.
+  `publish(puesto_id, acta_id)` reparte el id a las colas del puesto. Hay un
+  tope de suscriptores por worker (`LIVE_FEED_MAX_SUBSCRIBERS`); el que no
+  entra recibe 503 y el navegador reintenta solo. Una cola llena (cliente
+  que no lee) cierra esa suscripción.
+- Alta en este proceso: `main.index` publica el acta después del commit.
+- Altas en otros workers: un hilo vigía por proceso, activo solo mientras
+  haya suscriptores. Según `LIVE_FEED_NOTIFY`:
+  - vacío (por defecto, cualquier motor): cada `LIVE_FEED_POLL_SECONDS` lee
+    `id, puesto_id` de las actas con id mayor que el último visto (rango
+    sobre la clave primaria). Relee unas pocas ids hacia atrás por si un
+    INSERT con id menor confirmó tarde; `Hub` descarta las repetidas.
+  - `postgres`: el alta hace `pg_notify('actas_nuevas', 'puesto:id')` en su
+    transacción y el vigía escucha con `LISTEN` (psycopg2); sin consultas
+    periódicas. Con otro driver se cae al sondeo.
+
+El id viaja solo; cada conexión SSE arma la tarjeta con su propio contexto
+(zona horaria, permisos) y la cache de fragmentos la comparte entre todos
+(ver `main.live_feed`).
+
+Cada conexión SSE ocupa un hilo mientras está abierta: en producción hace
+falta un servidor con hilos o greenlets (gunicorn `--threads` / gevent).
+"""
+
+import logging
+import select
+import threading
+import time
+from collections import deque
+
+from app import db
+from app.models import Acta
+
+
+NOTIFY_CHANNEL = 'actas_nuevas'
+NOTIFY_POSTGRES = 'postgres'
+QUEUE_SIZE = 100
+RECONNECT_MS = 3000  # `retry:` del stream: espera del navegador antes de reconectar
+FULL_RETRY_AFTER = 30  # segundos (Retry-After del 503 cuando no hay lugar)
+SEEN_IDS = 5000  # ids recientes recordados para no publicar dos veces
+
+logger = logging.getLogger(__name__)
+
+
+class HubFull(Exception):
+    """Se alcanzó `LIVE_FEED_MAX_SUBSCRIBERS` en este worker."""
+
+
+class Subscriber:
+    """Una conexión SSE: cola de ids de actas nuevas de un puesto."""
+
+    def __init__(self, puesto_id):
+        self.puesto_id = puesto_id
+        self.pending = deque()
+        self.closed = False
+        self._ready = threading.Condition()
+
+    def push(self, acta_id):
+        with self._ready:
+            if len(self.pending) >= QUEUE_SIZE:
+                self.closed = True  # no lee: se corta y el navegador reconecta
+            else:
+                self.pending.append(acta_id)
+            self._ready.notify()
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+
+    def wait(self, timeout):
+        """Ids pendientes (todas juntas), o [] si pasó `timeout` sin novedades."""
+        with self._ready:
+            if not self.pending and not self.closed:
+                self._ready.wait(timeout)
+            ids = list(self.pending)
+            self.pending.clear()
+            return ids
+
+
+class Hub:
+    def __init__(self):
+        self._subscribers = {}  # puesto_id -> {Subscriber}
+        self._count = 0
+        self._seen = deque(maxlen=SEEN_IDS)
+        self._seen_set = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    @property
+    def subscriber_count(self):
+        return self._count
+
+    def subscribe(self, puesto_id, limit):
+        with self._lock:
+            if self._count >= limit:
+                raise HubFull()
+            subscriber = Subscriber(puesto_id)
+            self._subscribers.setdefault(puesto_id, set()).add(subscriber)
+            self._count += 1
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            group = self._subscribers.get(subscriber.puesto_id)
+            if group is not None and subscriber in group:
+                group.discard(subscriber)
+                self._count -= 1
+                if not group:
+                    del self._subscribers[subscriber.puesto_id]
+
+    def publish(self, puesto_id, acta_id):
+        """Reparte el acta a los suscriptores del puesto (una sola vez por acta). Devuelve a cuántos."""
+        with self._lock:
+            if acta_id in self._seen_set:
+                return 0
+            if len(self._seen) == self._seen.maxlen:
+                self._seen_set.discard(self._seen[0])
+            self._seen.append(acta_id)
+            self._seen_set.add(acta_id)
+            targets = list(self._subscribers.get(puesto_id, ()))
+        for subscriber in targets:
+            subscriber.push(acta_id)
+        return len(targets)
+
+    def close_all(self):
+        with self._lock:
+            targets = [s for group in self._subscribers.values() for s in group]
+        for subscriber in targets:
+            subscriber.close()
+
+    # --- Vigía de altas en otros workers ---
+
+    def ensure_watcher(self, app):
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            target = self._listen if _use_listen(app) else self._poll
+            self._watcher = threading.Thread(target=target, args=(app,), name='feed-en-vivo', daemon=True)
+            self._watcher.start()
+
+    def _poll(self, app):
+        interval = app.config.get('LIVE_FEED_POLL_SECONDS', 1.0)
+        lookback = app.config.get('LIVE_FEED_POLL_LOOKBACK', 20)
+        start_id = last_id = None
+        while True:
+            time.sleep(interval)
+            if not self._count:
+                start_id = last_id = None  # sin suscriptores no se consulta; al volver se arranca del máximo actual
+                continue
+            try:
+                with app.app_context():
+                    try:
+                        if last_id is None:
+                            start_id = last_id = db.session.scalar(db.select(db.func.max(Acta.id))) or 0
+                            continue
+                        rows = db.session.execute(
+                            db.select(Acta.id, Acta.puesto_id).where(Acta.id > max(start_id, last_id - lookback))
+                            .order_by(Acta.id).limit(1000)
+                        ).all()
+                    finally:
+                        db.session.remove()
+                for acta_id, puesto_id in rows:
+                    self.publish(puesto_id, acta_id)
+                    last_id = max(last_id, acta_id)
+            except Exception:
+                logger.exception('Feed en vivo: falló el sondeo de actas nuevas')
+
+    def _listen(self, app):
+        while True:
+            try:
+                with app.app_context():
+                    conn = db.engine.raw_connection()
+                try:
+                    dbapi = conn.driver_connection
+                    dbapi.set_session(autocommit=True)
+                    with dbapi.cursor() as cur:
+                        cur.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                    while True:
+                        if select.select([dbapi], [], [], 30) == ([], [], []):
+                            continue
+                        dbapi.poll()
+                        while dbapi.notifies:
+                            note = dbapi.notifies.pop(0)
+                            puesto_id, _, acta_id = note.payload.partition(':')
+                            self.publish(int(puesto_id), int(acta_id))
+                finally:
+                    conn.invalidate()  # no vuelve al pool en modo LISTEN/autocommit
+            except Exception:
+                logger.exception('Feed en vivo: se perdió la conexión LISTEN; reintentando')
+                time.sleep(5)
+
+
+hub = Hub()
+
+
+def _use_listen(app):
+    if (app.config.get('LIVE_FEED_NOTIFY') or '').lower() != NOTIFY_POSTGRES:
+        return False
+    with app.app_context():
+        dialect = db.engine.dialect
+    if dialect.name == 'postgresql' and dialect.driver == 'psycopg2':
+        return True
+    logger.warning('LIVE_FEED_NOTIFY=postgres necesita PostgreSQL con psycopg2 (hay %s+%s); se usa sondeo.',
+                   dialect.name, dialect.driver)
+    return False
+
+
+def notify_insert(app, acta):
+    """
+    Antes del commit del alta: con LISTEN/NOTIFY, deja el aviso en la misma
+    transacción (PostgreSQL lo entrega a los demás workers recién al confirmar,
+    y nunca si hay rollback). Sin LISTEN/NOTIFY no hace nada.
+    """
+    if not app.config.get('LIVE_FEED_ENABLED', True) \
+            or (app.config.get('LIVE_FEED_NOTIFY') or '').lower() != NOTIFY_POSTGRES \
+            or db.session.get_bind().dialect.name != 'postgresql':
+        return
+    db.session.flush()  # id del acta
+    db.session.execute(db.text('SELECT pg_notify(:canal, :dato)'),
+                       {'canal': NOTIFY_CHANNEL, 'dato': f'{acta.puesto_id}:{acta.id}'})
+
+
+def publish_local(app, puesto_id, acta_id):
+    """Después del commit: los suscriptores de este mismo worker la ven sin esperar al vigía."""
+    if app.config.get('LIVE_FEED_ENABLED', True):
+        hub.publish(puesto_id, acta_id)
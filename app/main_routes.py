@@ -1,13 +1,22 @@
 # app/main_routes.py
 
 from flask import (
-    render_template, flash, redirect, url_for, request, session, Blueprint, g
+    render_template, flash, redirect, url_for, request, session, Blueprint, g,
+    abort, Response, current_app, make_response, get_template_attribute, stream_with_context
 )
-from app import db
-from app.forms import LoginForm, ObservationForm, SearchForm, ChangePasswordForm
-from app.models import Usuario, Acta, Puesto, Barrio, PermisoPuesto
+from markupsafe import Markup
+from app import attachments, conditional, db, derivatives, feed, fragment_cache, live_feed, rollups, search
+from app.forms import LoginForm, ObservationForm, SearchForm, ChangePasswordForm, ExportJobForm
+from app.models import Usuario, Acta
+from app.access import get_access
+from app.passwords import PasswordBusy, busy_response
+from app.db_routing import read_replica
+from app.pagination import KeysetPage
+from app.template_filters import current_zone_name
 from flask_login import current_user, login_user, logout_user, login_required
 from datetime import datetime
+import json
+import time
 
 
 main_bp = Blueprint('main', __name__)
@@ -18,34 +27,56 @@ main_bp = Blueprint('main', __name__)
 
 def get_barrios_for_user(user):
     """Lista de Barrios a los que un usuario tiene acceso (por permisos o por ser admin)."""
-    if user.rol.nombre == 'Super Admin':
-        return db.session.scalars(db.select(Barrio).order_by(Barrio.nombre)).all()
-
-    barrios = set()
-
-    # Por permisos en puestos
-    permisos_query = (
-        db.select(Barrio)
-        .join(Puesto)
-        .join(PermisoPuesto)
-        .where(PermisoPuesto.usuario_id == user.id)
-        .distinct()
-    )
-    for b in db.session.scalars(permisos_query):
-        barrios.add(b)
-
-    # Por ser administrador de un barrio
-    if user.barrio_admin:
-        barrios.add(user.barrio_admin)
-
-    return sorted(list(barrios), key=lambda b: b.nombre)
+    return list(get_access(user).barrios)
 
 
 def ensure_barrio_access_or_403(user, barrio_id):
     """True si el usuario puede acceder al barrio_id actual."""
-    if user.rol.nombre == 'Super Admin':
-        return True
-    return any(b.id == barrio_id for b in get_barrios_for_user(user))
+    return get_access(user).has_barrio(barrio_id)
+
+
+def render_acta_cards(actas):
+    """HTML de las tarjetas del feed; las ya renderizadas salen de la cache (un acta no cambia)."""
+    cache = fragment_cache.get_cache()
+    zone = current_zone_name()
+    macro = None
+    parts = []
+    for acta in actas:
+        key = fragment_cache.card_key(acta.id, zone)
+        html = cache.get(key)
+        if html is None:
+            if macro is None:
+                macro = get_template_attribute('_feed.html', 'acta_card')
+            html = str(macro(acta))
+            cache.set(key, html)
+        parts.append(html)
+    return Markup(''.join(parts))
+
+
+def render_feed_page(puesto_id, latest_id, after=None, before=None, per_page=15):
+    """
+    (KeysetPage, HTML de las tarjetas) de una página del feed. `latest_id` es
+    `feed.latest_id(puesto_id)`. Si el puesto no tuvo actas nuevas desde que se
+    cacheó, sale de la cache sin consultar la página: el KeysetPage viene sin
+    filas, solo con cursores y total.
+    """
+    cache = fragment_cache.get_cache()
+    if not cache.enabled:
+        page = feed.page_for_puesto(puesto_id, after=after, before=before, per_page=per_page)
+        return page, render_acta_cards(page.items)
+
+    key = fragment_cache.feed_key(puesto_id, latest_id, after, before, per_page, current_zone_name())
+    group = fragment_cache.puesto_group(puesto_id)
+    cached = cache.get(key, group)
+    if cached is not None:
+        page = KeysetPage([], cached['next_cursor'], cached['prev_cursor'], cached['total'], cached['total_exact'])
+        return page, Markup(cached['html'])
+
+    page = feed.page_for_puesto(puesto_id, after=after, before=before, per_page=per_page)
+    html = render_acta_cards(page.items)
+    cache.set(key, {'html': str(html), 'next_cursor': page.next_cursor, 'prev_cursor': page.prev_cursor,
+                    'total': page.total, 'total_exact': page.total_exact}, group)
+    return page, html
 
 
 @main_bp.before_app_request
@@ -68,7 +99,14 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = db.session.scalar(db.select(Usuario).where(Usuario.dni == form.dni.data))
-        if user and user.verify_password(form.password.data):
+        try:
+            valid = user is not None and user.verify_password(form.password.data)
+        except PasswordBusy:
+            # Pico de logins: se rechaza rápido en lugar de encolar sin límite (ver app/passwords.py)
+            return busy_response(lambda: render_template('login.html', title='Iniciar Sesión', form=form))
+        if valid:
+            if user in db.session.dirty:
+                db.session.commit()  # hash actualizado a los parámetros vigentes
             login_user(user, remember=True)
 
             barrios_accesibles = get_barrios_for_user(user)
@@ -110,8 +148,8 @@ def select_context():
     # Selección explícita
     if request.method == 'POST':
         barrio_id = request.form.get('barrio', type=int)
-        barrio_sel = db.session.get(Barrio, barrio_id)
-        if barrio_sel and any(b.id == barrio_sel.id for b in barrios):
+        barrio_sel = get_access(current_user).barrio(barrio_id)
+        if barrio_sel:
             session['current_barrio_id'] = barrio_sel.id
             session['current_barrio_nombre'] = barrio_sel.nombre
             return redirect(url_for('main.index'))
@@ -123,49 +161,41 @@ def select_context():
 # Ruta 3: Index (home del barrio)
 @main_bp.route('/index', methods=['GET', 'POST'])
 @login_required
+@read_replica  # GET: feed y búsqueda; el POST de alta va siempre al primario
 def index():
     barrio_id = session.get('current_barrio_id')
     barrio_nombre = session.get('current_barrio_nombre')
     if not barrio_id:
         return redirect(url_for('main.select_context'))
 
-    # Guardas de acceso...
-    if not ensure_barrio_access_or_403(current_user, barrio_id):
+    # Guardas de acceso (snapshot precalculado, sin consultas en el caso común)
+    access = get_access(current_user)
+    if not access.has_barrio(barrio_id):
         flash('No tenés acceso a este barrio.', 'danger')
         return redirect(url_for('main.select_context'))
 
     # Puestos visibles y editables
-    if current_user.rol.nombre == 'Super Admin' or (
-        current_user.rol.nombre == 'Administrador' and current_user.barrio_admin_id == barrio_id
-    ):
-        puestos_visibles = db.session.scalars(
-            db.select(Puesto).where(Puesto.barrio_id == barrio_id).order_by(Puesto.nombre)
-        ).all()
-    else:
-        puestos_visibles = [
-            p.puesto for p in current_user.permisos
-            if p.puede_ver and p.puesto.barrio_id == barrio_id
-        ]
+    puestos_visibles = access.puestos_visibles(barrio_id)
 
     if not puestos_visibles:
         return render_template('index.html', no_puestos=True, barrio_actual=barrio_nombre)
 
     target_puesto_id = request.args.get('puesto_id', puestos_visibles[0].id, type=int)
-    target_puesto = db.session.get(Puesto, target_puesto_id) or puestos_visibles[0]
-    if target_puesto not in puestos_visibles:
-        target_puesto = puestos_visibles[0]
-
-    puestos_editables = [
-        p.puesto for p in current_user.permisos
-        if p.puede_editar and p.puesto.barrio_id == barrio_id
-    ]
-    is_admin_of_current = (
-        current_user.rol.nombre == 'Super Admin' or
-        (current_user.rol.nombre == 'Administrador' and current_user.barrio_admin_id == barrio_id)
-    )
-    can_register_in_target_puesto = is_admin_of_current or any(
-        p.id == target_puesto.id for p in puestos_editables
-    )
+    target_puesto = access.puesto_visible(barrio_id, target_puesto_id) or puestos_visibles[0]
+
+    # GET condicional: si el puesto no tuvo actas nuevas, 304 sin consultar la página ni renderizar
+    latest_id = feed.latest_id(target_puesto.id)
+    etag = None
+    if request.method == 'GET' and not conditional.has_pending_flashes():
+        etag = conditional.make_etag('index', request.full_path, current_user.id, access.version,
+                                     conditional.layout_mark(current_user), barrio_id,
+                                     target_puesto.id, latest_id, current_zone_name(), html=True)
+        cached = conditional.not_modified(etag)
+        if cached is not None:
+            return cached
+
+    puestos_editables = access.puestos_editables(barrio_id)
+    can_register_in_target_puesto = access.can_edit(barrio_id, target_puesto.id)
 
     # Construir SIEMPRE el form con choices válidos (antes de validar)
     obs_form = ObservationForm(puestos_registrables=puestos_editables)
@@ -184,17 +214,21 @@ def index():
 
         if obs_form.validate():
             puesto_id_form = obs_form.puesto.data
-            puesto_form = db.session.get(Puesto, puesto_id_form)
-            if (not puesto_form) or (puesto_form.barrio_id != barrio_id):
+            puesto_form = access.puesto_editable(barrio_id, puesto_id_form)
+            if not puesto_form:
                 flash('Puesto inválido.', 'danger')
                 return redirect(url_for('main.index', puesto_id=target_puesto.id))
 
             nueva = Acta(
                 puesto_id=puesto_form.id,
                 usuario_id=current_user.id,
-                clasificacion=obs_form.classification.data,
-                cuerpo=obs_form.body.data
+                classification=obs_form.classification.data,
+                body=obs_form.body.data
             )
+            if obs_form.attachment.data:
+                adjunto, nombre = attachments.store_upload(obs_form.attachment.data)
+                nueva.adjunto_sha256 = adjunto.sha256
+                nueva.documento_url = nombre
             # Fecha/hora del evento si existen columnas
             if hasattr(Acta, 'fecha_evento') and hasattr(Acta, 'hora_evento'):
                 nueva.fecha_evento = obs_form.observation_date.data
@@ -205,7 +239,15 @@ def index():
                 )
 
             db.session.add(nueva)
+            live_feed.notify_insert(current_app, nueva)
             db.session.commit()
+            rollups.schedule(current_app._get_current_object())
+            fragment_cache.invalidate_puesto(nueva.puesto_id)
+            live_feed.publish_local(current_app, nueva.puesto_id, nueva.id)
+            if nueva.adjunto_sha256:
+                # Miniaturas fuera del request (ver app/derivatives.py)
+                derivatives.schedule(current_app._get_current_object(),
+                                     attachments.object_path(nueva.adjunto_sha256), nueva.documento_url)
             flash('Acta registrada correctamente.', 'success')
             return redirect(url_for('main.index', puesto_id=puesto_form.id))
         else:
@@ -214,29 +256,161 @@ def index():
                 for err in errores:
                     flash(f'Error en {campo}: {err}', 'danger')
 
-    # --- GET: listados + paginación ---
-    page = request.args.get('page', 1, type=int)
-    actas_query = db.select(Acta).where(Acta.puesto_id == target_puesto.id)
-    if hasattr(Acta, 'fecha_creacion'):
-        actas_query = actas_query.order_by(Acta.fecha_creacion.desc())
-    pagination = db.paginate(actas_query, page=page, per_page=15, error_out=False)
-    actas = pagination.items
+    # --- GET: búsqueda (si hay filtros) o listado paginado ---
+    search_active = (
+        any(request.args.get(k) for k in ('query', 'start_date', 'end_date'))
+        and search_form.validate()
+    )
+    if search_active:
+        actas = search.search_actas(
+            [target_puesto.id],
+            query_text=search_form.query.data,
+            start_date=search_form.start_date.data,
+            end_date=search_form.end_date.data,
+        )
+        pagination = None
+        feed_html = render_acta_cards(actas)
+    else:
+        # Página del feed ya renderizada (ver app/fragment_cache.py)
+        pagination, feed_html = render_feed_page(
+            target_puesto.id,
+            latest_id,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=15,
+        )
+        actas = pagination.items
+
+    # Feed en vivo solo en la primera página: en las otras las actas nuevas no van arriba
+    live_feed_url = None
+    if current_app.config.get('LIVE_FEED_ENABLED', True) and not search_active \
+            and not request.args.get('after') and not request.args.get('before'):
+        live_feed_url = url_for('main.live_feed_stream', puesto_id=target_puesto.id)
+
+    # Exportación masiva: todos los puestos visibles marcados y los filtros actuales precargados
+    export_form = ExportJobForm(
+        formdata=None,
+        puesto_ids=[p.id for p in puestos_visibles],
+        query=search_form.query.data if search_active else None,
+        start_date=search_form.start_date.data if search_active else None,
+        end_date=search_form.end_date.data if search_active else None,
+    )
+    export_form.puesto_ids.choices = [(p.id, p.nombre) for p in puestos_visibles]
 
-    return render_template(
+    response = make_response(render_template(
         'index.html',
         obs_form=obs_form,
         search_form=search_form,
+        search_active=search_active,
+        export_form=export_form,
         actas=actas,
+        feed_html=feed_html,
+        live_feed_url=live_feed_url,
         pagination=pagination,
         barrio_actual=barrio_nombre,
         target_puesto=target_puesto,
         puestos_visibles=puestos_visibles,
         can_register_in_target_puesto=can_register_in_target_puesto,
         predefined_body_texts={}
-    )
+    ))
+    return conditional.with_etag(response, etag) if etag else response
 
 
-# Ruta 4: Logout
+# Ruta 4: Texto completo de un acta (el listado solo trae una vista previa)
+@main_bp.route('/actas/<int:acta_id>/texto')
+@login_required
+@read_replica
+def acta_body(acta_id):
+    row = feed.fetch_body(acta_id)
+    if row is None or row.puesto_id not in get_access(current_user).visible_puesto_ids():
+        abort(404)
+    return Response(row.body or '', mimetype='text/plain')
+
+
+# Ruta 5: Adjunto de un acta (ETag/Range/cache; ver app/attachments.py)
+@main_bp.route('/actas/<int:acta_id>/adjunto')
+@login_required
+def uploaded_file(acta_id):
+    row = attachments.fetch_for_acta(acta_id)
+    if row is None or row.puesto_id not in get_access(current_user).visible_puesto_ids():
+        abort(404)
+    response = attachments.serve(row.adjunto_sha256, row.documento_url, row.mimetype)
+    if response is None:
+        abort(404)
+    return response
+
+
+@main_bp.route('/actas/<int:acta_id>/adjunto/miniatura')
+@login_required
+def uploaded_file_preview(acta_id):
+    row = attachments.fetch_for_acta(acta_id)
+    if row is None or row.puesto_id not in get_access(current_user).visible_puesto_ids():
+        abort(404)
+    response = attachments.serve_preview(row.adjunto_sha256, row.documento_url)
+    if response is None:
+        abort(404)
+    return response
+
+
+# Ruta 6: Feed en vivo de un puesto (Server-Sent Events; ver app/live_feed.py)
+@main_bp.route('/puestos/<int:puesto_id>/en-vivo')
+@login_required
+def live_feed_stream(puesto_id):
+    if not current_app.config.get('LIVE_FEED_ENABLED', True):
+        abort(404)
+    if puesto_id not in get_access(current_user).visible_puesto_ids():
+        abort(404)
+    config = current_app.config
+    try:
+        subscriber = live_feed.hub.subscribe(puesto_id, config.get('LIVE_FEED_MAX_SUBSCRIBERS', 200))
+    except live_feed.HubFull:
+        response = Response('Feed en vivo sin lugar; reintentar.', status=503, mimetype='text/plain')
+        response.headers['Retry-After'] = str(live_feed.FULL_RETRY_AFTER)
+        return response
+    live_feed.hub.ensure_watcher(current_app._get_current_object())
+
+    # Reconexión: el navegador manda el id del último evento recibido
+    replay_after = request.headers.get('Last-Event-ID', type=int)
+    # Id inicial del stream (el máximo de la tabla, ya suscriptos): si se corta antes de la
+    # primera acta, el navegador lo manda al reconectar y se reenvía lo registrado en el medio
+    start_id = replay_after if replay_after is not None \
+        else db.session.scalar(db.select(db.func.max(Acta.id))) or 0
+    heartbeat = config.get('LIVE_FEED_HEARTBEAT_SECONDS', 15)
+    deadline = time.monotonic() + config.get('LIVE_FEED_MAX_SECONDS', 300)
+
+    def events(rows):
+        try:
+            for row in rows:
+                html = render_acta_cards([row])
+                data = json.dumps({'id': row.id, 'html': str(html)}, ensure_ascii=False)
+                yield f'event: acta\nid: {row.id}\ndata: {data}\n\n'
+        finally:
+            db.session.close()  # la conexión vuelve al pool mientras se espera
+
+    def stream():
+        try:
+            yield f'retry: {live_feed.RECONNECT_MS}\nid: {start_id}\n\n'
+            if replay_after is not None:
+                rows = feed.rows_after(puesto_id, replay_after, config.get('LIVE_FEED_REPLAY_MAX', 20))
+                yield from events(reversed(rows))
+            else:
+                db.session.close()
+            while not subscriber.closed and time.monotonic() < deadline:
+                ids = subscriber.wait(heartbeat)
+                if ids:
+                    yield from events(reversed(feed.rows_by_ids(puesto_id, ids)))
+                else:
+                    yield ': ping\n\n'
+        finally:
+            live_feed.hub.unsubscribe(subscriber)
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: entregar cada evento al momento
+    return response
+
+
+# Ruta 7: Logout
 @main_bp.route('/logout')
 @login_required
 def logout():
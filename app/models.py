@@ -2,7 +2,8 @@
 
 from . import db, login_manager
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
+from .text_utils import fold_accents
 from datetime import datetime, timezone
 
 class Plan(db.Model):
@@ -11,6 +12,8 @@ class Plan(db.Model):
     nombre = db.Column(db.String(100), unique=True, nullable=False)
     precio = db.Column(db.Integer, nullable=False)
     puede_crear_puestos = db.Column(db.Boolean, default=False, nullable=False)
+    # Días que un acta queda en la tabla caliente antes de archivarse; NULL = ARCHIVE_HOT_DAYS (ver app/archive.py)
+    dias_en_caliente = db.Column(db.Integer, nullable=True)
     organizaciones = db.relationship('Organizacion', back_populates='plan', lazy='dynamic')
 
 class Organizacion(db.Model):
@@ -18,6 +21,9 @@ class Organizacion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(150), nullable=False)
     plan_id = db.Column(db.Integer, db.ForeignKey('planes.id'), nullable=False)
+    # Zona IANA en la que se muestran las fechas (se guardan en UTC); ver app/template_filters.py
+    zona_horaria = db.Column(db.String(64), nullable=False, default='America/Argentina/Buenos_Aires',
+                             server_default='America/Argentina/Buenos_Aires')
     plan = db.relationship('Plan', back_populates='organizaciones')
     usuarios = db.relationship('Usuario', back_populates='organizacion', lazy='dynamic')
 
@@ -39,7 +45,7 @@ class Puesto(db.Model):
     __tablename__ = 'puestos'
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(150), nullable=False)
-    barrio_id = db.Column(db.Integer, db.ForeignKey('barrios.id'), nullable=False)
+    barrio_id = db.Column(db.Integer, db.ForeignKey('barrios.id'), nullable=False, index=True)
     barrio = db.relationship('Barrio', back_populates='puestos')
     actas = db.relationship('Acta', back_populates='puesto', lazy='dynamic', cascade="all, delete-orphan")
     permisos = db.relationship('PermisoPuesto', back_populates='puesto', cascade="all, delete-orphan")
@@ -53,34 +59,59 @@ class PermisoPuesto(db.Model):
     puede_editar = db.Column(db.Boolean, default=False, nullable=False)
     usuario = db.relationship('Usuario', back_populates='permisos')
     puesto = db.relationship('Puesto', back_populates='permisos')
-    __table_args__ = (db.UniqueConstraint('usuario_id', 'puesto_id', name='_usuario_puesto_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'puesto_id', name='_usuario_puesto_uc'),
+        # Membresía por barrio: "qué usuarios tienen permiso en estos puestos"
+        db.Index('ix_permisos_puesto_usuario', 'puesto_id', 'usuario_id'),
+    )
 
 class Usuario(UserMixin, db.Model):
     __tablename__ = 'usuarios'
     id = db.Column(db.Integer, primary_key=True)
     dni = db.Column(db.String(15), unique=True, nullable=False, index=True)
     nombre_completo = db.Column(db.String(128), nullable=False)
+    # Nombre en minúsculas y sin tildes: búsqueda por prefijo y orden del directorio (ver app/directory.py)
+    nombre_busqueda = db.Column(db.String(128), nullable=True)
     email = db.Column(db.String(120), unique=True, nullable=True, index=True)
     password_hash = db.Column(db.String(256))
     rol_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
     organizacion_id = db.Column(db.Integer, db.ForeignKey('organizaciones.id'), nullable=False)
     barrio_admin_id = db.Column(db.Integer, db.ForeignKey('barrios.id'), nullable=True)
+    # Sello de versión de accesos: se incrementa cada vez que cambian sus permisos (ver app/access.py)
+    permisos_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     rol = db.relationship('Rol', back_populates='usuarios')
     organizacion = db.relationship('Organizacion', back_populates='usuarios')
     barrio_admin = db.relationship('Barrio', back_populates='admins')
     actas = db.relationship('Acta', backref='autor', lazy='dynamic')
     permisos = db.relationship('PermisoPuesto', back_populates='usuario', cascade="all, delete-orphan")
 
+    __table_args__ = (db.Index('ix_usuarios_nombre_busqueda_id', 'nombre_busqueda', 'id'),)
+
+    @validates('nombre_completo')
+    def _sync_nombre_busqueda(self, key, value):
+        self.nombre_busqueda = fold_accents(value)
+        return value
+
     @property
     def password(self):
         raise AttributeError('password no es un atributo legible.')
 
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        """Hash en el pool acotado de app/passwords.py (puede lanzar PasswordBusy)."""
+        from app.passwords import hash_password
+        self.password_hash = hash_password(password)
 
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """
+        Verifica en el pool acotado de app/passwords.py (puede lanzar PasswordBusy).
+        Si el hash quedó con parámetros viejos se reemplaza; el commit queda a cargo del llamador.
+        """
+        from app.passwords import verify
+        ok, new_hash = verify(self.password_hash, password)
+        if ok and new_hash:
+            self.password_hash = new_hash
+        return ok
 
     @property
     def is_admin(self):
@@ -96,8 +127,80 @@ class Acta(db.Model):
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
     puesto_id = db.Column(db.Integer, db.ForeignKey('puestos.id'))
     puesto = db.relationship('Puesto', back_populates='actas')
+    documento_url = db.Column(db.String(512))  # nombre original del adjunto
+    # Contenido del adjunto en el almacén por hash (ver app/attachments.py); NULL en adjuntos legados
+    adjunto_sha256 = db.Column(db.String(64), db.ForeignKey('adjuntos.sha256'), nullable=True, index=True)
+    # Índice del feed: paginación por cursor sobre (puesto, fecha DESC, id DESC)
+    __table_args__ = (db.Index('ix_actas_puesto_fecha_id', 'puesto_id', 'fecha_creacion', 'id'),)
+
+class ActaArchivada(db.Model):
+    """Acta vieja movida fuera de `actas` (ver app/archive.py). Conserva el id original."""
+    __tablename__ = 'actas_archivo'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    classification = db.Column(db.String(128))
+    body_z = db.Column(db.LargeBinary)  # cuerpo comprimido con zlib
+    # Palabras distintas del cuerpo, sin tildes: lo que indexa el buscador (el cuerpo comprimido no se puede)
+    terminos = db.Column(db.Text)
+    fecha_creacion = db.Column(db.DateTime)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    puesto_id = db.Column(db.Integer, db.ForeignKey('puestos.id'))
     documento_url = db.Column(db.String(512))
+    adjunto_sha256 = db.Column(db.String(64), db.ForeignKey('adjuntos.sha256'), nullable=True, index=True)
+    archivada = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    __table_args__ = (db.Index('ix_actas_archivo_puesto_fecha_id', 'puesto_id', 'fecha_creacion', 'id'),)
+
+class Adjunto(db.Model):
+    """Contenido de un adjunto, guardado una sola vez aunque lo usen muchas actas."""
+    __tablename__ = 'adjuntos'
+    sha256 = db.Column(db.String(64), primary_key=True)
+    tamano = db.Column(db.BigInteger, nullable=False)
+    mimetype = db.Column(db.String(100), nullable=False)
+    creado = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+class ExportJob(db.Model):
+    """Exportación masiva del libro en segundo plano (ver app/export_jobs.py)."""
+    __tablename__ = 'export_jobs'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex: no adivinable desde la URL
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
+    barrio_id = db.Column(db.Integer, db.ForeignKey('barrios.id'), nullable=True)
+    estado = db.Column(db.String(16), nullable=False, default='pendiente')
+    puesto_ids = db.Column(db.String(1000), nullable=False)  # "1,2,3" (ordenados)
+    filtros = db.Column(db.Text, nullable=True)  # JSON: query, start_date, end_date
+    max_acta_id = db.Column(db.Integer, nullable=True)  # acta más reciente incluida
+    cache_key = db.Column(db.String(64), nullable=False, index=True)
+    archivo = db.Column(db.String(255), nullable=True)  # relativo a EXPORT_FOLDER
+    error = db.Column(db.Text, nullable=True)
+    creado = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    terminado = db.Column(db.DateTime, nullable=True)
+
+class ResumenActasHora(db.Model):
+    """Actas por hora (UTC) y puesto, mantenido por app/rollups.py. Sin FK: 0 = sin puesto."""
+    __tablename__ = 'resumen_actas_hora'
+    hora = db.Column(db.DateTime, primary_key=True)
+    puesto_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    actas = db.Column(db.Integer, nullable=False, default=0)
+    adjuntos = db.Column(db.Integer, nullable=False, default=0)
+    bytes_adjuntos = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ResumenActasDia(db.Model):
+    """Actas por día (en la zona de la organización del autor), puesto y autor. 0 = sin puesto / sin autor."""
+    __tablename__ = 'resumen_actas_dia'
+    dia = db.Column(db.Date, primary_key=True)
+    puesto_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    usuario_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    actas = db.Column(db.Integer, nullable=False, default=0)
+    adjuntos = db.Column(db.Integer, nullable=False, default=0)
+    bytes_adjuntos = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ResumenEstado(db.Model):
+    """Hasta qué acta (id) están sumados los resúmenes."""
+    __tablename__ = 'resumen_estado'
+    nombre = db.Column(db.String(32), primary_key=True)
+    ultimo_id = db.Column(db.Integer, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime, nullable=True)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(Usuario, int(user_id))
\ No newline at end of file
+    # Usuario + rol + organización/plan + barrio_admin en un solo viaje (ver app/identity.py)
+    from app.identity import load_identity
+    return load_identity(int(user_id))
\ No newline at end of file
@@ -0,0 +1,88 @@
+# app/pagination.py
+
+"""
+Paginación por cursor (keyset).
+
+En lugar de `OFFSET n` + `COUNT(*)`, cada página se pide "a partir de" la
+última clave vista, así el costo de la página 1 y la página 10.000 es el mismo
+(un rango sobre el índice). El cursor viaja en la URL como un token opaco.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from app import db
+
+
+def encode_cursor(*values):
+    """Token opaco (base64 url-safe) a partir de los valores de la clave."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, *types):
+    """
+    Decodifica un token de `encode_cursor` convirtiendo cada valor al tipo pedido.
+    Devuelve None si el token está ausente o es inválido (se trata como primera página).
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            return None
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(payload, types)
+        )
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def keyset_condition(columns, values, descending=True):
+    """
+    Condición "estrictamente después de `values`" en el orden dado por `columns`.
+    Se arma como OR de prefijos para que funcione igual en SQLite, MySQL y PostgreSQL:
+    (a < x) OR (a = x AND b < y) ...
+    """
+    clauses = []
+    for i, (col, value) in enumerate(zip(columns, values)):
+        step = col < value if descending else col > value
+        prefix = [c == v for c, v in zip(columns[:i], values[:i])]
+        clauses.append(db.and_(*prefix, step) if prefix else step)
+    return db.or_(*clauses)
+
+
+def capped_count(query, cap):
+    """
+    Cuenta filas hasta `cap + 1` como máximo: (n, es_exacto).
+    Sirve como total aproximado sin recorrer todo el historial.
+    """
+    if cap <= 0:
+        return None, False
+    sub = query.limit(cap + 1).subquery()
+    n = db.session.scalar(db.select(db.func.count()).select_from(sub))
+    return min(n, cap), n <= cap
+
+
+class KeysetPage:
+    """Resultado de una página por cursor, con la interfaz que usan las plantillas."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None, total_exact=True):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_exact = total_exact
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
@@ -0,0 +1,183 @@
+# app/passwords.py
+
+"""
+Hash y verificación de contraseñas.
+
+Verificar un hash es caro a propósito (bcrypt con 12 rondas ronda los 250 ms
+de CPU). Si llegan muchos logins juntos —el cambio de turno de la guardia,
+todos a la misma hora— y cada uno se calcula en su hilo de request, la CPU se
+satura y también se frenan las páginas comunes. Por eso la verificación del
+login y el hash de las contraseñas nuevas (altas, cambios) corren en un pool
+acotado (`PASSWORD_HASH_WORKERS` hilos, por defecto CPUs - 1) con una cola
+limitada (`PASSWORD_HASH_MAX_PENDING`):
+
+- si la cola está llena, la operación se rechaza al instante (`PasswordBusy`);
+- si el turno no llega en `PASSWORD_QUEUE_TIMEOUT` segundos, también.
+
+El formulario muestra "intentá de nuevo" en lugar de dejar el request colgado.
+`flask bench login` mide cuánto cuesta cada valor de `BCRYPT_LOG_ROUNDS` y de
+`PASSWORD_WERKZEUG_METHOD` en la máquina donde corre.
+bcrypt y hashlib liberan el GIL mientras calculan, así que los hilos del pool
+no bloquean a los del servidor web.
+
+Rehash transparente: si el hash guardado no coincide con el esquema o los
+parámetros actuales (`PASSWORD_HASH_SCHEME`, `BCRYPT_LOG_ROUNDS`,
+`PASSWORD_WERKZEUG_METHOD`), al loguearse con éxito se recalcula con los
+actuales. Así los hashes viejos de werkzeug (scrypt/pbkdf2) pasan a bcrypt
+(Flask-Bcrypt) sin pedirle nada a nadie.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+
+from flask import current_app, flash, make_response
+from werkzeug.security import check_password_hash, generate_password_hash
+from app import bcrypt
+
+
+SCHEME_BCRYPT = 'bcrypt'
+SCHEME_WERKZEUG = 'werkzeug'
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+_pool_lock = threading.Lock()
+_pool = None
+_slots = None
+
+
+class PasswordBusy(Exception):
+    """Demasiados hashes en curso: el login (o el alta) se debe reintentar más tarde."""
+
+
+BUSY_RETRY_AFTER = 5  # segundos (Retry-After del 503 cuando el pool está lleno)
+# Aviso de altas y cambios de contraseña rechazados por `PasswordBusy`
+BUSY_SAVE_MESSAGE = 'El servidor está procesando muchas contraseñas en este momento. Intentá de nuevo en unos segundos.'
+
+
+def busy_response(render, message='Hay muchos inicios de sesión en este momento. Intentá de nuevo en unos segundos.'):
+    """503 con el formulario re-renderizado por `render()` (después del aviso) cuando se lanzó `PasswordBusy`."""
+    flash(message, 'warning')
+    response = make_response(render(), 503)
+    response.headers['Retry-After'] = str(BUSY_RETRY_AFTER)
+    return response
+
+
+def _policy():
+    """Parámetros vigentes (leídos en el hilo del request; los hilos del pool no tienen app)."""
+    config = current_app.config
+    return (
+        config.get('PASSWORD_HASH_SCHEME', SCHEME_BCRYPT),
+        config.get('BCRYPT_LOG_ROUNDS', 12),
+        config.get('PASSWORD_WERKZEUG_METHOD', 'scrypt'),
+    )
+
+
+@lru_cache(maxsize=8)
+def _werkzeug_prefix(method):
+    # 'scrypt' -> 'scrypt:32768:8:1': así queda guardado, con los parámetros por defecto explícitos
+    return generate_password_hash('x', method=method).split('$', 1)[0]
+
+
+def _hash(password, policy):
+    scheme, rounds, method = policy
+    if scheme == SCHEME_BCRYPT:
+        return bcrypt.generate_password_hash(password, rounds).decode('utf-8')
+    return generate_password_hash(password, method=method)
+
+
+def needs_rehash(stored_hash, policy):
+    """True si el hash fue generado con otro esquema o con otros parámetros."""
+    scheme, rounds, method = policy
+    if stored_hash.startswith(BCRYPT_PREFIXES):
+        return scheme != SCHEME_BCRYPT or int(stored_hash.split('$')[2]) != rounds
+    return scheme != SCHEME_WERKZEUG or stored_hash.split('$', 1)[0] != _werkzeug_prefix(method)
+
+
+def _check(stored_hash, password):
+    if stored_hash.startswith(BCRYPT_PREFIXES):
+        try:
+            return bcrypt.check_password_hash(stored_hash, password)
+        except ValueError:  # hash corrupto
+            return False
+    return check_password_hash(stored_hash, password)
+
+
+def _verify_task(stored_hash, password, policy):
+    """(ok, hash_nuevo o None). Corre entera en el pool: el rehash también cuenta como trabajo acotado."""
+    if not _check(stored_hash, password):
+        return False, None
+    if needs_rehash(stored_hash, policy):
+        return True, _hash(password, policy)
+    return True, None
+
+
+def hash_password(password, timeout=None):
+    """
+    Hash con el esquema vigente, calculado en el pool acotado (como `verify`).
+    Lanza `PasswordBusy` si la cola está llena o el turno no llega a tiempo.
+    """
+    return _run_bounded(_hash, (password, _policy()), timeout)
+
+
+def hash_many(passwords):
+    """
+    Hashes de muchas contraseñas en paralelo (altas masivas, ver app/user_import.py).
+    Usa hilos propios y no el pool del login: una importación de 80 guardias no
+    tiene que llenar la cola y rechazar los logins del momento.
+    """
+    policy = _policy()
+    passwords = list(passwords)
+    if len(passwords) < 2:
+        return [_hash(p, policy) for p in passwords]
+    workers = current_app.config.get('PASSWORD_HASH_WORKERS') or max(1, (os.cpu_count() or 2) - 1)
+    with ThreadPoolExecutor(max_workers=min(workers, len(passwords)), thread_name_prefix='passwords-bulk') as pool:
+        return list(pool.map(lambda p: _hash(p, policy), passwords))
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            config = current_app.config
+            workers = config.get('PASSWORD_HASH_WORKERS') or max(1, (os.cpu_count() or 2) - 1)
+            pending = config.get('PASSWORD_HASH_MAX_PENDING')
+            if pending is None:
+                pending = workers * 4
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='passwords')
+            _slots = threading.BoundedSemaphore(workers + pending)
+    return _pool, _slots
+
+
+def _run_bounded(task, args, timeout):
+    """Corre `task(*args)` en el pool acotado y espera el resultado; `PasswordBusy` si no hay lugar o turno."""
+    if timeout is None:
+        timeout = current_app.config.get('PASSWORD_QUEUE_TIMEOUT', 5)
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise PasswordBusy()
+    try:
+        future = pool.submit(task, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # El lugar se libera cuando el cálculo termina (o se cancela), no cuando el request deja de esperar
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        if future.cancel():
+            raise PasswordBusy() from None
+        # Ya estaba calculándose: le falta menos que uno nuevo, mejor esperarlo que tirarlo
+        return future.result()
+
+
+def verify(stored_hash, password, timeout=None):
+    """
+    Verifica una contraseña en el pool acotado y devuelve (ok, hash_nuevo).
+    `hash_nuevo` viene cuando corresponde un rehash; guardarlo queda a cargo del llamador.
+    Lanza `PasswordBusy` si la cola está llena o el turno no llega a tiempo.
+    """
+    if not stored_hash or not password:
+        return False, None
+    return _run_bounded(_verify_task, (stored_hash, password, _policy()), timeout)
@@ -0,0 +1,525 @@
+# app/pdf_export.py
+
+"""
+Motor de exportación del "Libro de Actas" a PDF.
+
+Las actas se leen de la base en lotes (`feed.stream_actas`) y se dibujan a
+medida que llegan, agrupadas con un separador por día. El PDF se escribe
+página por página (`PdfStreamWriter`): cada página terminada se comprime y
+se escribe al destino junto con sus imágenes, y no queda nada de ella en
+memoria. El canvas de reportlab, en cambio, guarda todas las páginas hasta
+`save()`; de reportlab se usan solo las métricas de las fuentes.
+
+Lo único que crece con el tamaño del libro es la tabla de offsets del xref
+(8 bytes por objeto, unos tres objetos por página). La ruta web manda cada bloque apenas se escribe
+(`stream_libro_pdf`); los trabajos en segundo plano escriben a un archivo
+(`render_libro`).
+
+Los adjuntos se leen directamente del almacén local (`app/attachments.py`),
+nada de pedirle al propio servidor las imágenes por HTTP.
+"""
+
+import io
+import zlib
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from flask import current_app
+from PIL import Image
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from app import attachments, derivatives, feed
+from app.template_filters import current_zone_name, format_day_es, to_local
+
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 0.75 * inch
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+PADDING = 8
+
+FONT = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+BODY_SIZE = 10
+BODY_LEADING = 14
+SMALL_SIZE = 8
+
+IMAGE_MAX_WIDTH = 200
+IMAGE_MAX_HEIGHT = 150
+IMAGE_CACHE_SIZE = 64  # imágenes ya escritas en el PDF que se vuelven a referenciar sin copiarlas
+JPEG_QUALITY = 80  # solo si el derivado no es un JPEG RGB/gris que se pueda copiar tal cual
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=65536)
+def _word_width(word, font=FONT, size=BODY_SIZE):
+    return stringWidth(word, font, size)
+
+
+def wrap_text(text, max_width, font=FONT, size=BODY_SIZE):
+    """
+    Corta `text` en líneas de a lo sumo `max_width` puntos.
+    Mide palabra por palabra con cache (simpleSplit re-mide la línea entera en cada palabra,
+    y con miles de actas esa es la parte más cara del render).
+    """
+    space = _word_width(' ', font, size)
+    lines = []
+    for paragraph in (text or '').splitlines() or ['']:
+        current, current_width = [], 0.0
+        for word in paragraph.split(' '):
+            w = _word_width(word, font, size)
+            if w > max_width:
+                # Palabra más ancha que la línea: se parte por caracteres.
+                if current:
+                    lines.append(' '.join(current))
+                    current, current_width = [], 0.0
+                chunk = ''
+                for ch in word:
+                    if _word_width(chunk + ch, font, size) > max_width:
+                        lines.append(chunk)
+                        chunk = ''
+                    chunk += ch
+                word, w = chunk, _word_width(chunk, font, size)
+            needed = w if not current else current_width + space + w
+            if current and needed > max_width:
+                lines.append(' '.join(current))
+                current, current_width = [word], w
+            else:
+                current.append(word)
+                current_width = needed
+        lines.append(' '.join(current))
+    return lines
+
+
+def _num(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+def _pdf_string(text):
+    """Literal de texto PDF en WinAnsi (la codificación de las fuentes estándar)."""
+    raw = (text or '').encode('cp1252', 'replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'') + b')'
+
+
+def _color(color):
+    return f'{_num(color.red)} {_num(color.green)} {_num(color.blue)}'
+
+
+class PdfStreamWriter:
+    """
+    Escritor PDF mínimo y secuencial sobre cualquier objeto con `write()`.
+
+    Cubre lo que dibuja el libro: texto en Helvetica / Helvetica-Bold,
+    líneas, rectángulos y JPEG. Los objetos fijos (catálogo, árbol de
+    páginas, fuentes) tienen números reservados; el árbol de páginas y el
+    xref se escriben al final, cuando ya se conocen todas las páginas.
+    """
+
+    CATALOG, PAGES, INFO = 1, 2, 3
+    FONTS = {FONT: ('F1', 4), FONT_BOLD: ('F2', 5)}
+
+    def __init__(self, fileobj, pagesize=A4):
+        self.fileobj = fileobj
+        self.width, self.height = pagesize
+        self.title = ''
+        self._offset = 0
+        self._offsets = array('Q', [0] * 6)  # posición en el archivo de cada objeto (índice = número)
+        self._kids = array('Q')  # objetos página, en orden
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        for base_font, (_name, obj) in self.FONTS.items():
+            self._object(obj, f'<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} '
+                              f'/Encoding /WinAnsiEncoding >>'.encode('ascii'))
+        self._start_page()
+
+    # --- Bajo nivel ---
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self._offset += len(data)
+
+    def _reserve(self):
+        self._offsets.append(0)
+        return len(self._offsets) - 1
+
+    def _object(self, obj, body, stream=None):
+        self._offsets[obj] = self._offset
+        self._write(f'{obj} 0 obj\n'.encode('ascii') + body)
+        if stream is not None:
+            self._write(b'\nstream\n' + stream + b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def _start_page(self):
+        self._ops = []
+        self._xobjects = set()
+        self._font = (FONT, BODY_SIZE)
+        self._fill = self._stroke = None
+
+    def _op(self, op):
+        self._ops.append(op if isinstance(op, bytes) else op.encode('ascii'))
+
+    # --- Estado ---
+
+    def setFont(self, name, size):
+        self._font = (name, size)
+
+    def setFillColor(self, color):
+        if color != self._fill:
+            self._fill = color
+            self._op(f'{_color(color)} rg')
+
+    def setStrokeColor(self, color):
+        if color != self._stroke:
+            self._stroke = color
+            self._op(f'{_color(color)} RG')
+
+    # --- Dibujo ---
+
+    def _text(self, x, y, lines, leading=None):
+        name, size = self._font
+        parts = [f'BT /{self.FONTS[name][0]} {_num(size)} Tf'.encode('ascii')]
+        if leading:
+            parts.append(f'{_num(leading)} TL'.encode('ascii'))
+        parts.append(f'{_num(x)} {_num(y)} Td'.encode('ascii'))
+        for i, line in enumerate(lines):
+            parts.append((b'T* ' if i else b'') + _pdf_string(line) + b' Tj')
+        parts.append(b'ET')
+        self._op(b' '.join(parts))
+
+    def drawString(self, x, y, text):
+        self._text(x, y, [text])
+
+    def drawRightString(self, x, y, text):
+        name, size = self._font
+        self._text(x - stringWidth(text, name, size), y, [text])
+
+    def drawCentredString(self, x, y, text):
+        name, size = self._font
+        self._text(x - stringWidth(text, name, size) / 2, y, [text])
+
+    def drawLines(self, x, y, lines, leading):
+        """Varias líneas en un único objeto de texto (la primera con la base en `y`)."""
+        self._text(x, y, lines, leading)
+
+    def line(self, x1, y1, x2, y2):
+        self._op(f'{_num(x1)} {_num(y1)} m {_num(x2)} {_num(y2)} l S')
+
+    def _paint(self, stroke, fill):
+        return {(1, 0): 'S', (0, 1): 'f', (1, 1): 'B'}.get((int(bool(stroke)), int(bool(fill))), 'n')
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        self._op(f'{_num(x)} {_num(y)} {_num(width)} {_num(height)} re {self._paint(stroke, fill)}')
+
+    def roundRect(self, x, y, width, height, radius, stroke=1, fill=0):
+        k = radius * 0.5523  # aproximación del cuarto de círculo con una Bézier
+        x2, y2 = x + width, y + height
+        path = [
+            f'{_num(x + radius)} {_num(y)} m',
+            f'{_num(x2 - radius)} {_num(y)} l',
+            f'{_num(x2 - radius + k)} {_num(y)} {_num(x2)} {_num(y + radius - k)} {_num(x2)} {_num(y + radius)} c',
+            f'{_num(x2)} {_num(y2 - radius)} l',
+            f'{_num(x2)} {_num(y2 - radius + k)} {_num(x2 - radius + k)} {_num(y2)} {_num(x2 - radius)} {_num(y2)} c',
+            f'{_num(x + radius)} {_num(y2)} l',
+            f'{_num(x + radius - k)} {_num(y2)} {_num(x)} {_num(y2 - radius + k)} {_num(x)} {_num(y2 - radius)} c',
+            f'{_num(x)} {_num(y + radius)} l',
+            f'{_num(x)} {_num(y + radius - k)} {_num(x + radius - k)} {_num(y)} {_num(x + radius)} {_num(y)} c',
+            f'h {self._paint(stroke, fill)}',
+        ]
+        self._op(' '.join(path))
+
+    def add_jpeg(self, data, width, height, gray=False):
+        """Escribe un JPEG como XObject (una sola vez) y devuelve su número de objeto."""
+        obj = self._reserve()
+        colorspace = '/DeviceGray' if gray else '/DeviceRGB'
+        self._object(obj, (f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+                           f'/ColorSpace {colorspace} /BitsPerComponent 8 /Filter /DCTDecode '
+                           f'/Length {len(data)} >>').encode('ascii'), data)
+        return obj
+
+    def drawImage(self, obj, x, y, width, height):
+        self._xobjects.add(obj)
+        self._op(f'q {_num(width)} 0 0 {_num(height)} {_num(x)} {_num(y)} cm /Im{obj} Do Q')
+
+    # --- Páginas ---
+
+    def showPage(self):
+        """Cierra la página: contenido comprimido + objeto página, directo al destino."""
+        content = zlib.compress(b'\n'.join(self._ops))
+        content_obj, page_obj = self._reserve(), self._reserve()
+        self._object(content_obj, f'<< /Length {len(content)} /Filter /FlateDecode >>'.encode('ascii'), content)
+        fonts = ' '.join(f'/{name} {obj} 0 R' for name, obj in self.FONTS.values())
+        xobjects = ' '.join(f'/Im{obj} {obj} 0 R' for obj in sorted(self._xobjects))
+        resources = f'/Font << {fonts} >>' + (f' /XObject << {xobjects} >>' if xobjects else '')
+        self._object(page_obj, (f'<< /Type /Page /Parent {self.PAGES} 0 R '
+                                f'/MediaBox [0 0 {_num(self.width)} {_num(self.height)}] '
+                                f'/Resources << {resources} >> /Contents {content_obj} 0 R >>').encode('ascii'))
+        self._kids.append(page_obj)
+        self._start_page()
+
+    def save(self):
+        """Cierra la última página y escribe árbol de páginas, catálogo, info, xref y trailer."""
+        self.showPage()
+        self._offsets[self.PAGES] = self._offset
+        self._write(f'{self.PAGES} 0 obj\n<< /Type /Pages /Count {len(self._kids)} /Kids ['.encode('ascii'))
+        for start in range(0, len(self._kids), 1000):
+            self._write(' '.join(f'{obj} 0 R' for obj in self._kids[start:start + 1000]).encode('ascii') + b'\n')
+        self._write(b'] >>\nendobj\n')
+        self._object(self.CATALOG, f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>'.encode('ascii'))
+        self._object(self.INFO, b'<< /Title ' + _pdf_string(self.title) + b' /Producer (observaciones) >>')
+        xref, size = self._offset, len(self._offsets)
+        self._write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode('ascii'))
+        for start in range(1, size, 1000):
+            self._write(''.join(f'{offset:010d} 00000 n \n'
+                                for offset in self._offsets[start:start + 1000]).encode('ascii'))
+        self._write((f'trailer\n<< /Size {size} /Root {self.CATALOG} 0 R /Info {self.INFO} 0 R >>\n'
+                     f'startxref\n{xref}\n%%EOF\n').encode('ascii'))
+
+
+class _Blocks:
+    """Destino en memoria que se vacía de a bloques (ver `stream_libro_pdf`)."""
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(data)
+        self.size += len(data)
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts, self.size = [], 0
+        return data
+
+
+class LibroActasPDF:
+    """Layout incremental: cada acta se dibuja apenas se lee."""
+
+    def __init__(self, fileobj, barrio, puesto, filtros=None, zone=None):
+        self.canvas = PdfStreamWriter(fileobj, pagesize=A4)
+        self.canvas.title = f'Libro de Actas - {barrio} - {puesto}'
+        self.barrio = barrio
+        self.puesto = puesto
+        self.filtros = filtros
+        self.zone = zone or current_zone_name()  # las fechas se guardan en UTC
+        self.y = PAGE_HEIGHT - MARGIN
+        self.page = 1
+        self.current_day = None
+        self.count = 0
+        self._box_top = None  # borde superior del recuadro del acta en curso en esta página
+        self._images = {}  # ruta del derivado -> (objeto PDF, ancho, alto); la misma foto se escribe una vez
+
+    # --- Primitivas de página ---
+
+    def _footer(self):
+        c = self.canvas
+        c.setFont(FONT, SMALL_SIZE)
+        c.setFillColor(HexColor('#777777'))
+        c.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f'Página {self.page}')
+        c.setFillColor(HexColor('#000000'))
+
+    def _new_page(self):
+        # Un acta partida entre páginas: se cierra su recuadro acá y sigue arriba en la próxima
+        if self._box_top is not None:
+            self._box(self._box_top)
+        self._footer()
+        self.canvas.showPage()
+        self.page += 1
+        self.y = PAGE_HEIGHT - MARGIN
+        if self._box_top is not None:
+            self._box_top = self.y
+
+    def _ensure(self, height):
+        """Salta de página si no entran `height` puntos."""
+        if self.y - height < MARGIN:
+            self._new_page()
+
+    # --- Bloques ---
+
+    def header(self):
+        c = self.canvas
+        c.setFont(FONT_BOLD, 18)
+        c.drawCentredString(PAGE_WIDTH / 2, self.y - 18, 'Libro de Actas')
+        self.y -= 40
+        c.setFont(FONT_BOLD, 14)
+        c.drawString(MARGIN, self.y, f'Barrio: {self.barrio} - Puesto: {self.puesto}')
+        self.y -= 6
+        c.setStrokeColor(HexColor('#cccccc'))
+        c.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y)
+        self.y -= 14
+        c.setFont(FONT, SMALL_SIZE)
+        c.setFillColor(HexColor('#777777'))
+        c.drawRightString(PAGE_WIDTH - MARGIN, self.y,
+                          f"Generado el: {to_local(datetime.now(timezone.utc), self.zone):%d/%m/%Y %H:%M:%S}")
+        if self.filtros:
+            self.y -= 12
+            c.drawString(MARGIN, self.y, f'Filtros aplicados: {self.filtros}')
+        c.setFillColor(HexColor('#000000'))
+        self.y -= 20
+
+    def _date_separator(self, day):
+        self._ensure(30)
+        c = self.canvas
+        c.setFillColor(HexColor('#f0f0f0'))
+        c.roundRect(MARGIN, self.y - 18, CONTENT_WIDTH, 20, 4, stroke=0, fill=1)
+        c.setFillColor(HexColor('#333333'))
+        c.setFont(FONT_BOLD, 11)
+        c.drawCentredString(PAGE_WIDTH / 2, self.y - 12, f'--- {format_day_es(day)} ---')
+        c.setFillColor(HexColor('#000000'))
+        self.y -= 30
+
+    def add(self, row):
+        """Dibuja un acta (ExportRow). Los cuerpos largos se parten entre páginas."""
+        local = to_local(row.fecha_creacion, self.zone) if row.fecha_creacion is not None else None
+        if local is not None:
+            day = local.date()
+            if day != self.current_day:
+                self._date_separator(day)
+                self.current_day = day
+
+        c = self.canvas
+        lines = wrap_text(row.body, CONTENT_WIDTH - 2 * PADDING)
+
+        # Encabezado + al menos dos líneas deben quedar juntos
+        self._ensure(18 + 2 * BODY_LEADING + PADDING)
+        self._box_top = self.y
+        c.setFont(FONT_BOLD, 9)
+        c.drawString(MARGIN + PADDING, self.y - 12, row.classification or '')
+        c.setFont(FONT, 9)
+        registro = f'{local:%d/%m/%Y %H:%M}' if local is not None else ''
+        c.drawRightString(PAGE_WIDTH - MARGIN - PADDING, self.y - 12, f'Registro: {registro}')
+        self.y -= 18 + 4
+
+        # Un único objeto de texto por tramo de página (más barato que un drawString por línea)
+        while lines:
+            fit = int((self.y - MARGIN) // BODY_LEADING)
+            if fit <= 0:
+                self._new_page()
+                continue
+            chunk, lines = lines[:fit], lines[fit:]
+            c.setFont(FONT, BODY_SIZE)
+            c.drawLines(MARGIN + PADDING, self.y - BODY_LEADING + 3, chunk, BODY_LEADING)
+            self.y -= BODY_LEADING * len(chunk)
+
+        if row.documento_url:
+            self._attachment(row)
+
+        self._ensure(16)
+        c.setFont(FONT, SMALL_SIZE)
+        c.setFillColor(HexColor('#555555'))
+        self.y -= 12
+        c.drawRightString(PAGE_WIDTH - MARGIN - PADDING, self.y, f'Por: {row.autor_nombre or ""}')
+        c.setFillColor(HexColor('#000000'))
+        self.y -= PADDING
+        self._box(self._box_top)
+        self._box_top = None
+        self.y -= 10
+        self.count += 1
+
+    def _attachment(self, row):
+        c = self.canvas
+        self._ensure(14)
+        self.y -= 12
+        c.setFont(FONT, SMALL_SIZE)
+        c.drawString(MARGIN + PADDING, self.y, f'Adjunto: {row.documento_url}')
+        # Se embebe el derivado 'impresion' (JPEG chico), nunca la foto original
+        path = derivatives.ensure(attachments.path_for(row.adjunto_sha256, row.documento_url),
+                                  row.documento_url, 'impresion')
+        if not path:
+            return
+        if path not in self._images:
+            if len(self._images) >= IMAGE_CACHE_SIZE:
+                self._images.pop(next(iter(self._images)))
+            try:
+                self._images[path] = self._embed(path)
+            except Exception:
+                current_app.logger.warning('No se pudo leer el adjunto %s para el PDF', path)
+                self._images[path] = None
+        if self._images[path] is None:
+            return
+        obj, width, height = self._images[path]
+        self._ensure(height + 8)
+        self.y -= height + 5
+        c.drawImage(obj, MARGIN + PADDING, self.y, width, height)
+
+    def _embed(self, path):
+        """Escribe la imagen en el PDF (el JPEG del derivado va tal cual) y devuelve (objeto, ancho, alto)."""
+        with Image.open(path) as image:
+            w, h = image.size
+            gray = image.mode == 'L'
+            if image.format == 'JPEG' and image.mode in ('RGB', 'L'):
+                with open(path, 'rb') as f:
+                    data = f.read()
+            else:
+                buf = io.BytesIO()
+                image.convert('RGB').save(buf, 'JPEG', quality=JPEG_QUALITY)
+                data, gray = buf.getvalue(), False
+        obj = self.canvas.add_jpeg(data, w, h, gray=gray)
+        scale = min(IMAGE_MAX_WIDTH / w, IMAGE_MAX_HEIGHT / h, 1)
+        return obj, w * scale, h * scale
+
+    def _box(self, top):
+        c = self.canvas
+        c.setStrokeColor(HexColor('#dddddd'))
+        c.rect(MARGIN, self.y, CONTENT_WIDTH, top - self.y, stroke=1, fill=0)
+
+    def finish(self):
+        if self.count == 0:
+            self.canvas.setFont(FONT, BODY_SIZE)
+            self.canvas.drawString(MARGIN, self.y - BODY_LEADING,
+                                   'No hay actas registradas que coincidan con los filtros aplicados.')
+        self._footer()
+        self.canvas.save()
+
+
+def render_libro(fileobj, rows, barrio, puesto, filtros=None, zone=None):
+    """Dibuja `rows` (iterable, idealmente un generador) sobre `fileobj` (`write()`). Devuelve la cantidad de actas."""
+    pdf = LibroActasPDF(fileobj, barrio, puesto, filtros=filtros, zone=zone)
+    pdf.header()
+    for row in rows:
+        pdf.add(row)
+    pdf.finish()
+    return pdf.count
+
+
+def describe_filters(query_text=None, start_date=None, end_date=None):
+    """Texto de "Filtros aplicados" para el encabezado del libro."""
+    return ', '.join(filter(None, [
+        f'texto "{query_text}"' if query_text else None,
+        f"desde {start_date.strftime('%d/%m/%Y')}" if start_date else None,
+        f"hasta {end_date.strftime('%d/%m/%Y')}" if end_date else None,
+    ]))
+
+
+def stream_libro_pdf(puesto, barrio_nombre, start_date=None, end_date=None, query_text=None,
+                     block_size=STREAM_BLOCK_SIZE):
+    """
+    Generador de bloques del libro de un puesto para una respuesta en
+    streaming: cada bloque sale apenas se escribieron `block_size` bytes de
+    páginas terminadas. Usar con `stream_with_context` (lee la base mientras
+    se envía).
+    """
+    sink = _Blocks()
+    pdf = LibroActasPDF(sink, barrio_nombre, puesto.nombre,
+                        filtros=describe_filters(query_text, start_date, end_date))
+    pdf.header()
+    for row in feed.stream_actas([puesto.id], start_date, end_date, query_text):
+        pdf.add(row)
+        if sink.size >= block_size:
+            yield sink.take()
+    pdf.finish()
+    yield sink.take()
+
+
+def iter_file(fileobj, block_size=STREAM_BLOCK_SIZE):
+    """Generador de bloques para una respuesta en streaming; cierra el archivo al terminar."""
+    try:
+        while True:
+            block = fileobj.read(block_size)
+            if not block:
+                break
+            yield block
+    finally:
+        fileobj.close()
@@ -0,0 +1,393 @@
+# app/rollups.py
+
+"""
+Resúmenes de actividad para los paneles (Super Admin y admin de barrio).
+
+Contar actas por día, autores activos o volumen de adjuntos con `COUNT` /
+`GROUP BY` sobre `actas` cuesta recorrer el libro entero, y el libro crece
+para siempre. Los paneles leen en cambio dos tablas chicas que se mantienen
+de a poco:
+
+- `resumen_actas_hora`: actas, adjuntos y bytes por hora (UTC) y puesto.
+- `resumen_actas_dia`: lo mismo por día, puesto y autor. El día es el de la
+  zona horaria de la organización del autor, como lo ve el barrio; contar
+  filas distintas de `usuario_id` da los usuarios activos.
+
+`catch_up` suma las actas con id mayor que `resumen_estado.ultimo_id`, de a
+lotes (`ROLLUP_BATCH_SIZE`) y leyendo de `actas` y de `actas_archivo`. Cada
+lote avanza el cursor con compare-and-set (`UPDATE ... WHERE ultimo_id =
+<el leído>`) *antes* de sumar, en la misma transacción que los upserts: si
+dos procesos toman el mismo rango, el segundo no actualiza ninguna fila,
+deshace y se retira, así ningún acta se cuenta dos veces. Los contadores se
+suman con upsert (`actas = actas + excluded.actas`, ver app/db_utils.py).
+
+Un INSERT todavía sin commit puede tener un id menor que otro ya confirmado,
+y el cursor no vuelve atrás. Por eso cada pasada suma solo hasta una marca
+de agua por id (fila `actas_visto` de `resumen_estado`): el id máximo que
+vio una pasada anterior, hace por lo menos `ROLLUP_SETTLE_SECONDS`. Las
+transacciones que tenían un id menor ya terminaron (confirmaron o
+deshicieron); no depende de `fecha_creacion` ni del reloj de cada worker.
+Cuando el cursor alcanza la marca, se toma una nueva con el id máximo
+actual.
+
+Se dispara solo al registrar un acta (`schedule`: una pasada en segundo
+plano pasada esa ventana, compartida por todas las altas del intervalo, que
+se vuelve a programar mientras quede algo sin sumar) y con
+`flask resumir-actas` (cron, carga inicial, datos sintéticos o `--rehacer`
+para recalcular desde cero).
+"""
+
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from app import db, db_utils
+from app.models import (Acta, ActaArchivada, Adjunto, Organizacion, Puesto, ResumenActasDia,
+                        ResumenActasHora, ResumenEstado, Usuario)
+from app.template_filters import DEFAULT_TIMEZONE, get_zone
+
+
+ESTADO_ACTAS = 'actas'
+ESTADO_VISTO = 'actas_visto'  # marca de agua: id máximo visto y cuándo
+SIN_ID = 0  # puesto o autor desconocido (las claves de los resúmenes no admiten NULL)
+COUNTERS = ('actas', 'adjuntos', 'bytes_adjuntos')
+
+Totales = namedtuple('Totales', 'actas adjuntos bytes_adjuntos usuarios_activos')
+Estado = namedtuple('Estado', 'ultimo_id actualizado pendientes')
+VACIO = Totales(0, 0, 0, 0)
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _default_zone():
+    return current_app.config.get('DEFAULT_TIMEZONE', DEFAULT_TIMEZONE)
+
+
+# ---------------------------
+# Mantenimiento
+# ---------------------------
+
+def _cursor():
+    """Último id sumado (crea la fila de estado si falta)."""
+    ultimo = db.session.scalar(db.select(ResumenEstado.ultimo_id).where(ResumenEstado.nombre == ESTADO_ACTAS))
+    if ultimo is None:
+        db.session.execute(db.insert(ResumenEstado.__table__).values(nombre=ESTADO_ACTAS, ultimo_id=0))
+        db.session.commit()
+        return 0
+    return ultimo
+
+
+def _advance(lo, hi):
+    """Compare-and-set del cursor: False si otro proceso ya lo movió."""
+    result = db.session.execute(
+        db.update(ResumenEstado.__table__)
+        .where(ResumenEstado.nombre == ESTADO_ACTAS, ResumenEstado.ultimo_id == lo)
+        .values(ultimo_id=hi, actualizado=_utcnow())
+    )
+    return result.rowcount == 1
+
+
+def _watermark():
+    """(id, cuándo se vio) de la marca de agua; (0, None) si todavía no hay."""
+    row = db.session.execute(
+        db.select(ResumenEstado.ultimo_id, ResumenEstado.actualizado).where(ResumenEstado.nombre == ESTADO_VISTO)
+    ).first()
+    return (row.ultimo_id, row.actualizado) if row is not None else (0, None)
+
+
+def _max_id():
+    return max(db.session.scalar(db.select(db.func.max(Acta.id))) or 0,
+               db.session.scalar(db.select(db.func.max(ActaArchivada.id))) or 0)
+
+
+def _refresh_watermark(previous):
+    """Nueva marca con el id máximo actual (compare-and-set sobre la anterior). Devuelve el id."""
+    max_id = _max_id()
+    values = {'ultimo_id': max_id, 'actualizado': _utcnow()}
+    if previous[1] is None:
+        db.session.execute(db.insert(ResumenEstado.__table__).values(nombre=ESTADO_VISTO, **values))
+    else:
+        db.session.execute(
+            db.update(ResumenEstado.__table__)
+            .where(ResumenEstado.nombre == ESTADO_VISTO, ResumenEstado.ultimo_id == previous[0])
+            .values(**values))
+    db.session.commit()
+    return max_id
+
+
+def _pending_rows(lo, hi, limit):
+    """
+    Hasta `limit` actas con lo < id <= hi, calientes y archivadas, en orden de id
+    y con el tamaño del adjunto. Se lee la tabla caliente primero: un acta que se
+    archiva entre las dos lecturas aparece en ambas y se cuenta una vez; nunca en
+    ninguna.
+    """
+    rows = {}
+    for model in (Acta, ActaArchivada):
+        t = model.__table__
+        for row in db.session.execute(
+            db.select(t.c.id, t.c.fecha_creacion, t.c.puesto_id, t.c.usuario_id,
+                      t.c.adjunto_sha256, t.c.documento_url, Adjunto.tamano)
+            .outerjoin(Adjunto, Adjunto.sha256 == t.c.adjunto_sha256)
+            .where(t.c.id > lo, t.c.id <= hi).order_by(t.c.id).limit(limit)
+        ):
+            rows.setdefault(row.id, row)
+    return [rows[i] for i in sorted(rows)[:limit]]
+
+
+def _zones(usuario_ids):
+    """{usuario_id: zona horaria de su organización} en una consulta."""
+    if not usuario_ids:
+        return {}
+    return dict(db.session.execute(
+        db.select(Usuario.id, Organizacion.zona_horaria)
+        .join(Organizacion, Organizacion.id == Usuario.organizacion_id)
+        .where(Usuario.id.in_(usuario_ids))
+    ).all())
+
+
+def aggregate(rows, zones, default_zone):
+    """Filas de acta -> (filas por hora, filas por día) listas para el upsert."""
+    horas = defaultdict(lambda: [0, 0, 0])
+    dias = defaultdict(lambda: [0, 0, 0])
+    for r in rows:
+        fecha = r.fecha_creacion
+        if fecha is None:
+            continue
+        if fecha.tzinfo is not None:
+            fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+        puesto_id = r.puesto_id or SIN_ID
+        usuario_id = r.usuario_id or SIN_ID
+        zona = get_zone(zones.get(r.usuario_id) or default_zone)
+        dia = fecha.replace(tzinfo=timezone.utc).astimezone(zona).date()
+        con_adjunto = 1 if (r.adjunto_sha256 or r.documento_url) else 0
+        tamano = r.tamano or 0
+        for bucket in (horas[(fecha.replace(minute=0, second=0, microsecond=0), puesto_id)],
+                       dias[(dia, puesto_id, usuario_id)]):
+            bucket[0] += 1
+            bucket[1] += con_adjunto
+            bucket[2] += tamano
+    return (
+        [dict(zip(('hora', 'puesto_id') + COUNTERS, key + tuple(v))) for key, v in horas.items()],
+        [dict(zip(('dia', 'puesto_id', 'usuario_id') + COUNTERS, key + tuple(v))) for key, v in dias.items()],
+    )
+
+
+def catch_up(batch_size=None, max_batches=None, settle=None, wait=False, progress=None):
+    """
+    Suma a los resúmenes las actas nuevas desde el cursor hasta la marca de
+    agua (ver docstring del módulo). Devuelve {'actas': n, 'lotes': n,
+    'ultimo_id': id, 'pendiente': bool}; `pendiente` indica que quedaron
+    actas para una pasada posterior. Con `wait` (CLI) espera una vez a que se
+    asiente la marca nueva y sigue. Se detiene al agotar `max_batches` o si
+    otro proceso mueve el cursor primero.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('ROLLUP_BATCH_SIZE', 2000)
+    settle = config.get('ROLLUP_SETTLE_SECONDS', 10) if settle is None else settle
+    default_zone = _default_zone()
+    totals = {'actas': 0, 'lotes': 0, 'ultimo_id': None, 'pendiente': False}
+    waited = False
+
+    while max_batches is None or totals['lotes'] < max_batches:
+        lo = _cursor()
+        totals['ultimo_id'] = lo
+        watermark = hi, seen_at = _watermark()
+        age = (_utcnow() - seen_at).total_seconds() if seen_at is not None else None
+        if seen_at is None or (age >= settle and hi <= lo):
+            # Sin marca o ya alcanzada: se toma otra con el id máximo actual
+            hi, age = _refresh_watermark(watermark), 0
+        elif age >= settle:
+            ready = _pending_rows(lo, hi, batch_size)
+            # Lote incompleto: no hay más actas hasta la marca (los huecos de ids se saltean)
+            top = ready[-1].id if len(ready) == batch_size else hi
+            if not _advance(lo, top):
+                db.session.rollback()
+                break
+            if ready:
+                horas, dias = aggregate(ready, _zones({r.usuario_id for r in ready if r.usuario_id}), default_zone)
+                db_utils.upsert(ResumenActasHora.__table__, horas, conflict_columns=('hora', 'puesto_id'),
+                                increment_columns=COUNTERS)
+                db_utils.upsert(ResumenActasDia.__table__, dias, conflict_columns=('dia', 'puesto_id', 'usuario_id'),
+                                increment_columns=COUNTERS)
+            db.session.commit()
+            totals['actas'] += len(ready)
+            totals['lotes'] += 1
+            totals['ultimo_id'] = top
+            if progress:
+                progress(f"Lote {totals['lotes']}: actas hasta #{top} ({totals['actas']} en total)")
+            continue
+        else:
+            db.session.commit()
+        # Marca fresca: lo que tiene por debajo puede tener INSERT sin confirmar todavía
+        totals['pendiente'] = hi > lo
+        if totals['pendiente'] and (wait or settle <= 0) and not waited:
+            waited = True
+            time.sleep(max(settle - age, 0))
+            continue
+        break
+    else:
+        totals['pendiente'] = True
+    return totals
+
+
+def reset():
+    """Vacía los resúmenes y vuelve el cursor a 0 (el commit queda a cargo del llamador)."""
+    # Primero el cursor: toma el lock de la fila y una pasada concurrente no puede confirmar encima
+    result = db.session.execute(
+        db.update(ResumenEstado.__table__).where(ResumenEstado.nombre == ESTADO_ACTAS)
+        .values(ultimo_id=0, actualizado=_utcnow()))
+    if result.rowcount == 0:
+        db.session.execute(db.insert(ResumenEstado.__table__).values(nombre=ESTADO_ACTAS, ultimo_id=0))
+    db.session.execute(db.delete(ResumenActasHora))
+    db.session.execute(db.delete(ResumenActasDia))
+
+
+def _run_scheduled(app):
+    global _timer
+    with _timer_lock:
+        _timer = None
+    pending = False
+    with app.app_context():
+        try:
+            pending = catch_up(max_batches=app.config.get('ROLLUP_ON_INSERT_MAX_BATCHES', 5))['pendiente']
+        except Exception:
+            app.logger.exception('No se pudieron actualizar los resúmenes de actividad')
+            db.session.rollback()
+        finally:
+            db.session.remove()
+    if pending:
+        schedule(app)  # falta sumar lo que quedó después de la marca de agua
+
+
+def schedule(app):
+    """Programa una pasada de `catch_up` en segundo plano (una sola para todas las altas de la ventana)."""
+    global _timer
+    if not app.config.get('ROLLUP_ON_INSERT', True):
+        return
+    with _timer_lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(app.config.get('ROLLUP_SETTLE_SECONDS', 10) + 0.5, _run_scheduled, args=(app,))
+        _timer.daemon = True
+        _timer.start()
+
+
+# ---------------------------
+# Lecturas de los paneles
+# ---------------------------
+
+def _today():
+    return datetime.now(get_zone(_default_zone())).date()
+
+
+def _first_day(dias):
+    return _today() - timedelta(days=dias - 1)
+
+
+def status():
+    """Hasta qué acta llegan los resúmenes y cuántas faltan (aprox.: huecos de ids cuentan)."""
+    max_id = db.select(db.func.max(Acta.id)).scalar_subquery()
+    row = db.session.execute(
+        db.select(ResumenEstado.ultimo_id, ResumenEstado.actualizado, max_id)
+        .where(ResumenEstado.nombre == ESTADO_ACTAS)
+    ).first()
+    if row is None:
+        return Estado(0, None, db.session.scalar(db.select(db.func.max(Acta.id))) or 0)
+    ultimo_id, actualizado, max_id = row
+    return Estado(ultimo_id, actualizado, max((max_id or 0) - ultimo_id, 0))
+
+
+def by_organization(dias=30):
+    """{organizacion_id: Totales} de los últimos `dias` días (actas con autor)."""
+    d = ResumenActasDia
+    rows = db.session.execute(
+        db.select(Usuario.organizacion_id, db.func.sum(d.actas), db.func.sum(d.adjuntos),
+                  db.func.sum(d.bytes_adjuntos), _active_users(d))
+        .join(Usuario, Usuario.id == d.usuario_id)
+        .where(d.dia >= _first_day(dias))
+        .group_by(Usuario.organizacion_id)
+    )
+    return {org_id: Totales(int(a or 0), int(adj or 0), int(b or 0), u) for org_id, a, adj, b, u in rows}
+
+
+def by_plan(organizaciones, por_organizacion):
+    """[(plan, organizaciones, con actividad, Totales)] sumando `by_organization` (sin más consultas)."""
+    planes = {}
+    for org in organizaciones:
+        plan = planes.setdefault(org.plan_id, [org.plan, 0, 0, [0, 0, 0, 0]])
+        plan[1] += 1
+        totales = por_organizacion.get(org.id)
+        if totales:
+            plan[2] += 1
+            plan[3] = [x + y for x, y in zip(plan[3], totales)]
+    return [(p, n, activas, Totales(*t)) for p, n, activas, t in
+            sorted(planes.values(), key=lambda item: item[0].precio)]
+
+
+def _active_users(d):
+    """Autores distintos, sin contar las actas sin autor."""
+    return db.func.count(db.distinct(db.case((d.usuario_id != SIN_ID, d.usuario_id))))
+
+
+def _barrio_filter(query, column, barrio_id):
+    if barrio_id is None:
+        return query
+    return query.join(Puesto, Puesto.id == column).where(Puesto.barrio_id == barrio_id)
+
+
+def daily(dias=14, barrio_id=None):
+    """[(día, Totales)] de los últimos `dias` días, con ceros en los días sin actas."""
+    d = ResumenActasDia
+    desde = _first_day(dias)
+    query = (db.select(d.dia, db.func.sum(d.actas), db.func.sum(d.adjuntos), db.func.sum(d.bytes_adjuntos),
+                       _active_users(d))
+             .where(d.dia >= desde).group_by(d.dia))
+    found = {dia: Totales(int(a or 0), int(adj or 0), int(b or 0), u)
+             for dia, a, adj, b, u in db.session.execute(_barrio_filter(query, d.puesto_id, barrio_id))}
+    return [(desde + timedelta(days=i), found.get(desde + timedelta(days=i), VACIO)) for i in range(dias)]
+
+
+def hourly(horas=24, barrio_id=None, now=None):
+    """[(hora UTC, actas)] de las últimas `horas` horas, con ceros en las horas sin actas."""
+    h = ResumenActasHora
+    ultima = (now or _utcnow()).replace(minute=0, second=0, microsecond=0)
+    desde = ultima - timedelta(hours=horas - 1)
+    query = db.select(h.hora, db.func.sum(h.actas)).where(h.hora >= desde).group_by(h.hora)
+    found = {hora: int(n or 0) for hora, n in db.session.execute(_barrio_filter(query, h.puesto_id, barrio_id))}
+    return [(desde + timedelta(hours=i), found.get(desde + timedelta(hours=i), 0)) for i in range(horas)]
+
+
+def by_puesto(barrio_id, dias=30):
+    """[(Puesto, Totales)] de todos los puestos del barrio en los últimos `dias` días."""
+    d = ResumenActasDia
+    desde = _first_day(dias)
+    rows = db.session.execute(
+        db.select(d.puesto_id, db.func.sum(d.actas), db.func.sum(d.adjuntos), db.func.sum(d.bytes_adjuntos),
+                  _active_users(d))
+        .join(Puesto, Puesto.id == d.puesto_id)
+        .where(Puesto.barrio_id == barrio_id, d.dia >= desde)
+        .group_by(d.puesto_id)
+    )
+    found = {puesto_id: Totales(int(a or 0), int(adj or 0), int(b or 0), u) for puesto_id, a, adj, b, u in rows}
+    puestos = db.session.scalars(db.select(Puesto).where(Puesto.barrio_id == barrio_id).order_by(Puesto.nombre))
+    return [(p, found.get(p.id, VACIO)) for p in puestos]
+
+
+def barrio_totals(barrio_id, dias=30):
+    """Totales del barrio en los últimos `dias` días (usuarios activos sin repetir entre puestos)."""
+    d = ResumenActasDia
+    a, adj, b, u = db.session.execute(
+        db.select(db.func.sum(d.actas), db.func.sum(d.adjuntos), db.func.sum(d.bytes_adjuntos),
+                  _active_users(d))
+        .join(Puesto, Puesto.id == d.puesto_id)
+        .where(Puesto.barrio_id == barrio_id, d.dia >= _first_day(dias))
+    ).one()
+    return Totales(int(a or 0), int(adj or 0), int(b or 0), u)
@@ -0,0 +1,159 @@
+# app/search.py
+
+"""
+Buscador de actas sobre índices full-text nativos de cada motor.
+
+- SQLite:     tabla virtual FTS5 `actas_fts` (tokenizer unicode61, sin diacríticos).
+- MySQL:      índice FULLTEXT `ft_actas_texto` (columnas con collation accent-insensitive).
+- PostgreSQL: índice GIN sobre `to_tsvector('spanish', f_unaccent(...))`.
+
+Los índices se crean en la migración `c41f7a2e8d90`. No hay fallback con
+`LIKE '%término%'`: en un libro con millones de actas sería un full scan.
+
+El archivo (`actas_archivo`, migración `d3a7e9b1c5f8`) tiene sus propios
+índices sobre `terminos` en lugar de `body`; `_match` elige según la tabla.
+"""
+
+import re
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import Subquery
+from sqlalchemy.dialects import mysql
+from app import db
+from app.models import Acta, ActaArchivada
+from app.text_utils import fold_accents
+from app.feed import archive_feed_select, feed_select, rows_from_result
+from app.template_filters import local_day_start
+
+
+# Expresión indexada en PostgreSQL; tiene que coincidir literalmente con la del índice.
+PG_TSVECTOR_SQL = (
+    "to_tsvector('spanish'::regconfig, f_unaccent("
+    "coalesce({table}.classification, '') || ' ' || coalesce({table}.{column}, '')))"
+)
+
+# Por tabla: (tabla FTS5 de SQLite, columna de texto indexada junto con `classification`)
+FTS_INDEXES = {
+    'actas': ('actas_fts', 'body'),
+    'actas_archivo': ('actas_archivo_fts', 'terminos'),
+}
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+
+class SearchUnavailable(Exception):
+    """El motor de base de datos no tiene índice full-text configurado."""
+
+
+def query_terms(text):
+    """Términos de búsqueda normalizados (sin tildes, sin operadores, a lo sumo MAX_TERMS)."""
+    return _TERM_RE.findall(fold_accents(text))[:MAX_TERMS]
+
+
+def _match(terms, table):
+    """(condición WHERE, expresión de relevancia, orden descendente?) según el motor."""
+    dialect = db.session.get_bind().dialect.name
+    fts_name, text_column = FTS_INDEXES[table.name]
+
+    if dialect == 'sqlite':
+        fts = db.table(fts_name, db.column('rowid'))
+        expr = ' '.join(f'"{t}"*' for t in terms)
+        # Subconsulta sobre la tabla FTS: se une por rowid (o va en un IN) y aporta el ranking bm25.
+        matches = (
+            db.select(fts.c.rowid, db.func.bm25(db.literal_column(fts_name)).label('rank'))
+            .select_from(fts)
+            .where(db.text(f'{fts_name} MATCH :fts_q').bindparams(fts_q=expr))
+            .subquery()
+        )
+        return matches, matches.c.rank, False
+
+    if dialect in ('mysql', 'mariadb'):
+        expr = ' '.join(f'+{t}*' for t in terms)
+        score = mysql.match(table.c.classification, table.c[text_column], against=expr).in_boolean_mode()
+        return score, score, True
+
+    if dialect == 'postgresql':
+        vector = db.literal_column(PG_TSVECTOR_SQL.format(table=table.name, column=text_column))
+        tsquery = db.func.to_tsquery(
+            db.literal_column("'spanish'::regconfig"),
+            db.func.f_unaccent(' & '.join(f'{t}:*' for t in terms)),
+        )
+        return vector.op('@@')(tsquery), db.func.ts_rank(vector, tsquery), True
+
+    raise SearchUnavailable(f'Búsqueda full-text no soportada para {dialect}.')
+
+
+def date_filters(column, start_date=None, end_date=None, zone=None):
+    """
+    Rango inclusivo de días locales (los que ve el usuario, en `zone` o la zona
+    de la organización) sobre una columna DateTime en UTC; usa el índice por fecha.
+    """
+    filters = []
+    if start_date:
+        filters.append(column >= local_day_start(start_date, zone))
+    if end_date:
+        filters.append(column < local_day_start(end_date + timedelta(days=1), zone))
+    return filters
+
+
+def apply_text_filter(query, query_text, table=None):
+    """Agrega a `query` el filtro full-text (sin ranking); útil para exportaciones."""
+    t = table if table is not None else Acta.__table__
+    terms = query_terms(query_text)
+    if not terms:
+        return query
+    cond, _rank, _desc = _match(terms, t)
+    if isinstance(cond, Subquery):
+        return query.where(t.c.id.in_(db.select(cond.c.rowid)))
+    return query.where(cond)
+
+
+def _search_query(query, t, puesto_ids, terms, start_date, end_date, limit):
+    query = query.where(t.c.puesto_id.in_(list(puesto_ids)))
+    for f in date_filters(t.c.fecha_creacion, start_date, end_date):
+        query = query.where(f)
+
+    order = [t.c.fecha_creacion.desc(), t.c.id.desc()]
+    if terms:
+        cond, rank, rank_desc = _match(terms, t)
+        if isinstance(cond, Subquery):
+            query = query.join(cond, cond.c.rowid == t.c.id)
+        else:
+            query = query.where(cond)
+        order.insert(0, rank.desc() if rank_desc else rank.asc())
+    return query.order_by(*order).limit(limit)
+
+
+def search_actas(puesto_ids, query_text=None, start_date=None, end_date=None, limit=None):
+    """
+    Actas de `puesto_ids` que coinciden con la búsqueda, ordenadas por relevancia
+    (o por fecha si solo hay rango de fechas). El llamador debe pasar únicamente
+    puestos visibles para el usuario.
+
+    Con términos, primero van las actas de la tabla caliente y después las del
+    archivo (los rankings de índices distintos no son comparables); si las
+    recientes ya llenan el límite, el archivo ni se consulta. Con solo fechas se
+    intercalan por fecha.
+    """
+    if not puesto_ids:
+        return []
+    limit = limit or current_app.config.get('SEARCH_MAX_RESULTS', 100)
+    terms = query_terms(query_text)
+
+    rows = db.session.execute(
+        _search_query(feed_select(), Acta.__table__, puesto_ids, terms, start_date, end_date, limit)).all()
+    if terms and len(rows) >= limit:
+        return rows_from_result(rows)
+    archived = db.session.execute(
+        _search_query(archive_feed_select(), ActaArchivada.__table__, puesto_ids, terms, start_date, end_date,
+                      limit - len(rows) if terms else limit)).all()
+    # Un acta archivada entre las dos lecturas viene en ambas: queda la de la tabla caliente
+    merged = {}
+    for row in (*rows, *archived):
+        merged.setdefault(row.id, row)
+    rows = list(merged.values())
+    if not terms:
+        rows = sorted(rows, key=lambda r: (r.fecha_creacion, r.id), reverse=True)[:limit]
+    return rows_from_result(rows)
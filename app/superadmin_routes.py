@@ -1,7 +1,12 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, abort
-from app import db
+from flask import Blueprint, render_template, flash, redirect, url_for, abort, request, current_app
+from flask_wtf import FlaskForm
+from sqlalchemy.orm import joinedload
+from app import db, fragment_cache, instrumentation, rollups
 from app.forms import CrearOrganizacionForm
 from app.models import Organizacion, Plan, Barrio, Rol, Usuario
+from app.access import invalidate_access
+from app.passwords import BUSY_SAVE_MESSAGE, PasswordBusy, busy_response
+from app.db_routing import read_replica
 from flask_login import current_user, login_required
 from functools import wraps
 
@@ -9,6 +14,9 @@ from functools import wraps
 # Creamos un Blueprint específico para el Super Admin
 superadmin_bp = Blueprint('superadmin', __name__, url_prefix='/superadmin')
 
+DASHBOARD_DAYS = 30  # ventana de los totales por organización y por plan
+DASHBOARD_SERIES_DAYS = 14
+
 # Decorador para asegurar que solo el Super Admin acceda a estas rutas
 def super_admin_required(f):
     @wraps(f)
@@ -22,10 +30,20 @@ def super_admin_required(f):
 @superadmin_bp.route('/')
 @login_required
 @super_admin_required
+@read_replica
 def index():
     """Página principal del panel de Super Admin."""
-    organizaciones = db.session.scalars(db.select(Organizacion).order_by(Organizacion.nombre)).all()
-    return render_template('superadmin/dashboard.html', title='Panel de Super Admin', organizaciones=organizaciones)
+    # El plan viene en el mismo SELECT (antes era una consulta por organización)
+    organizaciones = db.session.scalars(
+        db.select(Organizacion).options(joinedload(Organizacion.plan)).order_by(Organizacion.nombre)).all()
+    # Números de actividad: solo de las tablas de resumen, nunca un GROUP BY sobre `actas` (ver app/rollups.py)
+    dias = DASHBOARD_DAYS
+    por_organizacion = rollups.by_organization(dias)
+    return render_template('superadmin/dashboard.html', title='Panel de Super Admin', organizaciones=organizaciones,
+                           dias=dias, por_organizacion=por_organizacion, vacio=rollups.VACIO,
+                           por_plan=rollups.by_plan(organizaciones, por_organizacion),
+                           por_dia=rollups.daily(DASHBOARD_SERIES_DAYS), por_hora=rollups.hourly(24),
+                           estado=rollups.status())
 
 @superadmin_bp.route('/organizaciones/crear', methods=['GET', 'POST'])
 @login_required
@@ -35,7 +53,8 @@ def crear_organizacion():
     form = CrearOrganizacionForm()
     if form.validate_on_submit():
         # 1. Crear la nueva organización
-        nueva_org = Organizacion(nombre=form.nombre_org.data, plan_id=form.plan.data)
+        nueva_org = Organizacion(nombre=form.nombre_org.data, plan_id=form.plan.data,
+                                 zona_horaria=form.zona_horaria.data)
         db.session.add(nueva_org)
 
         # 2. Obtener el rol de "Admin de Barrio"
@@ -54,11 +73,54 @@ def crear_organizacion():
             organizacion=nueva_org,
             barrio_admin_id=form.barrio_a_gestionar.data
         )
-        admin_de_barrio.password = form.admin_password.data
+        try:
+            admin_de_barrio.password = form.admin_password.data
+        except PasswordBusy:
+            db.session.rollback()
+            return busy_response(lambda: render_template('superadmin/crear_organizacion.html',
+                                                         title='Crear Organización', form=form),
+                                 BUSY_SAVE_MESSAGE)
         db.session.add(admin_de_barrio)
-        
+
+        db.session.flush()
+        invalidate_access(admin_de_barrio.id)
         db.session.commit()
         flash('Nueva organización y su administrador fueron creados con éxito.', 'success')
         return redirect(url_for('superadmin.index'))
     
-    return render_template('superadmin/crear_organizacion.html', title='Crear Organización', form=form)
\ No newline at end of file
+    return render_template('superadmin/crear_organizacion.html', title='Crear Organización', form=form)
+
+
+SQL_STATS_ORDERS = {
+    'total_ms': 'Tiempo total',
+    'avg_ms': 'Tiempo promedio',
+    'max_ms': 'Tiempo máximo',
+    'count': 'Ejecuciones',
+    'n_plus_one': 'Probables N+1',
+}
+
+
+@superadmin_bp.route('/sql', methods=['GET', 'POST'])
+@login_required
+@super_admin_required
+def sql_stats():
+    """Sentencias SQL que más tiempo acumulan desde el arranque (o el último reinicio)."""
+    form = FlaskForm()  # solo CSRF para el botón de reinicio
+    if form.validate_on_submit():
+        instrumentation.reset_stats()
+        fragment_cache.get_cache().reset_stats()
+        flash('Estadísticas de SQL y de la cache de fragmentos reiniciadas.', 'success')
+        return redirect(url_for('superadmin.sql_stats'))
+
+    order = request.args.get('orden', 'total_ms')
+    if order not in SQL_STATS_ORDERS:
+        order = 'total_ms'
+    return render_template(
+        'superadmin/sql_stats.html', title='Consultas SQL', form=form,
+        enabled=current_app.config.get('SQL_INSTRUMENTATION'),
+        statements=instrumentation.top_statements(order, limit=request.args.get('limite', 50, type=int)),
+        orders=SQL_STATS_ORDERS, order=order, since=instrumentation.stats_since(),
+        slow_ms=current_app.config.get('SLOW_QUERY_MS'),
+        n_plus_one=current_app.config.get('SQL_N_PLUS_ONE_THRESHOLD'),
+        fragments=fragment_cache.get_cache(),
+    )
@@ -0,0 +1,392 @@
+# app/synthetic_data.py
+
+"""
+Generador de datos sintéticos a escala (`flask seed-scale`).
+
+Arma un volumen parecido al de producción —miles de barrios y puestos, decenas
+de miles de usuarios y permisos, millones de actas— para medir cambios de
+rendimiento contra algo realista. Todo sale de un `random.Random(semilla)`:
+con la misma semilla y los mismos parámetros (incluida `hasta`) el resultado
+es idéntico en SQLite, MySQL y PostgreSQL.
+
+Se inserta con Core (`insert()` + executemany por lotes), sin pasar por el ORM,
+y con ids explícitos a continuación del máximo actual: así no hay que releer
+ids para armar las claves foráneas y se puede agregar sobre una base con datos.
+
+Distribuciones:
+- Actas por puesto: ley de potencias (unos pocos puestos concentran mucho
+  movimiento, la mayoría poco), como en los barrios reales.
+- Hora: en la zona `DEFAULT_TIMEZONE`, con pico diurno; los inicios y fines de
+  jornada caen cerca de los cambios de turno (6 y 18 h).
+- Clasificación: mayoría de CONSTANCIA, luego jornadas, órdenes y cortes de luz.
+- Las actas se generan día por día en orden cronológico, así que el id crece
+  con la fecha como pasa al cargarlas de verdad. `hasta` es por defecto el
+  día de hoy en esa zona, y ninguna acta queda con fecha posterior a ahora:
+  las del último día que caerían en el futuro se reparten en lo que va del día.
+
+Si la base no tiene Super Admin (por ejemplo después de `--fresh`) se crea
+uno fijo, como en `flask seed`: DNI `SUPER_ADMIN_DNI`, contraseña
+`DEFAULT_PASSWORD`, en la primera organización generada.
+"""
+
+import bisect
+import contextlib
+import itertools
+import random
+from datetime import datetime, time, timedelta, timezone
+
+from flask import current_app
+from app import db, rollups
+from app.models import Acta, ActaArchivada, Barrio, Organizacion, PermisoPuesto, Plan, Puesto, Rol, Usuario, ExportJob
+from app.passwords import hash_password
+from app.template_filters import get_zone
+from app.text_utils import fold_accents
+
+
+DEFAULT_PASSWORD = 'password'
+DNI_BASE = 60_000_000  # lejos de los DNI fijos de `flask seed`
+SUPER_ADMIN_DNI = '00000000'  # el mismo de `flask seed`
+
+NOMBRES_BARRIO = (
+    'Los Álamos', 'San Isidro Chico', 'El Ombú', 'Santa Bárbara', 'Los Robles', 'Cadaqués',
+    'La Horqueta', 'El Encuentro', 'Náutico Norte', 'Las Acacias', 'San Agustín', 'El Cazador',
+    'Pilar del Este', 'Los Castaños', 'La Candelaria', 'Altos del Sol', 'Edificio Mitre', 'Torre Güemes',
+)
+NOMBRES_PUESTO = (
+    'Portería Principal', 'C.O.M.', 'Acceso Norte', 'Acceso Sur', 'Recepción', 'Guardia de Ronda',
+    'Acceso Proveedores', 'Garita Lagunas', 'Control Vehicular', 'Monitoreo',
+)
+NOMBRES = (
+    'María', 'José', 'Juan', 'Ana', 'Carlos', 'Lucía', 'Martín', 'Sofía', 'Julián', 'Valentina',
+    'Héctor', 'Mónica', 'Ramón', 'Inés', 'Andrés', 'Belén', 'Joaquín', 'Noemí', 'Raúl', 'Ángela',
+)
+APELLIDOS = (
+    'González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez', 'García',
+    'Sánchez', 'Romero', 'Sosa', 'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Acuña', 'Benítez', 'Núñez', 'Ibáñez',
+)
+ZONAS = (
+    ('America/Argentina/Buenos_Aires', 16), ('America/Argentina/Cordoba', 2),
+    ('America/Montevideo', 1), ('America/Santiago', 1),
+)
+
+# Clasificación -> peso
+CLASIFICACIONES = (
+    ('CONSTANCIA', 70), ('INICIO JORNADA', 9), ('FIN JORNADA', 9), ('ORDEN', 8),
+    ('INICIO CORTE DE LUZ', 2), ('FIN CORTE DE LUZ', 2),
+)
+# Peso relativo de cada hora local (0..23) para constancias y órdenes
+PESO_HORA = (1, 1, 1, 1, 1, 2, 4, 6, 8, 9, 9, 9, 8, 8, 8, 9, 9, 9, 8, 6, 4, 3, 2, 1)
+CAMBIOS_DE_TURNO = (6, 18)
+
+EMPRESAS = ('Correo Argentino', 'Mercado Libre', 'Edesur', 'Aysa', 'Fibertel', 'Volquetes Pilar', 'Jardinería Verde')
+FRASES = (
+    'Ingresa camión de {empresa} patente {patente} con destino al lote {lote}.',
+    'Egresa personal de {empresa}; se controla baúl sin novedad.',
+    'Se realiza ronda perimetral por el sector {sector}; sin novedad.',
+    'Vecino del lote {lote} informa ruidos molestos; se da aviso a la administración.',
+    'Se recibe paquete de {empresa} para el lote {lote}; queda en guardia.',
+    'Se deja constancia de visita autorizada por el propietario del lote {lote}.',
+    'Portón del acceso {sector} queda trabado; se da aviso a mantenimiento.',
+    'Corte de luz en el sector {sector}; se activa grupo electrógeno.',
+    'Se observa vehículo sospechoso sobre la colectora; se informa al móvil policial.',
+    'Cambio de guardia: se entregan llaves, radio y novedades del turno.',
+)
+SECTORES = ('norte', 'sur', 'este', 'oeste', 'lagunas', 'club house')
+# Textos distintos que se reparten entre las actas (armar uno por fila era la mitad del tiempo)
+CUERPOS_DISTINTOS = 16384
+
+
+def _weighted(rng, pairs):
+    """Elige de [(valor, peso), ...] (pesos enteros)."""
+    total = sum(p for _, p in pairs)
+    x = rng.random() * total
+    for value, weight in pairs:
+        x -= weight
+        if x < 0:
+            return value
+    return pairs[-1][0]
+
+
+class _Cumulative:
+    """Elección ponderada O(log n) sobre muchos elementos (los puestos)."""
+
+    def __init__(self, weights):
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def pick(self, rng):
+        return bisect.bisect_right(self.cumulative, rng.random() * self.total)
+
+
+def _patente(rng):
+    letras = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+    return (rng.choice(letras) + rng.choice(letras) + f'{rng.randrange(1000):03d}'
+            + rng.choice(letras) + rng.choice(letras))
+
+
+def _body(rng):
+    # La mayoría son de una o dos frases; algunas son partes largos
+    frases = 1 + (rng.random() < 0.35) + (rng.random() < 0.1) * rng.randrange(2, 8)
+    partes = []
+    for _ in range(frases):
+        partes.append(rng.choice(FRASES).format(
+            empresa=rng.choice(EMPRESAS), patente=_patente(rng),
+            lote=rng.randrange(1, 900), sector=rng.choice(SECTORES)))
+    return ' '.join(partes)
+
+
+def _next_id(model):
+    return (db.session.scalar(db.select(db.func.max(model.id))) or 0) + 1
+
+
+def _insert(table, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+        db.session.commit()
+
+
+@contextlib.contextmanager
+def _bulk_load():
+    """
+    En SQLite el trigger de FTS5 indexa fila por fila y triplica el tiempo de carga:
+    se saca durante la carga y al final se reconstruye el índice de una vez.
+    """
+    trigger_sql = None
+    if db.engine.dialect.name == 'sqlite':
+        trigger_sql = db.session.scalar(db.text(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'actas_fts_ai'"))
+    if trigger_sql:
+        db.session.execute(db.text('DROP TRIGGER actas_fts_ai'))
+        db.session.commit()
+    try:
+        yield
+    finally:
+        if trigger_sql:
+            db.session.rollback()
+            db.session.execute(db.text("INSERT INTO actas_fts(actas_fts) VALUES ('rebuild')"))
+            db.session.execute(db.text(trigger_sql))
+            db.session.commit()
+
+
+def _sync_sequences(tables):
+    """En PostgreSQL los ids explícitos no mueven las secuencias; se alinean al máximo."""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"))
+    db.session.commit()
+
+
+def wipe():
+    """
+    Borra todo salvo planes y roles (equivalente a `flask seed --fresh`, pero con
+    DELETE masivo). El Super Admin también se borra; `generate` lo vuelve a crear.
+    """
+    for model in (ExportJob, ActaArchivada, Acta, PermisoPuesto, Usuario, Puesto, Barrio, Organizacion):
+        db.session.execute(db.delete(model))
+    rollups.reset()
+    db.session.commit()
+
+
+def _catalog():
+    """Ids de plan y roles, creándolos si la base está vacía."""
+    planes = {p.nombre: p for p in db.session.scalars(db.select(Plan))}
+    if not planes:
+        for nombre, precio, crea in (('Básico', 30, False), ('Profesional', 50, False), ('Corporativo', 100, True)):
+            planes[nombre] = Plan(nombre=nombre, precio=precio, puede_crear_puestos=crea)
+            db.session.add(planes[nombre])
+    roles = {r.nombre: r for r in db.session.scalars(db.select(Rol))}
+    for nombre in ('Super Admin', 'Administrador', 'Usuario'):
+        if nombre not in roles:
+            roles[nombre] = Rol(nombre=nombre)
+            db.session.add(roles[nombre])
+    db.session.commit()
+    return sorted(p.id for p in planes.values()), roles['Super Admin'].id, roles['Administrador'].id, roles['Usuario'].id
+
+
+def _ensure_super_admin(rol_id, organizacion_id, password_hash):
+    """Crea el Super Admin fijo si no hay ninguno. Devuelve cuántos creó (0 o 1)."""
+    if db.session.scalar(db.select(Usuario.id).where(Usuario.rol_id == rol_id).limit(1)) is not None:
+        return 0
+    nombre = 'Super Admin'
+    _insert(Usuario.__table__, [{
+        'id': _next_id(Usuario),
+        'dni': SUPER_ADMIN_DNI,
+        'nombre_completo': nombre,
+        'nombre_busqueda': fold_accents(nombre),
+        'email': None,
+        'password_hash': password_hash,
+        'rol_id': rol_id,
+        'organizacion_id': organizacion_id,
+        'barrio_admin_id': None,
+        'permisos_version': 0,
+    }], 1)
+    return 1
+
+
+def generate(semilla=42, organizaciones=20, barrios=1000, puestos_por_barrio=3, usuarios=20000,
+             permisos_por_usuario=3, actas=1_000_000, dias=365, hasta=None, lote=5000, progress=None):
+    """
+    Genera el conjunto completo y devuelve un dict con lo insertado por tabla.
+    `progress(mensaje)` recibe avances (para mostrarlos en la CLI).
+    """
+    rng = random.Random(semilla)
+    progress = progress or (lambda mensaje: None)
+    zone = get_zone(current_app.config.get('DEFAULT_TIMEZONE', 'America/Argentina/Buenos_Aires'))
+    ahora = datetime.now(zone)
+    hasta = min(hasta or ahora.date(), ahora.date())  # un `hasta` futuro no genera actas futuras
+
+    plan_ids, rol_super_id, rol_admin_id, rol_usuario_id = _catalog()
+
+    # --- Organizaciones ---
+    org_id0 = _next_id(Organizacion)
+    org_rows = [{
+        'id': org_id0 + i,
+        'nombre': f'{rng.choice(APELLIDOS)} Seguridad {org_id0 + i}',
+        'plan_id': rng.choice(plan_ids),
+        'zona_horaria': _weighted(rng, ZONAS),
+    } for i in range(organizaciones)]
+    _insert(Organizacion.__table__, org_rows, lote)
+    org_ids = [r['id'] for r in org_rows]
+
+    # --- Barrios y puestos ---
+    barrio_id0 = _next_id(Barrio)
+    barrio_rows = [{
+        'id': barrio_id0 + i,
+        'nombre': f'{rng.choice(NOMBRES_BARRIO)} {barrio_id0 + i}',
+        'zona': rng.choice(SECTORES),
+    } for i in range(barrios)]
+    _insert(Barrio.__table__, barrio_rows, lote)
+
+    puesto_id = _next_id(Puesto)
+    puesto_rows = []
+    puestos_de_barrio = {}
+    for barrio in barrio_rows:
+        cantidad = max(1, min(len(NOMBRES_PUESTO), int(rng.expovariate(1 / puestos_por_barrio)) + 1))
+        nombres = rng.sample(NOMBRES_PUESTO, cantidad)
+        puestos_de_barrio[barrio['id']] = list(range(puesto_id, puesto_id + cantidad))
+        for nombre in nombres:
+            puesto_rows.append({'id': puesto_id, 'nombre': nombre, 'barrio_id': barrio['id']})
+            puesto_id += 1
+    _insert(Puesto.__table__, puesto_rows, lote)
+    progress(f'{len(org_rows)} organizaciones, {len(barrio_rows)} barrios, {len(puesto_rows)} puestos.')
+
+    # --- Usuarios: un admin por barrio y el resto guardias ---
+    password_hash = hash_password(DEFAULT_PASSWORD)  # uno solo: hashear cada usuario llevaría horas
+    super_admins = _ensure_super_admin(rol_super_id, org_ids[0], password_hash) if org_ids else 0
+    usuario_id0 = _next_id(Usuario)
+    usuario_rows = []
+    barrio_de_usuario = []
+    for i in range(max(usuarios, 0)):
+        uid = usuario_id0 + i
+        barrio_id = barrio_rows[i % len(barrio_rows)]['id'] if i < len(barrio_rows) else rng.choice(barrio_rows)['id']
+        nombre = f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}'
+        es_admin = i < len(barrio_rows)
+        usuario_rows.append({
+            'id': uid,
+            'dni': str(DNI_BASE + uid),
+            'nombre_completo': nombre,
+            'nombre_busqueda': fold_accents(nombre),
+            'email': f'usuario{uid}@escala.test' if rng.random() < 0.7 else None,
+            'password_hash': password_hash,
+            'rol_id': rol_admin_id if es_admin else rol_usuario_id,
+            'organizacion_id': rng.choice(org_ids),
+            'barrio_admin_id': barrio_id if es_admin else None,
+            'permisos_version': 0,
+        })
+        barrio_de_usuario.append(barrio_id)
+    _insert(Usuario.__table__, usuario_rows, lote)
+
+    # --- Permisos: puestos del barrio propio (editables) y a veces ver otro barrio ---
+    permiso_id = _next_id(PermisoPuesto)
+    permiso_rows = []
+    editores = {}  # puesto_id -> [usuario_id] (autores posibles de sus actas)
+    for usuario, barrio_id in zip(usuario_rows, barrio_de_usuario):
+        if usuario['barrio_admin_id'] is not None:
+            continue
+        propios = puestos_de_barrio[barrio_id]
+        cantidad = min(len(propios), rng.randint(1, max(1, permisos_por_usuario)))
+        elegidos = [(p, True) for p in rng.sample(propios, cantidad)]
+        if rng.random() < 0.15:
+            otro = rng.choice(puestos_de_barrio[rng.choice(barrio_rows)['id']])
+            if otro not in propios:
+                elegidos.append((otro, False))
+        for puesto, editable in elegidos:
+            permiso_rows.append({'id': permiso_id, 'usuario_id': usuario['id'], 'puesto_id': puesto,
+                                 'puede_ver': True, 'puede_editar': editable})
+            permiso_id += 1
+            if editable:
+                editores.setdefault(puesto, []).append(usuario['id'])
+    _insert(PermisoPuesto.__table__, permiso_rows, lote)
+    progress(f'{len(usuario_rows)} usuarios, {len(permiso_rows)} permisos.')
+
+    # Puestos sin guardias: firma el admin del barrio (o nadie, si se pidieron menos usuarios que barrios)
+    admin_de_barrio = {u['barrio_admin_id']: u['id'] for u in usuario_rows if u['barrio_admin_id'] is not None}
+    autores = [editores.get(p['id']) or [admin_de_barrio.get(p['barrio_id'])] for p in puesto_rows]
+
+    # --- Actas, día por día en orden cronológico ---
+    ranking = list(range(len(puesto_rows)))
+    rng.shuffle(ranking)
+    puestos_ponderados = _Cumulative([1 / (r + 1) ** 0.8 for r in ranking])
+    horas = _Cumulative(PESO_HORA)
+    primer_dia = hasta - timedelta(days=dias - 1)
+    cuerpos = [_body(rng) for _ in range(min(CUERPOS_DISTINTOS, max(actas, 1)))]
+    acta_id = _next_id(Acta)
+    restantes = actas
+    insertadas = 0
+    rnd = rng.random  # int(rnd() * n) en lugar de randrange/choice: es el bucle caliente
+    with _bulk_load():
+        for d in range(dias):
+            dia = primer_dia + timedelta(days=d)
+            cantidad = restantes // (dias - d)
+            # Variación diaria (fines de semana más tranquilos) sin cambiar el total
+            if d < dias - 1:
+                cantidad = min(restantes, int(cantidad * (0.8 if dia.weekday() >= 5 else 1.05) * rng.uniform(0.9, 1.1)))
+            restantes -= cantidad
+            # Medianoche local del día en UTC; el offset se corrige si cambia en el día (horario de verano)
+            medianoche = datetime.combine(dia, time(0), tzinfo=zone)
+            filas = []
+            for _ in range(cantidad):
+                indice = puestos_ponderados.pick(rng)
+                clasificacion = _weighted(rng, CLASIFICACIONES)
+                if clasificacion == 'INICIO JORNADA':
+                    minutos = CAMBIOS_DE_TURNO[rnd() < 0.5] * 60 + int(rnd() * 20)
+                elif clasificacion == 'FIN JORNADA':
+                    minutos = CAMBIOS_DE_TURNO[rnd() < 0.5] * 60 - 20 + int(rnd() * 20)
+                else:
+                    minutos = horas.pick(rng) * 60 + int(rnd() * 60)
+                local = medianoche + timedelta(minutes=minutos, seconds=int(rnd() * 60))
+                if local > ahora:
+                    # Hoy: nada en el futuro; se reparte en lo que va del día
+                    transcurrido = max((ahora - medianoche).total_seconds(), 1)
+                    local = medianoche + timedelta(seconds=int(rnd() * transcurrido))
+                filas.append((local, indice, clasificacion))
+            filas.sort()
+            rows = []
+            for local, indice, clasificacion in filas:
+                candidatos = autores[indice]
+                rows.append({
+                    'id': acta_id,
+                    'classification': clasificacion,
+                    'body': cuerpos[int(rnd() * len(cuerpos))],
+                    'fecha_creacion': local.astimezone(timezone.utc).replace(tzinfo=None),
+                    'usuario_id': candidatos[int(rnd() * len(candidatos))],
+                    'puesto_id': puesto_rows[indice]['id'],
+                })
+                acta_id += 1
+            _insert(Acta.__table__, rows, lote)
+            insertadas += len(rows)
+            if rows and (d + 1) % 30 == 0:
+                progress(f'{insertadas} actas ({dia.isoformat()}).')
+
+    _sync_sequences(['organizaciones', 'barrios', 'puestos', 'usuarios', 'permisos', 'actas'])
+    return {
+        'organizaciones': len(org_rows),
+        'barrios': len(barrio_rows),
+        'puestos': len(puesto_rows),
+        'usuarios': len(usuario_rows) + super_admins,
+        'permisos': len(permiso_rows),
+        'actas': insertadas,
+    }
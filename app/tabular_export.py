@@ -0,0 +1,126 @@
+# app/tabular_export.py
+
+"""
+Exportaciones tabulares (CSV / XLSX) de actas y de usuarios de un barrio.
+
+Las filas salen de consultas por lotes (`yield_per`) y se escriben a medida que
+llegan: el CSV es un generador que la respuesta va enviando, y el XLSX usa el
+modo write-only de openpyxl (cada fila se serializa al agregarla) sobre un
+archivo temporal. En ningún momento está el conjunto completo en memoria.
+"""
+
+import csv
+import io
+import tempfile
+
+from flask import current_app
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from app import db, feed
+from app.models import Usuario, Rol, Puesto, PermisoPuesto
+from app.template_filters import current_zone_name, to_local
+
+
+XLSX_MAX_ROWS = 1048576  # límite de filas por hoja de Excel
+CSV_FLUSH_ROWS = 200  # filas por bloque enviado al cliente
+
+ACTAS_HEADER = ('ID', 'Fecha', 'Puesto', 'Clasificación', 'Texto', 'Autor', 'Adjunto')
+USUARIOS_HEADER = ('DNI', 'Nombre', 'Email', 'Rol', 'Puesto', 'Puede ver', 'Puede editar')
+
+
+# ---------------------------
+# Fuentes de filas
+# ---------------------------
+
+def acta_rows(puestos, start_date=None, end_date=None, query_text=None):
+    """Filas de actas (tuplas de ACTAS_HEADER). `puestos` es {id: nombre} de puestos ya autorizados."""
+    zone = current_zone_name()
+    for row in feed.stream_actas(list(puestos), start_date, end_date, query_text):
+        # Hora local sin tzinfo: openpyxl no acepta datetimes con zona
+        fecha = to_local(row.fecha_creacion, zone).replace(tzinfo=None) if row.fecha_creacion else None
+        yield (row.id, fecha, puestos.get(row.puesto_id), row.classification,
+               row.body, row.autor_nombre, row.documento_url)
+
+
+def usuario_rows(barrio_id, chunk_size=None):
+    """Una fila por (usuario, puesto del barrio) con los flags de `PermisoPuesto`."""
+    chunk_size = chunk_size or current_app.config.get('EXPORT_CHUNK_SIZE', 500)
+    query = (
+        db.select(Usuario.dni, Usuario.nombre_completo, Usuario.email, Rol.nombre,
+                  Puesto.nombre, PermisoPuesto.puede_ver, PermisoPuesto.puede_editar)
+        .join(Rol, Usuario.rol_id == Rol.id)
+        .join(PermisoPuesto, PermisoPuesto.usuario_id == Usuario.id)
+        .join(Puesto, PermisoPuesto.puesto_id == Puesto.id)
+        .where(Puesto.barrio_id == barrio_id)
+        .order_by(Usuario.nombre_busqueda, Usuario.id, Puesto.nombre)
+    )
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+    for dni, nombre, email, rol, puesto, puede_ver, puede_editar in result:
+        yield (dni, nombre, email, rol, puesto, 'Sí' if puede_ver else 'No', 'Sí' if puede_editar else 'No')
+
+
+# ---------------------------
+# Escritores
+# ---------------------------
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d/%m/%Y %H:%M')
+    value = str(value)
+    # Evita que Excel interprete un texto como fórmula (inyección CSV)
+    if value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def iter_csv(header, rows):
+    """Generador de texto CSV: encabezado + filas, enviado en bloques de CSV_FLUSH_ROWS."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=current_app.config.get('EXPORT_CSV_DELIMITER', ';'))
+    # BOM: Excel abre el archivo como UTF-8 (tildes y eñes correctas)
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(v) for v in row])
+        pending += 1
+        if pending >= CSV_FLUSH_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _xlsx_value(value):
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+def build_xlsx(title, header, rows):
+    """
+    Libro XLSX en modo write-only, en un archivo temporal posicionado al inicio.
+    Si se supera el máximo de filas de Excel se continúa en una hoja nueva.
+    """
+    wb = Workbook(write_only=True)
+    sheet, written, part = None, XLSX_MAX_ROWS, 0
+    for row in rows:
+        if written >= XLSX_MAX_ROWS:
+            part += 1
+            sheet = wb.create_sheet(title if part == 1 else f'{title} ({part})')
+            sheet.append(header)
+            written = 1
+        sheet.append([_xlsx_value(v) for v in row])
+        written += 1
+    if sheet is None:
+        wb.create_sheet(title).append(header)
+
+    spool = tempfile.SpooledTemporaryFile(
+        max_size=current_app.config.get('EXPORT_SPOOL_MAX_SIZE', 8 * 1024 * 1024)
+    )
+    wb.save(spool)
+    spool.seek(0)
+    return spool
@@ -0,0 +1,100 @@
+# app/template_filters.py
+
+"""
+Formateo de fechas en español para plantillas y exportaciones.
+
+No usa `locale.setlocale`: cambiar el locale es global al proceso, así que con
+varios hilos (waitress/gunicorn) es lento y además dos requests pueden pisarse
+el locale entre sí. Los nombres de días y meses salen de tablas fijas y el
+texto de cada día se memoiza (un libro de 10.000 actas tiene unos pocos cientos
+de días distintos).
+
+`fecha_creacion` se guarda en UTC; antes de formatear se pasa a la zona
+horaria de la organización del usuario (`Organizacion.zona_horaria`), o a
+`DEFAULT_TIMEZONE` fuera de un request.
+"""
+
+from datetime import date, datetime, time, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import current_app, g, has_request_context
+from flask_login import current_user
+
+
+DIAS = ('lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo')
+MESES = ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+         'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre')
+
+DEFAULT_TIMEZONE = 'America/Argentina/Buenos_Aires'
+
+
+@lru_cache(maxsize=64)
+def get_zone(name):
+    """ZoneInfo por nombre; una zona inválida cae en UTC en lugar de romper la página."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def current_zone_name():
+    """Zona de la organización del usuario logueado (una vez por request), o la default."""
+    if has_request_context():
+        if '_zona_horaria' not in g:
+            org = current_user.organizacion if current_user.is_authenticated else None
+            g._zona_horaria = (org.zona_horaria if org is not None else None) or current_app.config.get(
+                'DEFAULT_TIMEZONE', DEFAULT_TIMEZONE)
+        return g._zona_horaria
+    return current_app.config.get('DEFAULT_TIMEZONE', DEFAULT_TIMEZONE)
+
+
+def to_local(value, zone=None):
+    """Datetime UTC (naive o aware) -> hora local de `zone` (o de la organización actual)."""
+    if not isinstance(value, datetime):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(get_zone(zone or current_zone_name()))
+
+
+def local_day_start(day, zone=None):
+    """Medianoche local de `day` en `zone` (o la de la organización actual), como datetime UTC naive."""
+    start = datetime.combine(day, time.min, tzinfo=get_zone(zone or current_zone_name()))
+    return start.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@lru_cache(maxsize=8192)
+def format_day_es(day):
+    """'Lunes, 05 de octubre de 2026' para un `date` (memoizado por fecha)."""
+    return f'{DIAS[day.weekday()].capitalize()}, {day.day:02d} de {MESES[day.month - 1]} de {day.year}'
+
+
+def date_full_local_es(value, zone=None):
+    if isinstance(value, datetime):
+        return format_day_es(to_local(value, zone).date())
+    if isinstance(value, date):
+        return format_day_es(value)
+    return value
+
+
+def datetime_local(value, zone=None):
+    """Fecha completa más la hora local: 'Lunes, 05 de octubre de 2026 14:30'."""
+    if not isinstance(value, datetime):
+        return date_full_local_es(value, zone)
+    local = to_local(value, zone)
+    return f'{format_day_es(local.date())} {local.hour:02d}:{local.minute:02d}'
+
+
+def time_local(value, zone=None):
+    """Solo la hora local ('14:30')."""
+    if not isinstance(value, datetime):
+        return value
+    local = to_local(value, zone)
+    return f'{local.hour:02d}:{local.minute:02d}'
+
+
+def register_filters(app):
+    app.jinja_env.filters['date_full_local_es'] = date_full_local_es
+    app.jinja_env.filters['datetime_local'] = datetime_local
+    app.jinja_env.filters['time_local'] = time_local
@@ -0,0 +1,9 @@
+# app/text_utils.py
+
+import unicodedata
+
+
+def fold_accents(text):
+    """Minúsculas y sin tildes/diéresis: 'Camión Ñandú' -> 'camion nandu'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
@@ -0,0 +1,375 @@
+# app/user_import.py
+
+"""
+Alta masiva de usuarios desde CSV o XLSX.
+
+Cuando una empresa de seguridad toma un barrio nuevo hay que cargar decenas
+de guardias de una vez. El archivo tiene una fila por usuario:
+
+    DNI | Nombre | Email | Contraseña | Puestos | Puede ver | Puede editar
+
+`Puestos` son nombres (o ids) de puestos del barrio separados por coma o `|`;
+`Email`, `Puede ver` y `Puede editar` son opcionales (sin valor se usan los
+del formulario). Los encabezados se reconocen sin importar tildes ni mayúsculas.
+
+1. Se leen y validan todas las filas antes de tocar la base. La unicidad de
+   DNI y email se controla con una consulta `IN (...)` por lote, no una por fila,
+   y también entre filas del mismo archivo.
+2. Las contraseñas se hashean en paralelo (`passwords.hash_many`).
+3. Usuarios y `PermisoPuesto` se insertan con un INSERT por lote
+   (executemany) dentro de una sola transacción.
+
+Por defecto, si alguna fila tiene errores no se crea nadie: se devuelve el
+reporte para corregir el archivo. Con `partial=True` se crean las filas válidas.
+"""
+
+import csv
+import io
+import re
+
+from email_validator import EmailNotValidError, validate_email
+from flask import current_app
+from openpyxl import load_workbook
+from sqlalchemy.exc import IntegrityError
+from app import db, passwords
+from app.models import PermisoPuesto, Puesto, Rol, Usuario
+from app.text_utils import fold_accents
+
+
+ESTADO_CREADO = 'creado'
+ESTADO_VALIDO = 'válido'
+ESTADO_ERROR = 'error'
+
+# Encabezado normalizado (sin tildes, minúsculas) -> campo
+COLUMNS = {
+    'dni': 'dni',
+    'nombre': 'nombre', 'nombre completo': 'nombre', 'apellido y nombre': 'nombre',
+    'email': 'email', 'e-mail': 'email', 'correo': 'email',
+    'contrasena': 'password', 'password': 'password', 'clave': 'password',
+    'puestos': 'puestos', 'puesto': 'puestos',
+    'puede ver': 'puede_ver', 'ver': 'puede_ver',
+    'puede editar': 'puede_editar', 'editar': 'puede_editar',
+}
+REQUIRED_COLUMNS = ('dni', 'nombre', 'password', 'puestos')
+TEMPLATE_HEADER = ('DNI', 'Nombre', 'Email', 'Contraseña', 'Puestos', 'Puede ver', 'Puede editar')
+
+TRUE_VALUES = {'si', 's', 'x', '1', 'true', 'verdadero'}
+FALSE_VALUES = {'no', 'n', '0', 'false', 'falso'}
+
+_DNI_RE = re.compile(r'^[0-9]{8}$')
+_PUESTOS_SPLIT = re.compile(r'[,|]')
+IN_BATCH = 500  # valores por consulta IN (...)
+
+
+class ImportFileError(Exception):
+    """El archivo no se puede leer o no tiene las columnas obligatorias."""
+
+
+class ImportRow:
+    """Una fila del archivo, con lo que se validó y lo que pasó con ella."""
+
+    __slots__ = ('linea', 'dni', 'nombre', 'email', 'password', 'puestos',
+                 'puede_ver', 'puede_editar', 'errores', 'estado', 'usuario_id')
+
+    def __init__(self, linea):
+        self.linea = linea
+        self.dni = self.nombre = self.email = self.password = None
+        self.puestos = []
+        self.puede_ver = True
+        self.puede_editar = False
+        self.errores = []
+        self.estado = None
+        self.usuario_id = None
+
+    @property
+    def ok(self):
+        return not self.errores
+
+
+class ImportReport:
+    """
+    Resultado de una importación: todas las filas con su estado. `aborted` indica
+    que era una importación real y no se creó nadie (errores sin `partial`, o
+    choque con un alta concurrente).
+    """
+
+    def __init__(self, rows, dry_run=False, aborted=False):
+        self.rows = rows
+        self.dry_run = dry_run
+        self.aborted = aborted
+
+    @property
+    def created(self):
+        return sum(1 for r in self.rows if r.estado == ESTADO_CREADO)
+
+    @property
+    def failed(self):
+        return sum(1 for r in self.rows if not r.ok)
+
+
+# ---------------------------
+# Lectura del archivo
+# ---------------------------
+
+def _cell(value):
+    """Texto de una celda; los DNI que Excel guardó como número vuelven sin '.0'."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _decode(data):
+    for encoding in ('utf-8-sig', 'cp1252'):  # Excel en es-AR guarda CSV en Windows-1252
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ImportFileError('No se pudo leer el archivo: codificación desconocida.')
+
+
+def _csv_records(data):
+    text = _decode(data)
+    try:
+        delimiter = csv.Sniffer().sniff(text[:4096], delimiters=';,\t').delimiter
+    except csv.Error:  # una sola columna o muestra ambigua
+        delimiter = current_app.config.get('EXPORT_CSV_DELIMITER', ';')
+    return list(csv.reader(io.StringIO(text), delimiter=delimiter))
+
+
+def _xlsx_records(data):
+    try:
+        wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    except Exception as e:  # openpyxl lanza varios tipos según qué esté roto
+        raise ImportFileError(f'No se pudo leer el archivo XLSX: {e}') from e
+    try:
+        return [list(r) for r in wb.worksheets[0].iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+
+def read_records(fileobj, filename):
+    """[(línea, {campo: texto})] del CSV o XLSX; las filas vacías se saltean."""
+    data = fileobj.read()
+    if filename.lower().endswith('.xlsx'):
+        records = _xlsx_records(data)
+    elif filename.lower().endswith('.csv'):
+        records = _csv_records(data)
+    else:
+        raise ImportFileError('El archivo tiene que ser CSV o XLSX.')
+    if not records:
+        raise ImportFileError('El archivo está vacío.')
+
+    header = [COLUMNS.get(fold_accents(_cell(h))) for h in records[0]]
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ImportFileError(f"Faltan columnas: {', '.join(missing)}. Se esperan: {', '.join(TEMPLATE_HEADER)}.")
+
+    max_rows = current_app.config.get('USER_IMPORT_MAX_ROWS', 2000)
+    result = []
+    for linea, values in enumerate(records[1:], start=2):
+        fields = {name: _cell(v) for name, v in zip(header, values) if name}
+        if not any(fields.values()):
+            continue
+        result.append((linea, fields))
+        if len(result) > max_rows:
+            raise ImportFileError(f'El archivo supera el máximo de {max_rows} usuarios por importación.')
+    if not result:
+        raise ImportFileError('El archivo no tiene filas de usuarios.')
+    return result
+
+
+# ---------------------------
+# Validación
+# ---------------------------
+
+def _flag(text, default):
+    value = fold_accents(text)
+    if not value:
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(text)
+
+
+def _password_errors(password):
+    # Mismas reglas que CreateUserForm
+    if len(password) < 6:
+        return ['La contraseña debe tener al menos 6 caracteres.']
+    errors = []
+    if not re.search(r'[a-z]', password):
+        errors.append('La contraseña debe contener al menos una letra minúscula.')
+    if not re.search(r'[A-Z]', password):
+        errors.append('La contraseña debe contener al menos una letra mayúscula.')
+    if not re.search(r'[0-9]', password):
+        errors.append('La contraseña debe contener al menos un número.')
+    return errors
+
+
+def _puesto_lookup(barrio_id):
+    """{id como texto o nombre normalizado: id} de los puestos del barrio."""
+    lookup = {}
+    for p_id, nombre in db.session.execute(db.select(Puesto.id, Puesto.nombre).where(Puesto.barrio_id == barrio_id)):
+        lookup[str(p_id)] = p_id
+        lookup[fold_accents(nombre).strip()] = p_id
+    return lookup
+
+
+def parse_rows(records, barrio_id, puede_ver=True, puede_editar=False):
+    """`ImportRow` por registro con las validaciones que no necesitan otras filas."""
+    puestos = _puesto_lookup(barrio_id)
+    rows = []
+    for linea, fields in records:
+        row = ImportRow(linea)
+        rows.append(row)
+
+        row.dni = fields.get('dni', '')
+        if not _DNI_RE.match(row.dni):
+            row.errores.append('El DNI debe tener exactamente 8 dígitos.')
+
+        row.nombre = fields.get('nombre', '')
+        if not row.nombre:
+            row.errores.append('Falta el nombre.')
+        elif len(row.nombre) > 128:
+            row.errores.append('El nombre no puede exceder los 128 caracteres.')
+
+        email = fields.get('email', '')
+        if email:
+            try:
+                row.email = validate_email(email, check_deliverability=False).normalized
+            except EmailNotValidError:
+                row.errores.append(f'Email inválido: {email}.')
+            else:
+                if len(row.email) > 120:
+                    row.errores.append('El email no puede exceder los 120 caracteres.')
+
+        row.password = fields.get('password', '')
+        row.errores.extend(_password_errors(row.password))
+
+        names = [n.strip() for n in _PUESTOS_SPLIT.split(fields.get('puestos', '')) if n.strip()]
+        if not names:
+            row.errores.append('Debe asignarse al menos un puesto.')
+        for name in names:
+            p_id = puestos.get(fold_accents(name))
+            if p_id is None:
+                row.errores.append(f'El puesto "{name}" no existe en el barrio.')
+            elif p_id not in row.puestos:
+                row.puestos.append(p_id)
+
+        for field, default in (('puede_ver', puede_ver), ('puede_editar', puede_editar)):
+            try:
+                setattr(row, field, _flag(fields.get(field, ''), default))
+            except ValueError as e:
+                row.errores.append(f'Valor inválido en "{field.replace("_", " ")}": {e} (usar Sí o No).')
+    return rows
+
+
+def _existing(column, values):
+    """Subconjunto de `values` que ya está en la columna (consultas IN por lote)."""
+    values = sorted(values)
+    found = set()
+    for i in range(0, len(values), IN_BATCH):
+        found.update(db.session.scalars(db.select(column).where(column.in_(values[i:i + IN_BATCH]))))
+    return found
+
+
+def check_uniqueness(rows):
+    """DNI y email repetidos en el archivo o ya registrados, con dos consultas por lote en total."""
+    seen_dni, seen_email = {}, {}
+    for row in rows:
+        if row.dni:
+            if row.dni in seen_dni:
+                row.errores.append(f'DNI repetido en el archivo (línea {seen_dni[row.dni]}).')
+            else:
+                seen_dni[row.dni] = row.linea
+        if row.email:
+            key = row.email.lower()
+            if key in seen_email:
+                row.errores.append(f'Email repetido en el archivo (línea {seen_email[key]}).')
+            else:
+                seen_email[key] = row.linea
+
+    taken_dni = _existing(Usuario.dni, seen_dni)
+    emails = {row.email for row in rows if row.email}
+    taken_email = {e.lower() for e in _existing(Usuario.email, emails)}
+    for row in rows:
+        if row.dni in taken_dni:
+            row.errores.append('Este DNI ya está registrado.')
+        if row.email and row.email.lower() in taken_email:
+            row.errores.append('Este email ya está en uso.')
+
+
+# ---------------------------
+# Alta
+# ---------------------------
+
+def _insert(rows, organizacion_id):
+    rol_id = db.session.scalar(db.select(Rol.id).where(Rol.nombre == 'Usuario'))
+    if rol_id is None:
+        raise ImportFileError('El rol "Usuario" no se encuentra en la base de datos.')
+
+    hashes = passwords.hash_many(row.password for row in rows)
+    db.session.execute(db.insert(Usuario.__table__), [{
+        'dni': row.dni,
+        'nombre_completo': row.nombre,
+        'nombre_busqueda': fold_accents(row.nombre),  # el INSERT masivo no pasa por @validates
+        'email': row.email,
+        'password_hash': password_hash,
+        'rol_id': rol_id,
+        'organizacion_id': organizacion_id,
+        'permisos_version': 0,
+    } for row, password_hash in zip(rows, hashes)])
+
+    ids = {}
+    dnis = [row.dni for row in rows]
+    for i in range(0, len(dnis), IN_BATCH):
+        ids.update(db.session.execute(
+            db.select(Usuario.dni, Usuario.id).where(Usuario.dni.in_(dnis[i:i + IN_BATCH]))).all())
+    permisos = []
+    for row in rows:
+        row.usuario_id = ids[row.dni]
+        permisos.extend({'usuario_id': row.usuario_id, 'puesto_id': p_id,
+                         'puede_ver': row.puede_ver, 'puede_editar': row.puede_editar}
+                        for p_id in row.puestos)
+    db.session.execute(db.insert(PermisoPuesto.__table__), permisos)
+
+
+def import_users(fileobj, filename, barrio_id, organizacion_id, puede_ver=True, puede_editar=False,
+                 partial=False, dry_run=False):
+    """
+    Valida e importa el archivo. Devuelve un `ImportReport` con el estado de cada fila.
+    Lanza `ImportFileError` si el archivo no se puede leer.
+    """
+    rows = parse_rows(read_records(fileobj, filename), barrio_id, puede_ver, puede_editar)
+    check_uniqueness(rows)
+    valid = [row for row in rows if row.ok]
+    for row in valid:
+        row.estado = ESTADO_VALIDO
+    for row in rows:
+        if not row.ok:
+            row.estado = ESTADO_ERROR
+
+    if dry_run:
+        return ImportReport(rows, dry_run=True)
+    if not valid or (len(valid) < len(rows) and not partial):
+        return ImportReport(rows, aborted=True)
+
+    try:
+        _insert(valid, organizacion_id)
+        db.session.commit()
+    except IntegrityError:
+        # Alguien dio de alta el mismo DNI/email entre la validación y el INSERT
+        db.session.rollback()
+        for row in valid:
+            row.estado = ESTADO_ERROR
+            row.usuario_id = None
+            row.errores.append('Otro usuario con este DNI o email se registró durante la importación; reintentar.')
+        return ImportReport(rows, aborted=True)
+    for row in valid:
+        row.estado = ESTADO_CREADO
+        row.password = None
+    current_app.logger.info('Importación de usuarios: %s creados en el barrio %s', len(valid), barrio_id)
+    return ImportReport(rows)
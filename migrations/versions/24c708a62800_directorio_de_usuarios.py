@@ -0,0 +1,59 @@
+"""Directorio de usuarios: nombre normalizado e indices de membresia
+
+Revision ID: 24c708a62800
+Revises: c41f7a2e8d90
+Create Date: 2026-10-18 12:41:52.906311
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '24c708a62800'
+down_revision = 'c41f7a2e8d90'
+branch_labels = None
+depends_on = None
+
+
+def _fold(text):
+    # Misma normalización que app.text_utils.fold_accents (copiada para no depender de la app).
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def upgrade():
+    op.add_column('usuarios', sa.Column('nombre_busqueda', sa.String(length=128), nullable=True))
+
+    # Backfill en lotes (la normalización de tildes se hace en Python)
+    conn = op.get_bind()
+    usuarios = sa.table('usuarios', sa.column('id', sa.Integer), sa.column('nombre_completo', sa.String),
+                        sa.column('nombre_busqueda', sa.String))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(usuarios.c.id, usuarios.c.nombre_completo)
+            .where(usuarios.c.id > last_id).order_by(usuarios.c.id).limit(1000)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            usuarios.update().where(usuarios.c.id == sa.bindparam('b_id'))
+            .values(nombre_busqueda=sa.bindparam('b_nombre')),
+            [{'b_id': r.id, 'b_nombre': _fold(r.nombre_completo)} for r in rows],
+        )
+        last_id = rows[-1].id
+
+    op.create_index('ix_usuarios_nombre_busqueda_id', 'usuarios', ['nombre_busqueda', 'id'], unique=False)
+    op.create_index('ix_permisos_puesto_usuario', 'permisos', ['puesto_id', 'usuario_id'], unique=False)
+    op.create_index(op.f('ix_puestos_barrio_id'), 'puestos', ['barrio_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_puestos_barrio_id'), table_name='puestos')
+    op.drop_index('ix_permisos_puesto_usuario', table_name='permisos')
+    op.drop_index('ix_usuarios_nombre_busqueda_id', table_name='usuarios')
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_column('nombre_busqueda')
@@ -0,0 +1,39 @@
+"""Almacen de adjuntos direccionado por contenido
+
+Revision ID: 7d3e8a1f4b26
+Revises: e5a1c9d3b7f2
+Create Date: 2026-10-18 15:02:37.664120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3e8a1f4b26'
+down_revision = 'e5a1c9d3b7f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('adjuntos',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('tamano', sa.BigInteger(), nullable=False),
+    sa.Column('mimetype', sa.String(length=100), nullable=False),
+    sa.Column('creado', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    # Sin batch_alter_table: en SQLite recrearía `actas` y se perderían los triggers de `actas_fts`.
+    op.add_column('actas', sa.Column('adjunto_sha256', sa.String(length=64), nullable=True))
+    op.create_index('ix_actas_adjunto_sha256', 'actas', ['adjunto_sha256'], unique=False)
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_foreign_key('fk_actas_adjunto_sha256', 'actas', 'adjuntos', ['adjunto_sha256'], ['sha256'])
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('fk_actas_adjunto_sha256', 'actas', type_='foreignkey')
+    op.drop_index('ix_actas_adjunto_sha256', table_name='actas')
+    op.drop_column('actas', 'adjunto_sha256')
+    op.drop_table('adjuntos')
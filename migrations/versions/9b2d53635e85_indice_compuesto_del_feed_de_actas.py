@@ -0,0 +1,28 @@
+"""Indice compuesto del feed de actas
+
+Revision ID: 9b2d53635e85
+Revises: 606dfa9da19d
+Create Date: 2026-10-18 10:03:27.540913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2d53635e85'
+down_revision = '606dfa9da19d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Paginación por cursor del feed: WHERE puesto_id = ? ORDER BY fecha_creacion DESC, id DESC.
+    # El motor recorre el índice en sentido inverso, no hace falta declararlo DESC.
+    with op.batch_alter_table('actas', schema=None) as batch_op:
+        batch_op.create_index('ix_actas_puesto_fecha_id', ['puesto_id', 'fecha_creacion', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('actas', schema=None) as batch_op:
+        batch_op.drop_index('ix_actas_puesto_fecha_id')
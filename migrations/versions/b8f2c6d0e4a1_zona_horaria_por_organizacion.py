@@ -0,0 +1,27 @@
+"""Zona horaria por organizacion
+
+Revision ID: b8f2c6d0e4a1
+Revises: 7d3e8a1f4b26
+Create Date: 2026-10-18 16:11:05.902743
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f2c6d0e4a1'
+down_revision = '7d3e8a1f4b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('organizaciones', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('zona_horaria', sa.String(length=64), nullable=False,
+                                      server_default='America/Argentina/Buenos_Aires'))
+
+
+def downgrade():
+    with op.batch_alter_table('organizaciones', schema=None) as batch_op:
+        batch_op.drop_column('zona_horaria')
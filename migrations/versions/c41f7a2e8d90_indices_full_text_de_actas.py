@@ -0,0 +1,92 @@
+"""Indices full-text de actas
+
+Revision ID: c41f7a2e8d90
+Revises: 9b2d53635e85
+Create Date: 2026-10-18 11:20:05.734219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f7a2e8d90'
+down_revision = '9b2d53635e85'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    # Tabla FTS5 de contenido externo: el texto vive en `actas`, el índice en `actas_fts`.
+    """CREATE VIRTUAL TABLE actas_fts USING fts5(
+        classification, body,
+        content='actas', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER actas_fts_ai AFTER INSERT ON actas BEGIN
+        INSERT INTO actas_fts(rowid, classification, body) VALUES (new.id, new.classification, new.body);
+    END""",
+    """CREATE TRIGGER actas_fts_ad AFTER DELETE ON actas BEGIN
+        INSERT INTO actas_fts(actas_fts, rowid, classification, body) VALUES ('delete', old.id, old.classification, old.body);
+    END""",
+    """CREATE TRIGGER actas_fts_au AFTER UPDATE ON actas BEGIN
+        INSERT INTO actas_fts(actas_fts, rowid, classification, body) VALUES ('delete', old.id, old.classification, old.body);
+        INSERT INTO actas_fts(rowid, classification, body) VALUES (new.id, new.classification, new.body);
+    END""",
+    "INSERT INTO actas_fts(actas_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS actas_fts_au",
+    "DROP TRIGGER IF EXISTS actas_fts_ad",
+    "DROP TRIGGER IF EXISTS actas_fts_ai",
+    "DROP TABLE IF EXISTS actas_fts",
+]
+
+MYSQL_UPGRADE = [
+    # Collation accent-insensitive para que 'camion' encuentre 'camión'.
+    "ALTER TABLE actas MODIFY classification VARCHAR(128) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL",
+    "ALTER TABLE actas MODIFY body TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL",
+    "CREATE FULLTEXT INDEX ft_actas_texto ON actas (classification, body)",
+]
+
+MYSQL_DOWNGRADE = [
+    "DROP INDEX ft_actas_texto ON actas",
+]
+
+POSTGRES_UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() no es IMMUTABLE; el wrapper permite usarla dentro de un índice.
+    """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+        $func$ SELECT public.unaccent('public.unaccent', $1) $func$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT""",
+    """CREATE INDEX ix_actas_fts ON actas USING gin (
+        to_tsvector('spanish'::regconfig, f_unaccent(coalesce(actas.classification, '') || ' ' || coalesce(actas.body, '')))
+    )""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_actas_fts",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+
+def _statements(upgrade):
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return SQLITE_UPGRADE if upgrade else SQLITE_DOWNGRADE
+    if dialect in ('mysql', 'mariadb'):
+        return MYSQL_UPGRADE if upgrade else MYSQL_DOWNGRADE
+    if dialect == 'postgresql':
+        return POSTGRES_UPGRADE if upgrade else POSTGRES_DOWNGRADE
+    return []
+
+
+def upgrade():
+    for statement in _statements(upgrade=True):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in _statements(upgrade=False):
+        op.execute(statement)
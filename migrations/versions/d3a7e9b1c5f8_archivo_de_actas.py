@@ -0,0 +1,112 @@
+"""Archivo de actas
+
+Revision ID: d3a7e9b1c5f8
+Revises: b8f2c6d0e4a1
+Create Date: 2026-10-18 19:42:37.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7e9b1c5f8'
+down_revision = 'b8f2c6d0e4a1'
+branch_labels = None
+depends_on = None
+
+
+# El buscador indexa `terminos` (palabras del cuerpo, ya sin tildes) en lugar del cuerpo comprimido.
+SQLITE_UPGRADE = [
+    """CREATE VIRTUAL TABLE actas_archivo_fts USING fts5(
+        classification, terminos,
+        content='actas_archivo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER actas_archivo_fts_ai AFTER INSERT ON actas_archivo BEGIN
+        INSERT INTO actas_archivo_fts(rowid, classification, terminos) VALUES (new.id, new.classification, new.terminos);
+    END""",
+    """CREATE TRIGGER actas_archivo_fts_ad AFTER DELETE ON actas_archivo BEGIN
+        INSERT INTO actas_archivo_fts(actas_archivo_fts, rowid, classification, terminos) VALUES ('delete', old.id, old.classification, old.terminos);
+    END""",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS actas_archivo_fts_ad",
+    "DROP TRIGGER IF EXISTS actas_archivo_fts_ai",
+    "DROP TABLE IF EXISTS actas_archivo_fts",
+]
+
+MYSQL_UPGRADE = [
+    "CREATE FULLTEXT INDEX ft_actas_archivo_texto ON actas_archivo (classification, terminos)",
+]
+
+MYSQL_DOWNGRADE = [
+    "DROP INDEX ft_actas_archivo_texto ON actas_archivo",
+]
+
+POSTGRES_UPGRADE = [
+    """CREATE INDEX ix_actas_archivo_fts ON actas_archivo USING gin (
+        to_tsvector('spanish'::regconfig, f_unaccent(coalesce(actas_archivo.classification, '') || ' ' || coalesce(actas_archivo.terminos, '')))
+    )""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_actas_archivo_fts",
+]
+
+
+def _statements(upgrade):
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return SQLITE_UPGRADE if upgrade else SQLITE_DOWNGRADE
+    if dialect in ('mysql', 'mariadb'):
+        return MYSQL_UPGRADE if upgrade else MYSQL_DOWNGRADE
+    if dialect == 'postgresql':
+        return POSTGRES_UPGRADE if upgrade else POSTGRES_DOWNGRADE
+    return []
+
+
+def upgrade():
+    with op.batch_alter_table('planes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dias_en_caliente', sa.Integer(), nullable=True))
+
+    op.create_table('actas_archivo',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('classification', sa.String(length=128), nullable=True),
+    sa.Column('body_z', sa.LargeBinary(), nullable=True),
+    sa.Column('terminos', sa.Text(), nullable=True),
+    sa.Column('fecha_creacion', sa.DateTime(), nullable=True),
+    sa.Column('usuario_id', sa.Integer(), nullable=True),
+    sa.Column('puesto_id', sa.Integer(), nullable=True),
+    sa.Column('documento_url', sa.String(length=512), nullable=True),
+    sa.Column('adjunto_sha256', sa.String(length=64), nullable=True),
+    sa.Column('archivada', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['adjunto_sha256'], ['adjuntos.sha256'], ),
+    sa.ForeignKeyConstraint(['puesto_id'], ['puestos.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    # Misma collation que `actas` en MySQL: 'camion' encuentra 'camión' también en el archivo
+    mysql_charset='utf8mb4',
+    mysql_collate='utf8mb4_unicode_ci'
+    )
+    with op.batch_alter_table('actas_archivo', schema=None) as batch_op:
+        batch_op.create_index('ix_actas_archivo_puesto_fecha_id', ['puesto_id', 'fecha_creacion', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_actas_archivo_adjunto_sha256'), ['adjunto_sha256'], unique=False)
+
+    for statement in _statements(upgrade=True):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in _statements(upgrade=False):
+        op.execute(statement)
+
+    with op.batch_alter_table('actas_archivo', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_actas_archivo_adjunto_sha256'))
+        batch_op.drop_index('ix_actas_archivo_puesto_fecha_id')
+
+    op.drop_table('actas_archivo')
+
+    with op.batch_alter_table('planes', schema=None) as batch_op:
+        batch_op.drop_column('dias_en_caliente')
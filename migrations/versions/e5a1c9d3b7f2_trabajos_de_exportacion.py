@@ -0,0 +1,47 @@
+"""Trabajos de exportacion en segundo plano
+
+Revision ID: e5a1c9d3b7f2
+Revises: 24c708a62800
+Create Date: 2026-10-18 14:05:11.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c9d3b7f2'
+down_revision = '24c708a62800'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('export_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('barrio_id', sa.Integer(), nullable=True),
+    sa.Column('estado', sa.String(length=16), nullable=False),
+    sa.Column('puesto_ids', sa.String(length=1000), nullable=False),
+    sa.Column('filtros', sa.Text(), nullable=True),
+    sa.Column('max_acta_id', sa.Integer(), nullable=True),
+    sa.Column('cache_key', sa.String(length=64), nullable=False),
+    sa.Column('archivo', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('creado', sa.DateTime(), nullable=True),
+    sa.Column('terminado', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['barrio_id'], ['barrios.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('export_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_export_jobs_cache_key'), ['cache_key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_export_jobs_usuario_id'), ['usuario_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('export_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_export_jobs_usuario_id'))
+        batch_op.drop_index(batch_op.f('ix_export_jobs_cache_key'))
+
+    op.drop_table('export_jobs')
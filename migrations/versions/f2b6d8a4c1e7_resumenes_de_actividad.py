@@ -0,0 +1,50 @@
+"""Resúmenes de actividad
+
+Revision ID: f2b6d8a4c1e7
+Revises: d3a7e9b1c5f8
+Create Date: 2026-10-18 21:07:52.340915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6d8a4c1e7'
+down_revision = 'd3a7e9b1c5f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resumen_actas_hora',
+    sa.Column('hora', sa.DateTime(), nullable=False),
+    sa.Column('puesto_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('actas', sa.Integer(), nullable=False),
+    sa.Column('adjuntos', sa.Integer(), nullable=False),
+    sa.Column('bytes_adjuntos', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('hora', 'puesto_id')
+    )
+    op.create_table('resumen_actas_dia',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('puesto_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('usuario_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('actas', sa.Integer(), nullable=False),
+    sa.Column('adjuntos', sa.Integer(), nullable=False),
+    sa.Column('bytes_adjuntos', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('dia', 'puesto_id', 'usuario_id')
+    )
+    estado = op.create_table('resumen_estado',
+    sa.Column('nombre', sa.String(length=32), nullable=False),
+    sa.Column('ultimo_id', sa.Integer(), nullable=False),
+    sa.Column('actualizado', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('nombre')
+    )
+    # Los resúmenes arrancan vacíos: `flask resumir-actas` suma las actas existentes desde el id 0
+    op.bulk_insert(estado, [{'nombre': 'actas', 'ultimo_id': 0}])
+
+
+def downgrade():
+    op.drop_table('resumen_estado')
+    op.drop_table('resumen_actas_dia')
+    op.drop_table('resumen_actas_hora')